@@ -0,0 +1,124 @@
+# api/caching.py
+"""
+Versioned caching of per-product computations (demand forecasts and curves).
+
+Every product has a history version stamp in the cache. Cached values are keyed
+by that stamp, so bumping it (see ``bump_history_version``, called from the
+model signals in ``api.signals``) invalidates exactly the values derived from
+that product's data; the stale entries simply age out of the cache.
+
+Writes that bypass model signals (``QuerySet.update()``, ``bulk_create``) must
+call ``bump_history_version`` for the affected products themselves.
+
+Version stamps only reach other processes through a shared cache backend
+(Redis, Memcached, database). With the per-process LocMemCache default, bumps
+made by one gunicorn worker or by a management command are invisible to the
+others, which keep serving stale forecasts; ``manage.py check --deploy``
+reports that configuration as an error (see ``api.checks``).
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import record_cache
+
+HISTORY_VERSION_KEY = 'history-version:{product_id}'
+FORECAST_KEY = 'forecast:{product_id}:{version}:{month}:{models}'
+DEMAND_CURVE_KEY = 'demand-curve:{product_id}:{version}:{month}:{models}:{params}'
+
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def process_local_cache():
+    """
+    True if the default cache is not shared between processes
+    """
+    return settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+def _new_version():
+    # Unique per bump, so a version key that was evicted never resurrects stale values
+    return time.time_ns()
+
+
+def history_version(product_id):
+    """
+    Current history version stamp of a product
+    """
+    key = HISTORY_VERSION_KEY.format(product_id=product_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def history_versions(product_ids):
+    """
+    History version stamps of many products, as ``{product_id: version}``
+    """
+    keys = {HISTORY_VERSION_KEY.format(product_id=pk): pk for pk in product_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    missing = {key: _new_version() for key, pk in keys.items() if pk not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update({keys[key]: version for key, version in missing.items()})
+    return versions
+
+
+def bump_history_version(*product_ids):
+    """
+    Invalidate everything cached for the given products
+    """
+    version = _new_version()
+    cache.set_many(
+        {HISTORY_VERSION_KEY.format(product_id=pk): version for pk in product_ids},
+        timeout=None
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _models_tag(model, category_models):
+    return hashlib.md5(repr((model, category_models)).encode(), usedforsecurity=False).hexdigest()[:8]
+
+
+def forecast_models_tag():
+    """
+    Short digest of the forecast model settings, so that changing them retires cached forecasts
+    """
+    return _models_tag(settings.FORECAST_MODEL, tuple(sorted(settings.FORECAST_CATEGORY_MODELS.items())))
+
+
+def forecast_key(product_id, version, month, models=None):
+    if models is None:
+        models = forecast_models_tag()
+    return FORECAST_KEY.format(product_id=product_id, version=version, month=month, models=models)
+
+
+def demand_curve_key(product_id, version, month, params, models=None):
+    """
+    Cache key of a demand curve; ``params`` identifies resolution, range and elasticity source
+    """
+    if models is None:
+        models = forecast_models_tag()
+    return DEMAND_CURVE_KEY.format(product_id=product_id, version=version, month=month, models=models, params=params)
+
+
+def get_or_compute_forecast(product_id, month, compute):
+    """
+    Cached demand forecast of a product for the given calendar month
+    (the seasonal factor depends on it); ``compute()`` fills misses.
+    """
+    key = forecast_key(product_id, history_version(product_id), month)
+    forecast = cache.get(key)
+    record_cache('forecast', hits=forecast is not None, misses=forecast is None)
+    if forecast is None:
+        forecast = compute()
+        cache.set(key, forecast, timeout=settings.FORECAST_CACHE_TIMEOUT)
+    return forecast
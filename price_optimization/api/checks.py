@@ -0,0 +1,22 @@
+# api/checks.py
+from django.core.checks import Error, Tags, register
+
+from .caching import process_local_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Cache invalidation (history versions, market conditions, elasticity priors)
+    only reaches every worker and management command through a shared cache
+    """
+    if not process_local_cache():
+        return []
+    return [
+        Error(
+            'The default cache is local to each process, so invalidations made by one '
+            'worker or management command are not seen by the others.',
+            hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis or Memcached.',
+            id='api.E001',
+        )
+    ]
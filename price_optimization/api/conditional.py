@@ -0,0 +1,86 @@
+# api/conditional.py
+"""
+Conditional GET (ETag / Last-Modified) for per-product read endpoints.
+
+Validators come from ``Product.updated_at`` and the product's history version
+stamp (``api.caching``), which the model signals bump on every product and
+history change. A request whose ``If-None-Match`` or ``If-Modified-Since``
+still matches is answered with ``304 Not Modified`` after one indexed lookup
+and a cache read, without serializing or forecasting anything.
+
+Writes that bypass model signals must bump the history version themselves
+(see ``api.caching``), or clients keep their copies. Like the cached forecasts,
+validators only change in every worker when the cache is shared between them.
+"""
+import functools
+import hashlib
+import time
+from datetime import date
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .caching import forecast_models_tag, history_version
+from .models import Product
+
+
+def product_validators(product_id, monthly=False):
+    """
+    ``(version parts, last modified timestamp)`` of data derived from a product
+    and its history, or None if the product doesn't exist. ``monthly`` for
+    values that also change with the calendar month and the forecast model
+    settings (forecasts).
+    """
+    updated_at = Product.objects.filter(pk=product_id).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    version = history_version(product_id)
+    parts = [product_id, updated_at.isoformat(), version]
+    timestamps = [updated_at.timestamp(), version / 1e9]
+    if monthly:
+        month_start = date.today().replace(day=1)
+        parts.extend([month_start.isoformat(), forecast_models_tag()])
+        timestamps.append(time.mktime(month_start.timetuple()))
+    return parts, max(timestamps)
+
+
+def conditional_get(validators):
+    """
+    Decorator for an APIView ``get`` that answers unchanged representations with 304.
+
+    ``validators(request, *args, **kwargs)`` returns ``(parts, last_modified)``
+    as ``product_validators`` does, or None to run the view unconditionally.
+    It is called after authentication and permission checks.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            current = validators(request, *args, **kwargs)
+            if current is None:
+                return method(view, request, *args, **kwargs)
+
+            parts, last_modified = current
+            # Per representation: the JSON and browsable API renderings differ, and so
+            # do responses to different query parameters
+            source = ':'.join(str(part) for part in [
+                type(view).__name__, request.accepted_media_type, request.META.get('QUERY_STRING', ''), *parts
+            ])
+            etag = f'W/"{hashlib.md5(source.encode(), usedforsecurity=False).hexdigest()}"'
+            last_modified = int(last_modified)
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+                max_age = settings.CONDITIONAL_GET_MAX_AGE
+                if max_age > 0:
+                    patch_cache_control(response, private=True, max_age=max_age)
+                else:
+                    patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Accept', 'Authorization'))
+            return response
+        return wrapper
+    return decorator
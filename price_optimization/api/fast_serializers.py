@@ -0,0 +1,201 @@
+# api/fast_serializers.py
+"""
+Read-only serialization straight from ``values_list()`` rows.
+
+``compile_row_serializer`` turns a ModelSerializer instance into a
+``RowSerializer``: the value paths to select plus, per output key, the column
+index and a converter precompiled from the bound DRF field, so the output is
+identical to ``serializer.data`` without building model instances or going
+through DRF's per-field attribute lookup. Serializers with fields that can't
+be read from columns (model properties, methods, many relations) don't
+compile and keep using DRF.
+"""
+import decimal
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# DRF fields whose to_representation returns database values unchanged
+_PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.BooleanField, serializers.JSONField)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _decimal_converter(field):
+    # DecimalField.to_representation with its quantize exponent and context built once
+    if field.localize or not getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING):
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime_converter(field):
+    """
+    DateTimeField.to_representation for aware datetimes, bound per render to the
+    current timezone (looked up once instead of per value)
+    """
+    if hasattr(field, 'timezone') or getattr(field, 'format', api_settings.DATETIME_FORMAT).lower() != ISO_8601:
+        return None
+
+    def bind(current_timezone):
+        def convert(value):
+            if current_timezone is None or not isinstance(value, datetime) or timezone.is_naive(value):
+                return field.to_representation(value)
+            value = value.astimezone(current_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+    return bind
+
+
+def _converter(field):
+    """
+    ``bind(current_timezone) -> convert(value)`` for a field, or None when values pass through
+    """
+    if type(field) is serializers.CharField or isinstance(field, _PASSTHROUGH_FIELDS):
+        return None
+    if type(field) is serializers.DecimalField and field.decimal_places is not None:
+        convert = _decimal_converter(field)
+    elif type(field) is serializers.DateField and getattr(field, 'format', api_settings.DATE_FORMAT).lower() == ISO_8601:
+        convert = date.isoformat
+    elif type(field) is serializers.DateTimeField:
+        return _datetime_converter(field) or (lambda current_timezone: field.to_representation)
+    else:
+        convert = field.to_representation
+    return lambda current_timezone: convert
+
+
+class RowSerializer:
+    """
+    Renders ``values_list(*paths)`` rows as the dicts the source serializer would produce
+    """
+    def __init__(self, serializer, model):
+        self.paths = []
+        self._columns = self._compile(serializer, model, '')
+
+    def _column(self, path):
+        self.paths.append(path)
+        return len(self.paths) - 1
+
+    def _compile(self, serializer, model, prefix):
+        columns = []
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if field.source == '*' or len(field.source_attrs) != 1:
+                raise NotCompilable(field.field_name)
+            attr = field.source
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if hasattr(model, attr):
+                    raise NotCompilable(field.field_name)
+                # Optional attribute missing on plain instances: DRF skips it too
+                continue
+            path = f'{prefix}{attr}'
+
+            if not model_field.is_relation:
+                columns.append((field.field_name, self._column(path), _converter(field), None))
+            elif model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+                if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+                    related_model = model_field.related_model
+                    # The nested dict is None when the foreign key is NULL
+                    null_column = self._column(path)
+                    nested = self._compile(field, related_model, f'{path}__')
+                    columns.append((field.field_name, null_column, None, nested))
+                elif isinstance(field, serializers.RelatedField) and field.use_pk_only_optimization():
+                    columns.append((field.field_name, self._column(path), None, None))
+                else:
+                    raise NotCompilable(field.field_name)
+            else:
+                raise NotCompilable(field.field_name)
+        return columns
+
+    def _bind(self, columns, current_timezone):
+        return [
+            (
+                name,
+                index,
+                None if bind is None else bind(current_timezone),
+                None if nested is None else self._bind(nested, current_timezone),
+            )
+            for name, index, bind, nested in columns
+        ]
+
+    def _render(self, row, columns):
+        data = {}
+        for name, index, convert, nested in columns:
+            value = row[index]
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                data[name] = self._render(row, nested)
+            elif convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+
+    def render(self, rows):
+        """
+        List of representations of ``rows``, rendered in the current timezone
+        """
+        columns = self._bind(self._columns, timezone.get_current_timezone() if settings.USE_TZ else None)
+        return [self._render(row, columns) for row in rows]
+
+
+def compile_row_serializer(serializer):
+    """
+    ``RowSerializer`` for a (possibly many=True) ModelSerializer, or None if it can't be compiled
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    try:
+        return RowSerializer(serializer, serializer.Meta.model)
+    except NotCompilable:
+        return None
+
+
+_row_serializers = {}
+
+
+class ValuesListMixin:
+    """
+    List view mixin that renders pages from ``values_list()`` rows when the
+    serializer compiles (see ``compile_row_serializer``). Row serializers are
+    compiled once per serializer class.
+    """
+    def get_row_serializer(self):
+        serializer_class = self.get_serializer_class()
+        if serializer_class not in _row_serializers:
+            _row_serializers[serializer_class] = compile_row_serializer(self.get_serializer())
+        return _row_serializers[serializer_class]
+
+    def list(self, request, *args, **kwargs):
+        row_serializer = self.get_row_serializer()
+        if row_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        # Annotations such as search_rank are ordered on without being selected
+        rows = queryset.values_list(*row_serializer.paths)
+        page = self.paginate_queryset(rows)
+        data = row_serializer.render(rows if page is None else page)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
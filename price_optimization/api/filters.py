@@ -1,20 +1,41 @@
 # api/filters.py
 import django_filters
-from django.db.models import Q
+from django_filters.constants import EMPTY_VALUES
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
 from .models import Product, ProductHistory, MarketCondition
+from .search import search_products
+
+class LowerExactFilter(django_filters.CharFilter):
+    """
+    Case-insensitive equality as ``LOWER(field) = LOWER(value)``.
+
+    Unlike ``iexact`` (``UPPER(field::text)`` on PostgreSQL, ``LIKE`` on SQLite)
+    this can use a ``Lower(field)`` expression index.
+    """
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        alias = f"{self.field_name.replace('__', '_')}_lower"
+        return qs.alias(**{alias: Lower(self.field_name)}).filter(**{alias: Lower(Value(value))})
 
 class ProductFilter(django_filters.FilterSet):
     """
     FilterSet for Product model with advanced filtering capabilities
     """
     name = django_filters.CharFilter(lookup_expr='icontains')
-    category = django_filters.CharFilter(lookup_expr='iexact')
+    category = LowerExactFilter()
     description = django_filters.CharFilter(lookup_expr='icontains')
     min_price = django_filters.NumberFilter(field_name='selling_price', lookup_expr='gte')
     max_price = django_filters.NumberFilter(field_name='selling_price', lookup_expr='lte')
     min_rating = django_filters.NumberFilter(field_name='customer_rating', lookup_expr='gte')
     min_stock = django_filters.NumberFilter(field_name='stock_available', lookup_expr='gte')
     is_in_stock = django_filters.BooleanFilter(method='filter_in_stock')
+    # Full-text search over name, category and description (prefix match, ranked)
+    search = django_filters.CharFilter(method='filter_search')
+    
+    def filter_search(self, queryset, name, value):
+        return search_products(queryset, value)
     
     def filter_in_stock(self, queryset, name, value):
         if value:
@@ -24,7 +45,7 @@ class ProductFilter(django_filters.FilterSet):
     class Meta:
         model = Product
         fields = ['name', 'category', 'description', 'min_price', 'max_price', 
-                  'min_rating', 'min_stock', 'is_in_stock']
+                  'min_rating', 'min_stock', 'is_in_stock', 'search']
 
 class ProductHistoryFilter(django_filters.FilterSet):
     """
@@ -32,7 +53,7 @@ class ProductHistoryFilter(django_filters.FilterSet):
     """
     product = django_filters.NumberFilter(field_name='product__product_id')
     product_name = django_filters.CharFilter(field_name='product__name', lookup_expr='icontains')
-    category = django_filters.CharFilter(field_name='product__category', lookup_expr='iexact')
+    category = LowerExactFilter(field_name='product__category')
     start_date = django_filters.DateFilter(field_name='month', lookup_expr='gte')
     end_date = django_filters.DateFilter(field_name='month', lookup_expr='lte')
     
@@ -45,7 +66,7 @@ class MarketConditionFilter(django_filters.FilterSet):
     FilterSet for MarketCondition model
     """
     name = django_filters.CharFilter(lookup_expr='icontains')
-    category = django_filters.CharFilter(lookup_expr='iexact')
+    category = LowerExactFilter()
     trend = django_filters.ChoiceFilter(choices=MarketCondition.TREND_CHOICES)
     active = django_filters.BooleanFilter(method='filter_active')
     start_date = django_filters.DateFilter(field_name='start_date', lookup_expr='gte')
@@ -0,0 +1,235 @@
+# api/forecasting.py
+"""
+Demand forecasting models with a common batch interface.
+
+Every model forecasts many products at once from the product x month history
+arrays built by ``load_history_matrix`` (row-aligned, oldest entry first,
+padding masked out by ``mask``)::
+
+    model.forecast(units, months, mask, fallback_units, current_month) -> int64 array
+
+``fallback_units`` holds each product's current ``units_sold`` and is used for
+products without history. Models are registered by name in ``FORECAST_MODELS``;
+the FORECAST_MODEL and FORECAST_CATEGORY_MODELS settings pick one per product
+category (see ``DemandForecastService.model_names``).
+
+Like ``api.kernels`` nothing here touches Django, so models also run in
+worker processes.
+"""
+import numpy as np
+
+FORECAST_MODELS = {}
+DEFAULT_MODEL = 'baseline'
+
+
+def register_model(name, model):
+    FORECAST_MODELS[name] = model
+    return model
+
+
+def get_model(name):
+    try:
+        return FORECAST_MODELS[name]
+    except KeyError:
+        raise ValueError(f'Unknown forecast model {name!r} (available: {", ".join(sorted(FORECAST_MODELS))})')
+
+
+def _finish(history_forecast, has_history, fallback_units):
+    """
+    Whole units, at least 1; products without history get their current sales plus 10%
+    """
+    fallback_forecast = np.trunc(np.asarray(fallback_units) * 1.1)
+    return np.maximum(1, np.where(has_history, np.trunc(history_forecast), fallback_forecast)).astype(np.int64)
+
+
+def forecast_demand_matrix(units, months, mask, fallback_units, current_month):
+    """
+    The original heuristic: recency-weighted mean of the history times the
+    current calendar month's seasonal ratio and a fixed 10% growth.
+    """
+    counts = mask.sum(axis=1)
+    has_history = counts > 0
+
+    # Time-weighted average (more recent months have higher weight)
+    weights = np.arange(1, units.shape[1] + 1, dtype=np.int64)
+    weighted_sum = (units * weights).sum(axis=1)
+    total_weight = counts * (counts + 1) // 2
+    safe_counts = np.where(has_history, counts, 1)
+    avg_units = weighted_sum / np.where(has_history, total_weight, 1)
+
+    # Simple seasonal adjustment
+    seasonal_mask = mask & (months == current_month)
+    seasonal_counts = seasonal_mask.sum(axis=1)
+    seasonal_avg = np.where(seasonal_mask, units, 0).sum(axis=1) / np.where(seasonal_counts > 0, seasonal_counts, 1)
+    year_avg = units.sum(axis=1) / safe_counts
+    apply_season = (seasonal_counts > 0) & (year_avg > 0)
+    season_factor = np.where(apply_season, seasonal_avg / np.where(apply_season, year_avg, 1.0), 1.0)
+
+    # Apply projected growth and seasonality
+    growth_factor = 1.1  # 10% projected growth
+    return _finish(avg_units * growth_factor * season_factor, has_history, fallback_units)
+
+
+def _month_sums(units, months, mask, values=None):
+    """
+    Per product and calendar month (products x 12, January first): number of
+    entries, and the sum of ``values`` (default: units) over them
+    """
+    rows, columns = np.nonzero(mask)
+    bins = rows * 12 + months[rows, columns] - 1
+    size = units.shape[0] * 12
+    counts = np.bincount(bins, minlength=size).reshape(-1, 12)
+    values = units if values is None else values
+    sums = np.bincount(bins, weights=values[rows, columns], minlength=size).reshape(-1, 12)
+    return counts, sums
+
+
+def _linear_fit(units, mask):
+    """
+    Intercept and slope of a least-squares line through each product's history
+    (x: position in the history); a flat line through single entries
+    """
+    positions = np.arange(units.shape[1], dtype=np.float64)
+    weights = mask.astype(np.float64)
+    values = np.where(mask, units, 0).astype(np.float64)
+    count = weights.sum(axis=1)
+    sum_x = weights @ positions
+    sum_xx = weights @ positions ** 2
+    sum_y = values.sum(axis=1)
+    sum_xy = values @ positions
+
+    denominator = count * sum_xx - sum_x ** 2
+    fitted = denominator > 0
+    slope = np.where(fitted, (count * sum_xy - sum_x * sum_y) / np.where(fitted, denominator, 1), 0.0)
+    intercept = (sum_y - slope * sum_x) / np.maximum(count, 1)
+    return intercept, slope
+
+
+class BaselineModel:
+    """
+    Recency-weighted mean with a same-month seasonal ratio and 10% growth
+    """
+    def forecast(self, units, months, mask, fallback_units, current_month):
+        return forecast_demand_matrix(units, months, mask, fallback_units, current_month)
+
+
+class HoltWintersModel:
+    """
+    Additive Holt-Winters exponential smoothing with a damped trend and a
+    seasonal term per calendar month.
+
+    Level, trend and seasonal terms start from a straight-line fit of the
+    product's history and the mean residual of each calendar month. The
+    recursion then steps through the history columns, updating every product
+    with an entry in that column at once.
+    """
+    def __init__(self, alpha=0.4, beta=0.1, gamma=0.3, damping=0.98):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.damping = damping
+
+    def forecast(self, units, months, mask, fallback_units, current_month):
+        products, width = units.shape
+        has_history = mask.any(axis=1)
+        rows = np.arange(products)
+        # Padding has month 0; any valid index works since those cells are never applied
+        month_index = np.maximum(months, 1) - 1
+
+        level, trend = _linear_fit(units, mask)
+        residuals = units - (level[:, None] + trend[:, None] * np.arange(width))
+        month_counts, month_residuals = _month_sums(units, months, mask, values=residuals)
+        season = month_residuals / np.maximum(month_counts, 1)
+
+        # Level and trend as of one step before the first entry
+        level = level - trend
+        for column in range(width):
+            observed = mask[:, column]
+            if not observed.any():
+                # Histories are left-aligned: no product has later entries
+                break
+            value = units[:, column]
+            seasonal = season[rows, month_index[:, column]]
+
+            new_level = self.alpha * (value - seasonal) + (1 - self.alpha) * (level + self.damping * trend)
+            new_trend = self.beta * (new_level - level) + (1 - self.beta) * self.damping * trend
+            new_seasonal = self.gamma * (value - new_level) + (1 - self.gamma) * seasonal
+
+            level = np.where(observed, new_level, level)
+            trend = np.where(observed, new_trend, trend)
+            season[rows[observed], month_index[observed, column]] = new_seasonal[observed]
+
+        history_forecast = level + self.damping * trend + season[:, current_month - 1]
+        return _finish(history_forecast, has_history, fallback_units)
+
+
+class LeastSquaresModel:
+    """
+    Per product least-squares fit of ``units = intercept + trend * t + month effect``
+    (t: position in the history), extrapolated one entry ahead.
+
+    Month effects are ridge-regularized towards zero, which keeps products with
+    short or gappy histories solvable. The normal equations of all products are
+    built from per-product sums and solved as one batched linear system.
+    """
+    def __init__(self, ridge=1.0):
+        self.ridge = ridge
+
+    def forecast(self, units, months, mask, fallback_units, current_month):
+        products, width = units.shape
+        counts = mask.sum(axis=1)
+        has_history = counts > 0
+        weights = mask.astype(np.float64)
+        values = np.where(mask, units, 0).astype(np.float64)
+        positions = np.broadcast_to(np.arange(width, dtype=np.float64), (products, width))
+
+        month_counts, month_units = _month_sums(units, months, mask)
+        _, month_positions = _month_sums(units, months, mask, values=positions)
+
+        # Unknowns: intercept, trend, 12 month effects
+        xtx = np.zeros((products, 14, 14))
+        xtx[:, 0, 0] = counts
+        xtx[:, 0, 1] = xtx[:, 1, 0] = (weights * positions).sum(axis=1)
+        xtx[:, 1, 1] = (weights * positions ** 2).sum(axis=1) + 1e-6
+        xtx[:, 0, 2:] = xtx[:, 2:, 0] = month_counts
+        xtx[:, 1, 2:] = xtx[:, 2:, 1] = month_positions
+        diagonal = np.arange(2, 14)
+        xtx[:, diagonal, diagonal] = month_counts + self.ridge
+        xtx[~has_history] = np.eye(14)
+
+        xty = np.zeros((products, 14))
+        xty[:, 0] = values.sum(axis=1)
+        xty[:, 1] = (values * positions).sum(axis=1)
+        xty[:, 2:] = month_units
+
+        coefficients = np.linalg.solve(xtx, xty[..., None])[..., 0]
+        history_forecast = (
+            coefficients[:, 0] + coefficients[:, 1] * counts + coefficients[:, 1 + current_month]
+        )
+        return _finish(history_forecast, has_history, fallback_units)
+
+
+register_model('baseline', BaselineModel())
+register_model('holt_winters', HoltWintersModel())
+register_model('least_squares', LeastSquaresModel())
+
+
+def forecast_by_model(model_names, units, months, mask, fallback_units, current_month):
+    """
+    Forecast every row with the model named in ``model_names`` (aligned with the
+    rows; None: the default model for all), one batch per model
+    """
+    if model_names is None:
+        return get_model(DEFAULT_MODEL).forecast(units, months, mask, fallback_units, current_month)
+
+    model_names = np.asarray(model_names)
+    fallback_units = np.asarray(fallback_units)
+    forecasts = np.empty(len(model_names), dtype=np.int64)
+    for name in np.unique(model_names):
+        rows = np.flatnonzero(model_names == name)
+        # Drop the padding columns no product of this batch uses
+        width = int(mask[rows].sum(axis=1).max(initial=0))
+        forecasts[rows] = get_model(str(name)).forecast(
+            units[rows, :width], months[rows, :width], mask[rows, :width], fallback_units[rows], current_month
+        )
+    return forecasts
@@ -0,0 +1,162 @@
+# api/health.py
+"""
+Liveness and readiness probes.
+
+Liveness only says that the process answers requests. Readiness checks what a
+request needs:
+
+- ``database``: a ``SELECT 1`` round trip
+- ``migrations``: no unapplied migrations (checked until they are all applied once)
+- ``cache``: a set/get round trip
+- ``workers``: share of web workers busy with other requests, from
+  ``api.metrics.requests_in_progress`` (all gunicorn workers only with
+  PROMETHEUS_MULTIPROC_DIR set)
+
+Each dependency check runs in a thread with a timeout (``HEALTH_CHECK_TIMEOUT``)
+and at most one run per check is in flight in a process: a probe that arrives
+while a check still hangs waits for that run instead of starting another.
+Results are reused for ``HEALTH_CHECK_INTERVAL`` seconds, so however often the
+load balancer probes, the database sees one probe query per process and interval.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import JsonResponse
+from django.utils.cache import add_never_cache_headers
+
+from .metrics import requests_in_progress
+
+
+class HealthCheckError(Exception):
+    pass
+
+
+def check_database():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    finally:
+        # Checks run in their own threads: don't keep a connection per probe thread open
+        connection.close()
+
+
+_migrations_applied = False
+
+
+def check_migrations():
+    global _migrations_applied
+    if _migrations_applied:
+        return None
+    try:
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    finally:
+        connection.close()
+    if plan:
+        raise HealthCheckError(f'{len(plan)} unapplied migration(s)')
+    # Deploying new migrations means deploying new processes
+    _migrations_applied = True
+    return None
+
+
+def check_cache():
+    key = f'health-check:{os.getpid()}'
+    value = time.time_ns()
+    cache.set(key, value, timeout=60)
+    if cache.get(key) != value:
+        raise HealthCheckError('value written to the cache could not be read back')
+
+
+class DependencyCheck:
+    """
+    A readiness check run in the probe thread pool, with a timeout and a cached result
+    """
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+        self.lock = threading.Lock()
+        self.future = None
+        self.result = None
+        self.checked_at = 0.0
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            detail = self.func()
+            result = {'status': 'ok'}
+            if detail:
+                result.update(detail)
+        except Exception as exc:
+            result = {'status': 'fail', 'error': str(exc) or type(exc).__name__}
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    def check(self):
+        with self.lock:
+            if self.result is not None and time.monotonic() - self.checked_at < settings.HEALTH_CHECK_INTERVAL:
+                return self.result
+            if self.future is None or self.future.done():
+                self.future = _executor.submit(self._run)
+            future = self.future
+
+        timeout = settings.HEALTH_CHECK_TIMEOUT
+        try:
+            result = future.result(timeout=timeout)
+        except TimeoutError:
+            result = {'status': 'fail', 'error': f'timed out after {timeout}s'}
+        with self.lock:
+            self.result, self.checked_at = result, time.monotonic()
+        return result
+
+
+DEPENDENCY_CHECKS = [
+    DependencyCheck('database', check_database),
+    DependencyCheck('migrations', check_migrations),
+    DependencyCheck('cache', check_cache),
+]
+# One thread per check: a hanging check can't hold up the others
+_executor = ThreadPoolExecutor(max_workers=len(DEPENDENCY_CHECKS), thread_name_prefix='health-check')
+
+
+def check_workers():
+    """
+    Share of the request workers busy with requests other than the probe itself
+    """
+    capacity = max(1, settings.HEALTH_WORKER_CAPACITY)
+    busy = max(0, requests_in_progress() - 1)
+    saturation = round(busy / capacity, 2)
+    return {
+        'status': 'fail' if saturation >= settings.HEALTH_MAX_SATURATION else 'ok',
+        'busy': int(busy),
+        'capacity': capacity,
+        'saturation': saturation,
+    }
+
+
+def readiness_report():
+    """
+    ``(ready, {check name: result})``
+    """
+    checks = {check.name: check.check() for check in DEPENDENCY_CHECKS}
+    checks['workers'] = check_workers()
+    return all(result['status'] == 'ok' for result in checks.values()), checks
+
+
+def liveness(request):
+    response = JsonResponse({'status': 'ok'})
+    add_never_cache_headers(response)
+    return response
+
+
+def readiness(request):
+    ready, checks = readiness_report()
+    response = JsonResponse({'status': 'ok' if ready else 'fail', 'checks': checks}, status=200 if ready else 503)
+    add_never_cache_headers(response)
+    return response
@@ -0,0 +1,285 @@
+# api/ingestion.py
+"""
+Bulk ingestion of ProductHistory rows from CSV or NDJSON.
+
+Rows are read in batches, validated column-wise with NumPy masks and upserted
+on ``(product, month)``: with PostgreSQL COPY into a temporary table when that
+backend is active, with ``bulk_create(update_conflicts=True)`` elsewhere.
+Invalid rows are reported individually and never abort the batch.
+"""
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.db import connection, transaction
+
+from .caching import bump_history_version
+from .models import Product, ProductHistory
+from .services import ElasticityService, ForecastFeatureService, _id_chunks
+
+COLUMNS = ('product', 'month', 'units_sold', 'selling_price', 'cost_price')
+PRICE_LIMIT = 10 ** 8  # max_digits=10, decimal_places=2
+INT_LIMIT = 2 ** 31
+MAX_REPORTED_ERRORS = 1000
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield row
+
+
+def read_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {'__invalid__': 'Line is not a JSON object.'}
+
+
+READERS = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+def _parse_column(values, parse, fill):
+    """
+    Parse a column with ``parse`` into an object array (``fill`` where parsing
+    failed); returns ``(parsed values, ok mask)``
+    """
+    parsed = np.full(len(values), fill, dtype=object)
+    ok = np.ones(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            parsed[i] = parse(value)
+        except (TypeError, ValueError, InvalidOperation, ArithmeticError):
+            ok[i] = False
+    return parsed, ok
+
+
+def _parse_int(value):
+    if isinstance(value, bool):
+        raise ValueError
+    if isinstance(value, str):
+        value = value.strip()
+    number = int(value)
+    if isinstance(value, float) and number != value:
+        raise ValueError
+    return number
+
+
+def _parse_month(value):
+    # Accepts YYYY-MM or YYYY-MM-DD; history is stored on the first day of the month
+    value = str(value).strip()
+    if len(value) == 7:
+        value += '-01'
+    return date.fromisoformat(value).replace(day=1)
+
+
+def _parse_price(value):
+    if isinstance(value, float):
+        value = repr(value)
+    price = Decimal(str(value).strip())
+    if not price.is_finite() or price.as_tuple().exponent < -2:
+        raise ValueError
+    return price
+
+
+class HistoryBatchValidator:
+    """
+    Validates a batch of raw rows column by column. ``valid`` is a boolean mask
+    over the batch and ``errors`` maps row index -> {column: message}.
+
+    Values are parsed one by one into per-column arrays; every check after that
+    is a mask operation over the whole batch.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.errors = {}
+
+        columns = {name: [row.get(name) for row in rows] for name in COLUMNS}
+        unreadable = np.array(['__invalid__' in row for row in rows], dtype=bool)
+        for i in np.flatnonzero(unreadable).tolist():
+            self._error(i, 'non_field_errors', rows[i]['__invalid__'])
+
+        self.product_ids, product_ok = _parse_column(columns['product'], _parse_int, 0)
+        self.months, month_ok = _parse_column(columns['month'], _parse_month, None)
+        self.units_sold, units_ok = _parse_column(columns['units_sold'], _parse_int, 0)
+        self.selling_prices, selling_ok = _parse_column(columns['selling_price'], _parse_price, Decimal(0))
+        self.cost_prices, cost_ok = _parse_column(columns['cost_price'], _parse_price, Decimal(0))
+
+        # Range checks compare the parsed Python numbers element-wise, so values too
+        # large for a machine type are simply out of range
+        product_in_range = (self.product_ids > 0) & (self.product_ids < INT_LIMIT)
+        product_array = np.where(product_in_range, self.product_ids, 0).astype(np.int64)
+        units_out_of_range = (self.units_sold < 0) | (self.units_sold >= INT_LIMIT)
+        selling_out_of_range = (self.selling_prices < 0) | (self.selling_prices >= PRICE_LIMIT)
+        cost_out_of_range = (self.cost_prices < 0) | (self.cost_prices >= PRICE_LIMIT)
+
+        existing = set()
+        for chunk in _id_chunks(np.unique(product_array[product_ok & product_in_range]).tolist()):
+            existing.update(Product.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+        product_exists = product_in_range & np.isin(
+            product_array, np.fromiter(existing, dtype=np.int64, count=len(existing))
+        )
+
+        checks = [
+            ('product', ~product_ok, 'A valid integer is required.'),
+            ('product', product_ok & ~product_exists, 'Product does not exist.'),
+            ('month', ~month_ok, 'Enter a valid month (YYYY-MM or YYYY-MM-DD).'),
+            ('units_sold', ~units_ok, 'A valid integer is required.'),
+            ('units_sold', units_ok & units_out_of_range, 'Must be a non-negative integer.'),
+            ('selling_price', ~selling_ok, 'A valid number with at most 2 decimal places is required.'),
+            ('selling_price', selling_ok & selling_out_of_range, 'Out of range.'),
+            ('cost_price', ~cost_ok, 'A valid number with at most 2 decimal places is required.'),
+            ('cost_price', cost_ok & cost_out_of_range, 'Out of range.'),
+        ]
+        # Rows that could not be read at all only get their read error
+        readable = ~unreadable
+        valid = readable.copy()
+        for column, failed, message in checks:
+            failed = failed & readable
+            valid &= ~failed
+            for i in np.flatnonzero(failed).tolist():
+                self._error(i, column, message)
+        self.valid = valid
+        self._product_array = product_array
+
+    def _error(self, index, column, message):
+        self.errors.setdefault(index, {}).setdefault(column, []).append(message)
+
+    def valid_rows(self):
+        """
+        ``(product_id, month, units_sold, selling_price, cost_price)`` of the valid rows,
+        the last row winning when a (product, month) appears more than once
+        """
+        indexes = np.flatnonzero(self.valid)
+        if not len(indexes):
+            return []
+        keys = np.column_stack([
+            self._product_array[indexes],
+            np.fromiter((month.toordinal() for month in self.months[indexes]), dtype=np.int64, count=len(indexes)),
+        ])
+        # First occurrence in the reversed batch is the last one in the batch
+        _, last = np.unique(keys[::-1], axis=0, return_index=True)
+        indexes = np.sort(indexes[len(indexes) - 1 - last])
+        return list(zip(
+            self._product_array[indexes].tolist(),
+            self.months[indexes].tolist(),
+            self.units_sold[indexes].tolist(),
+            self.selling_prices[indexes].tolist(),
+            self.cost_prices[indexes].tolist(),
+        ))
+
+
+def _upsert_bulk_create(rows):
+    ProductHistory.objects.bulk_create(
+        [
+            ProductHistory(
+                product_id=product_id,
+                month=month,
+                units_sold=units_sold,
+                selling_price=selling_price,
+                cost_price=cost_price,
+            )
+            for product_id, month, units_sold, selling_price, cost_price in rows
+        ],
+        update_conflicts=True,
+        unique_fields=['product', 'month'],
+        update_fields=['units_sold', 'selling_price', 'cost_price'],
+    )
+
+
+def _upsert_copy(rows):
+    """
+    PostgreSQL: COPY the batch into a temporary table, then upsert it in one statement
+    """
+    table = connection.ops.quote_name(ProductHistory._meta.db_table)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        (product_id, month.isoformat(), units_sold, selling_price, cost_price)
+        for product_id, month, units_sold, selling_price, cost_price in rows
+    )
+    buffer.seek(0)
+    copy_sql = 'COPY history_ingest FROM STDIN WITH (FORMAT csv)'
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE history_ingest ('
+            'product_id integer, month date, units_sold integer, '
+            'selling_price numeric(10, 2), cost_price numeric(10, 2)'
+            ') ON COMMIT DROP'
+        )
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):  # psycopg2
+            raw_cursor.copy_expert(copy_sql, buffer)
+        else:  # psycopg 3
+            with raw_cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+        cursor.execute(
+            f'INSERT INTO {table} (product_id, month, units_sold, selling_price, cost_price, created_at) '
+            'SELECT product_id, month, units_sold, selling_price, cost_price, now() FROM history_ingest '
+            'ON CONFLICT (product_id, month) DO UPDATE SET '
+            'units_sold = EXCLUDED.units_sold, '
+            'selling_price = EXCLUDED.selling_price, '
+            'cost_price = EXCLUDED.cost_price'
+        )
+
+
+def upsert_history(rows):
+    """
+    Insert or update history rows on (product, month), then refresh the derived
+    forecast features, elasticities and caches that bulk writes bypass (no model
+    signals fire).
+    """
+    if not rows:
+        return
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            _upsert_copy(rows)
+        else:
+            _upsert_bulk_create(rows)
+        product_ids = sorted({row[0] for row in rows})
+        ForecastFeatureService.rebuild(product_ids)
+        ElasticityService.rebuild(product_ids)
+    bump_history_version(*product_ids)
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_history(stream, input_format='csv', batch_size=5000):
+    """
+    Validate and upsert history rows from a text stream in ``input_format`` ('csv' or 'ndjson').
+
+    Returns a report with the number of rows received and upserted plus per-row
+    errors (``row`` is the 1-based data row number, at most MAX_REPORTED_ERRORS).
+    """
+    report = {'received': 0, 'upserted': 0, 'error_count': 0, 'errors': []}
+    for batch in _batches(READERS[input_format](stream), batch_size):
+        validator = HistoryBatchValidator(batch)
+        rows = validator.valid_rows()
+        upsert_history(rows)
+
+        for index in sorted(validator.errors):
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': report['received'] + index + 1, 'errors': validator.errors[index]})
+        report['error_count'] += len(validator.errors)
+        report['upserted'] += len(rows)
+        report['received'] += len(batch)
+    return report
@@ -0,0 +1,394 @@
+# api/kernels.py
+"""
+Pure NumPy forecasting and pricing math used by the batch services.
+
+Nothing in this module touches Django, so its functions can run in worker
+processes that have no database access (see ``optimize_shard``).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .forecasting import forecast_by_model
+
+
+def forecast_from_features(weighted_sum, total_weight, counts, units_sum, season_sum, season_count, fallback_units):
+    """
+    Demand forecasts from per-product history aggregates (ProductForecastFeatures).
+
+    Same formula as the baseline model (``api.forecasting.forecast_demand_matrix``);
+    ``season_sum``/``season_count`` are the units and entries of the current
+    calendar month. All arguments are 1-D arrays aligned by product.
+    """
+    weighted_sum = np.asarray(weighted_sum, dtype=np.int64)
+    total_weight = np.asarray(total_weight, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    units_sum = np.asarray(units_sum, dtype=np.int64)
+    season_sum = np.asarray(season_sum, dtype=np.int64)
+    season_count = np.asarray(season_count, dtype=np.int64)
+    has_history = counts > 0
+
+    # Time-weighted average (more recent months have higher weight)
+    avg_units = weighted_sum / np.where(has_history, total_weight, 1)
+
+    # Simple seasonal adjustment
+    seasonal_avg = season_sum / np.where(season_count > 0, season_count, 1)
+    year_avg = units_sum / np.where(has_history, counts, 1)
+    apply_season = (season_count > 0) & (year_avg > 0)
+    season_factor = np.where(apply_season, seasonal_avg / np.where(apply_season, year_avg, 1.0), 1.0)
+
+    # Apply projected growth and seasonality
+    growth_factor = 1.1  # 10% projected growth
+    history_forecast = np.trunc(avg_units * growth_factor * season_factor)
+    fallback_forecast = np.trunc(np.asarray(fallback_units) * 1.1)
+    return np.maximum(1, np.where(has_history, history_forecast, fallback_forecast)).astype(np.int64)
+
+
+def history_aggregates(units, months, mask):
+    """
+    ProductForecastFeatures aggregates from product x month history arrays:
+    ``(counts, weighted_sum, units_sum, month_units_sums, month_counts)`` where the
+    last two are (products x 12) arrays, January first.
+    """
+    counts = mask.sum(axis=1)
+    weights = np.arange(1, units.shape[1] + 1, dtype=np.int64)
+    weighted_sum = (units * weights).sum(axis=1)
+    units_sum = units.sum(axis=1)
+
+    rows, columns = np.nonzero(mask)
+    month_units_sums = np.zeros((units.shape[0], 12), dtype=np.int64)
+    month_counts = np.zeros((units.shape[0], 12), dtype=np.int64)
+    np.add.at(month_units_sums, (rows, months[rows, columns] - 1), units[rows, columns])
+    np.add.at(month_counts, (rows, months[rows, columns] - 1), 1)
+    return counts, weighted_sum, units_sum, month_units_sums, month_counts
+
+
+def centered_log_sums(counts, sum_x, sum_y, sum_xx, sum_xy):
+    """
+    Centered sums of squares ``(sxx, sxy)`` of per-product log-log regression
+    sums (ProductElasticity); zero for products with fewer than two entries
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    sum_x = np.asarray(sum_x, dtype=np.float64)
+    safe_counts = np.maximum(counts, 1)
+    sxx = np.asarray(sum_xx, dtype=np.float64) - sum_x ** 2 / safe_counts
+    sxy = np.asarray(sum_xy, dtype=np.float64) - sum_x * np.asarray(sum_y, dtype=np.float64) / safe_counts
+    fitted = counts > 1
+    return np.where(fitted, np.maximum(sxx, 0.0), 0.0), np.where(fitted, sxy, 0.0)
+
+
+def fit_elasticities(sxx, sxy, prior, prior_strength, max_elasticity=5.0):
+    """
+    Price elasticities (negated log-log slopes) shrunk towards ``prior``.
+
+    Each product's own slope ``sxy / sxx`` is weighted by ``sxx`` (its price
+    variation) against ``prior_strength`` for the prior, so products with
+    sparse or flat price history stay close to ``prior``. Results are clipped
+    to ``[0, max_elasticity]``.
+    """
+    sxx = np.asarray(sxx, dtype=np.float64)
+    sxy = np.asarray(sxy, dtype=np.float64)
+    estimates = (-sxy + prior_strength * np.asarray(prior, dtype=np.float64)) / (sxx + prior_strength)
+    return np.clip(estimates, 0.0, max_elasticity)
+
+
+def compute_optimized_prices(cost_prices, selling_prices, market_factors, margin_target=0.3, price_sensitivity=1.0):
+    """
+    Array form of the ``optimize_price`` formula: blend current and target-margin
+    prices, apply market factors and clamp to the minimum margin. Every argument
+    is a 1-D array aligned by product (``market_factors`` may be None,
+    ``price_sensitivity`` a single value for all products).
+    """
+    prices = _blended_prices(cost_prices, selling_prices, market_factors, margin_target, price_sensitivity)
+    # Python's round() keeps results identical to the per-product path
+    return [round(price, 2) for price in prices.tolist()]
+
+
+def _blended_prices(cost_prices, selling_prices, market_factors, margin_target, price_sensitivity):
+    cost_prices = np.asarray(cost_prices, dtype=np.float64)
+    selling_prices = np.asarray(selling_prices, dtype=np.float64)
+
+    base_optimal_prices = cost_prices * (1 + margin_target)
+    elasticity_weight = np.clip(price_sensitivity, 0.1, 2.0)
+    blended_prices = (selling_prices * elasticity_weight + base_optimal_prices) / (1 + elasticity_weight)
+
+    if market_factors is not None:
+        blended_prices = blended_prices * np.asarray(market_factors, dtype=np.float64)
+
+    min_margin = 0.05  # 5% minimum margin
+    minimum_prices = cost_prices * (1 + min_margin)
+
+    return np.maximum(blended_prices, minimum_prices)
+
+
+def price_bounds(cost_prices, reference_prices, min_margin=0.05, price_range=(0.5, 2.0)):
+    """
+    Lowest and highest candidate price per product: ``price_range`` relative to
+    the reference price, but never below cost plus ``min_margin``
+    """
+    cost_prices = np.asarray(cost_prices, dtype=np.float64)
+    reference_prices = np.asarray(reference_prices, dtype=np.float64)
+    lower = np.maximum(reference_prices * price_range[0], cost_prices * (1 + min_margin))
+    upper = np.maximum(reference_prices * price_range[1], lower)
+    return lower, upper
+
+
+def demand_at_prices(prices, reference_prices, reference_demand, elasticities):
+    """
+    Constant-elasticity demand ``reference_demand * (price / reference_price) ** -elasticity``.
+
+    ``prices`` is a (products x points) grid, the other arguments are 1-D and
+    aligned by product; ``elasticities`` may also be a (products x points) array
+    of arc elasticities between the reference price and each grid price.
+    """
+    reference_prices = np.asarray(reference_prices, dtype=np.float64)[:, None]
+    reference_demand = np.asarray(reference_demand, dtype=np.float64)[:, None]
+    elasticities = np.asarray(elasticities, dtype=np.float64)
+    if elasticities.ndim == 1:
+        elasticities = elasticities[:, None]
+    return reference_demand * (prices / reference_prices) ** -elasticities
+
+
+def demand_curves(reference_prices, reference_demand, elasticities, points=13, price_range=(0.7, 1.3)):
+    """
+    Demand curves of many products: ``points`` prices evenly spaced over
+    ``price_range`` times the reference price, and the constant-elasticity
+    demand at each. Returns ``(prices, demand)``, both (products x points).
+    """
+    steps = np.linspace(price_range[0], price_range[1], points)
+    prices = np.asarray(reference_prices, dtype=np.float64)[:, None] * steps
+    return prices, demand_at_prices(prices, reference_prices, reference_demand, elasticities)
+
+
+def grid_profit_prices(cost_prices, lower, upper, reference_prices, reference_demand, elasticities, stock,
+                       grid_points=201):
+    """
+    Profit-maximizing prices found by evaluating ``(price - cost) * min(demand, stock)``
+    on ``grid_points`` evenly spaced prices between ``lower`` and ``upper`` for
+    all products at once (one products x points array per quantity).
+    """
+    steps = np.linspace(0.0, 1.0, max(2, grid_points))
+    grid = lower[:, None] + (upper - lower)[:, None] * steps
+    units = np.minimum(
+        demand_at_prices(grid, reference_prices, reference_demand, elasticities),
+        np.asarray(stock, dtype=np.float64)[:, None],
+    )
+    profit = (grid - np.asarray(cost_prices, dtype=np.float64)[:, None]) * units
+    return grid[np.arange(len(grid)), profit.argmax(axis=1)]
+
+
+def closed_form_profit_prices(cost_prices, lower, upper, reference_prices, reference_demand, elasticities, stock):
+    """
+    Exact maximizers of the same profit as ``grid_profit_prices`` for constant
+    elasticities.
+
+    Unconstrained, the optimum is the markup price ``cost * e / (e - 1)`` (no
+    optimum for ``e <= 1``: profit grows with the price). Below the price at
+    which demand falls to the stock every extra unit of price is profit, so the
+    optimum is the larger of the two, clamped to the bounds (profit rises up to
+    it and falls after it).
+    """
+    cost_prices = np.asarray(cost_prices, dtype=np.float64)
+    reference_prices = np.asarray(reference_prices, dtype=np.float64)
+    reference_demand = np.asarray(reference_demand, dtype=np.float64)
+    elasticities = np.asarray(elasticities, dtype=np.float64)
+    stock = np.asarray(stock, dtype=np.float64)
+
+    elastic = elasticities > 1
+    markup_prices = np.where(
+        elastic, cost_prices * elasticities / np.where(elastic, elasticities - 1, 1.0), upper
+    )
+    # Price at which demand falls to the stock, in logs: it overflows for elasticities near 0
+    constrained = (stock > 0) & (reference_demand > 0) & (elasticities > 0)
+    log_ratio = np.log(np.where(constrained, reference_demand, 1.0) / np.where(constrained, stock, 1.0))
+    stock_prices = np.where(
+        constrained,
+        reference_prices * np.exp(np.minimum(
+            log_ratio / np.where(constrained, elasticities, 1.0), np.log(upper / reference_prices) + 1
+        )),
+        0.0,
+    )
+    return np.clip(np.maximum(markup_prices, stock_prices), lower, upper)
+
+
+def compute_profit_prices(cost_prices, selling_prices, market_factors, demand_forecasts, elasticities, stock,
+                          min_margin=0.05, price_range=(0.5, 2.0), grid_points=0):
+    """
+    Prices that maximize expected profit under constant-elasticity demand.
+
+    Demand is anchored at the forecast for the current price (times the market
+    factor: market conditions move the whole demand curve along the price
+    axis), sales are capped by the stock and candidate prices are bounded by
+    ``price_bounds``. Products without stock keep their (bounded) reference
+    price. ``grid_points`` > 0 evaluates a price grid of that size instead of
+    the closed form. Arguments are 1-D arrays aligned by product
+    (``market_factors`` may be None).
+    """
+    prices = _profit_prices(
+        cost_prices, selling_prices, market_factors, demand_forecasts, elasticities, stock, min_margin, price_range,
+        grid_points,
+    )
+    return [round(price, 2) for price in prices.tolist()]
+
+
+def _profit_prices(cost_prices, selling_prices, market_factors, demand_forecasts, elasticities, stock, min_margin,
+                   price_range, grid_points):
+    cost_prices = np.asarray(cost_prices, dtype=np.float64)
+    reference_prices = np.asarray(selling_prices, dtype=np.float64)
+    if market_factors is not None:
+        reference_prices = reference_prices * np.asarray(market_factors, dtype=np.float64)
+    demand_forecasts = np.asarray(demand_forecasts, dtype=np.float64)
+    elasticities = np.broadcast_to(np.asarray(elasticities, dtype=np.float64), cost_prices.shape)
+    stock = np.asarray(stock, dtype=np.float64)
+
+    lower, upper = price_bounds(cost_prices, reference_prices, min_margin, price_range)
+    solver = partial(grid_profit_prices, grid_points=grid_points) if grid_points > 0 else closed_form_profit_prices
+    prices = solver(cost_prices, lower, upper, reference_prices, demand_forecasts, elasticities, stock)
+    return np.where(stock > 0, prices, np.clip(reference_prices, lower, upper))
+
+
+def sweep_prices(cost_prices, selling_prices, market_factors, demand_forecasts, elasticities, stock,
+                 margin_targets, price_sensitivities, consider_market, pricing, price_range=(0.5, 2.0),
+                 grid_points=0):
+    """
+    Optimized prices of every product under every scenario, as a (scenarios x
+    products) array.
+
+    Product arguments are 1-D arrays aligned by product (``market_factors`` the
+    active factors, applied only in scenarios that consider the market);
+    scenario arguments are 1-D arrays aligned by scenario, with NaN price
+    sensitivities standing for each product's estimated elasticity. Returns
+    ``(prices, scenario_elasticities, reference_prices)``, the last two also
+    (scenarios x products), for ``expected_outcomes``.
+    """
+    shape = (len(margin_targets), len(cost_prices))
+    sensitivities = np.asarray(price_sensitivities, dtype=np.float64)[:, None]
+    scenario_elasticities = np.where(np.isnan(sensitivities), np.asarray(elasticities, dtype=np.float64), sensitivities)
+    scenario_factors = np.where(
+        np.asarray(consider_market, dtype=bool)[:, None], np.asarray(market_factors, dtype=np.float64), 1.0
+    )
+    margins = np.broadcast_to(np.asarray(margin_targets, dtype=np.float64)[:, None], shape)
+    costs, selling, demand, units_in_stock = (
+        np.broadcast_to(np.asarray(values, dtype=np.float64), shape)
+        for values in (cost_prices, selling_prices, demand_forecasts, stock)
+    )
+
+    prices = np.empty(shape)
+    profit_rows = np.asarray(pricing) == 'profit'
+    for rows, profit in ((~profit_rows, False), (profit_rows, True)):
+        if not rows.any():
+            continue
+        # Flattened, each (scenario, product) cell is one "product" of the 1-D kernels
+        cells = [values[rows].ravel() for values in (costs, selling, scenario_factors, scenario_elasticities)]
+        if profit:
+            solved = _profit_prices(
+                cells[0], cells[1], cells[2], demand[rows].ravel(), cells[3], units_in_stock[rows].ravel(),
+                0.05, price_range, grid_points,
+            )
+        else:
+            solved = _blended_prices(cells[0], cells[1], cells[2], margins[rows].ravel(), cells[3])
+        prices[rows] = solved.reshape(-1, shape[1])
+    # np.round may differ from the single-product paths' round() by a cent on exact halves
+    return np.round(prices, 2), scenario_elasticities, selling * scenario_factors
+
+
+def expected_outcomes(prices, reference_prices, cost_prices, demand_forecasts, elasticities, stock):
+    """
+    Expected units sold, revenue and profit at ``prices`` under the constant-elasticity
+    demand of ``compute_profit_prices`` (arrays broadcast against each other)
+    """
+    units = np.minimum(
+        np.asarray(demand_forecasts, dtype=np.float64) * (prices / reference_prices) ** -np.asarray(elasticities),
+        np.asarray(stock, dtype=np.float64),
+    )
+    revenue = prices * units
+    return units, revenue, revenue - np.asarray(cost_prices, dtype=np.float64) * units
+
+
+def optimize_shard(shard, current_month, margin_target=0.3, price_sensitivity=1.0, pricing='blend',
+                   price_range=(0.5, 2.0), grid_points=0):
+    """
+    Forecast and optimize one shard of preloaded product arrays.
+
+    ``shard`` is a dict of row-aligned arrays: ``units``, ``months``, ``mask``,
+    ``fallback_units``, ``models`` (forecast model names, see ``api.forecasting``),
+    ``cost_prices``, ``selling_prices``, ``market_factors`` (None when market
+    conditions are ignored), ``price_sensitivities`` (None: ``price_sensitivity``
+    for every product) and, for ``pricing='profit'``, ``stock``.
+
+    ``pricing`` picks ``compute_optimized_prices`` (``'blend'``) or
+    ``compute_profit_prices`` (``'profit'``). Returns ``(forecasts, prices)``.
+    """
+    if shard.get('price_sensitivities') is not None:
+        price_sensitivity = shard['price_sensitivities']
+    demand_forecasts = forecast_by_model(
+        shard.get('models'), shard['units'], shard['months'], shard['mask'], shard['fallback_units'], current_month
+    )
+    if pricing == 'profit':
+        optimized_prices = compute_profit_prices(
+            shard['cost_prices'],
+            shard['selling_prices'],
+            shard['market_factors'],
+            demand_forecasts,
+            price_sensitivity,
+            shard['stock'],
+            price_range=price_range,
+            grid_points=grid_points,
+        )
+    else:
+        optimized_prices = compute_optimized_prices(
+            shard['cost_prices'],
+            shard['selling_prices'],
+            shard['market_factors'],
+            margin_target=margin_target,
+            price_sensitivity=price_sensitivity,
+        )
+    return demand_forecasts.tolist(), optimized_prices
+
+
+def forecast_shard(shard, current_month):
+    """
+    Forecast one shard of preloaded history arrays (see ``optimize_shard``).
+    """
+    return forecast_by_model(
+        shard.get('models'), shard['units'], shard['months'], shard['mask'], shard['fallback_units'], current_month
+    ).tolist()
+
+
+# Arrays shared with pool workers; set once per worker by the pool initializer
+_shared_arrays = None
+
+
+def _share_arrays(arrays):
+    global _shared_arrays
+    _shared_arrays = arrays
+
+
+def _slice_arrays(arrays, start, stop):
+    return {key: None if value is None else value[start:stop] for key, value in arrays.items()}
+
+
+def _run_shard(func, bounds, **kwargs):
+    return func(_slice_arrays(_shared_arrays, *bounds), **kwargs)
+
+
+def run_sharded(func, arrays, workers=1, shard_size=None, **kwargs):
+    """
+    Partition a dict of row-aligned arrays into shards of ``shard_size`` rows,
+    run ``func(shard, **kwargs)`` on each and return the results in shard order.
+
+    With ``workers`` > 1 the shards run in a process pool. The arrays are handed
+    to each worker once when it starts (inherited without copying under "fork"),
+    so tasks only carry row bounds. None values are passed through to every shard.
+    """
+    total = len(next(value for value in arrays.values() if value is not None))
+    shard_size = max(1, shard_size or total)
+    bounds = [(start, min(start + shard_size, total)) for start in range(0, total, shard_size)] or [(0, 0)]
+
+    if workers <= 1 or len(bounds) <= 1:
+        return [func(_slice_arrays(arrays, start, stop), **kwargs) for start, stop in bounds]
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(bounds)), initializer=_share_arrays, initargs=(arrays,)
+    ) as pool:
+        return list(pool.map(partial(_run_shard, func, **kwargs), bounds))
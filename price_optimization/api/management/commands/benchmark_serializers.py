@@ -0,0 +1,64 @@
+# api/management/commands/benchmark_serializers.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import compile_row_serializer
+from api.models import Product, ProductHistory, PriceOptimizationLog
+from api.query_planning import plan_queryset
+from api.serializers import ProductSerializer, ProductHistorySerializer, PriceOptimizationLogSerializer
+
+BENCHMARKS = (
+    ('products', Product, ProductSerializer, 'name'),
+    ('product-history', ProductHistory, ProductHistorySerializer, '-month'),
+    ('optimization-logs', PriceOptimizationLog, PriceOptimizationLogSerializer, '-created_at'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Compares DRF serialization with the values_list() read path on list endpoint pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per page (default: 1000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs, best is reported (default: 5)')
+
+    def _best(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        rows, repeat = max(1, options['rows']), max(1, options['repeat'])
+
+        for name, model, serializer_class, ordering in BENCHMARKS:
+            serializer = serializer_class()
+            queryset = model.objects.order_by(ordering, 'pk')
+            row_serializer = compile_row_serializer(serializer)
+            if row_serializer is None:
+                raise CommandError(f'{serializer_class.__name__} does not compile to a row serializer')
+
+            def drf():
+                page = plan_queryset(queryset, serializer)[:rows]
+                return renderer.render(serializer_class(page, many=True).data)
+
+            def fast():
+                page = queryset.values_list(*row_serializer.paths)[:rows]
+                return renderer.render(row_serializer.render(page))
+
+            drf_time, drf_output = self._best(drf, repeat)
+            fast_time, fast_output = self._best(fast, repeat)
+            if drf_output != fast_output:
+                raise CommandError(f'{name}: values_list() output differs from {serializer_class.__name__}')
+
+            count = queryset[:rows].count()
+            self.stdout.write(
+                f'{name:<18} {count:>6} rows  drf {drf_time * 1000:8.1f} ms  '
+                f'values {fast_time * 1000:8.1f} ms  {drf_time / fast_time:5.1f}x'
+            )
+        self.stdout.write(self.style.SUCCESS('Outputs are byte-identical'))
@@ -0,0 +1,88 @@
+# api/management/commands/explain_filters.py
+import re
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import Product, PriceOptimizationLog
+from api.views import (
+    ProductListAPIView, ProductHistoryAPIView, MarketConditionAPIView, PriceOptimizationLogAPIView
+)
+
+# (label, list view, query parameters); {category}, {product}, {price} and {today}
+# are filled in from the data
+COMBINATIONS = (
+    ('products: category', ProductListAPIView, {'category': '{category}'}),
+    ('products: category + price range', ProductListAPIView,
+     {'category': '{category}', 'min_price': '{price}', 'max_price': '{price}'}),
+    ('products: category + price range, by price', ProductListAPIView,
+     {'category': '{category}', 'min_price': '{price}', 'ordering': 'selling_price'}),
+    ('products: category + rating', ProductListAPIView, {'category': '{category}', 'min_rating': '4'}),
+    ('products: category + in stock', ProductListAPIView, {'category': '{category}', 'is_in_stock': 'true'}),
+    ('products: search', ProductListAPIView, {'search': '{category}'}),
+    ('history: product', ProductHistoryAPIView, {'product': '{product}'}),
+    ('history: category + months', ProductHistoryAPIView, {'category': '{category}', 'start_date': '{today}'}),
+    ('market conditions: active', MarketConditionAPIView, {'active': 'true'}),
+    ('market conditions: inactive', MarketConditionAPIView, {'active': 'false'}),
+    ('market conditions: category + active', MarketConditionAPIView, {'category': '{category}', 'active': 'true'}),
+    ('optimization logs: product', PriceOptimizationLogAPIView, {'product': '{product}'}),
+)
+
+_INDEX_USE = re.compile(
+    r'(?:USING (?:COVERING )?INDEX|Index (?:Only )?Scan(?: Backward)? using|Bitmap Index Scan on) "?(\w+)'
+)
+_FULL_SCAN = re.compile(r'(?:^|\s)SCAN (\w+)$|Seq Scan on (\w+)', re.MULTILINE)
+
+
+class Command(BaseCommand):
+    help = 'Prints the query plan (EXPLAIN) of each list endpoint filter combination to check index usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true',
+                            help='Run the queries and report actual timings (PostgreSQL only)')
+        parser.add_argument('--page-size', type=int, default=10, help='Rows per page (default: 10)')
+        parser.add_argument('--category', help="Category to filter on (default: the first product's)")
+
+    def sample_values(self, options):
+        product = Product.objects.order_by('pk').first()
+        log = PriceOptimizationLog.objects.order_by('-pk').first()
+        return {
+            'category': options['category'] or (product.category if product else 'Electronics'),
+            'product': str(log.product_id if log else product.pk if product else 1),
+            'price': str(product.selling_price if product else 10),
+            'today': date.today().isoformat(),
+        }
+
+    def page_queryset(self, view_class, params, page_size):
+        """The queryset the list view runs for one page with these query parameters"""
+        view = view_class()
+        view.request = Request(APIRequestFactory().get('/', params))
+        view.args, view.kwargs, view.format_kwarg = (), {}, None
+        return view.filter_queryset(view.get_queryset())[:page_size]
+
+    def handle(self, *args, **options):
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('--analyze needs PostgreSQL')
+            explain_options['analyze'] = True
+        values = self.sample_values(options)
+        self.stdout.write(f'Database: {connection.vendor}, sample values: {values}')
+
+        for label, view_class, params in COMBINATIONS:
+            params = {name: value.format(**values) for name, value in params.items()}
+            queryset = self.page_queryset(view_class, params, max(1, options['page_size']))
+            plan = queryset.explain(**explain_options)
+
+            indexes = sorted(set(_INDEX_USE.findall(plan)))
+            full_scans = sorted({table for match in _FULL_SCAN.findall(plan) for table in match if table})
+            self.stdout.write('')
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{label}  {params}'))
+            self.stdout.write(plan)
+            if indexes:
+                self.stdout.write(self.style.SUCCESS(f'indexes: {", ".join(indexes)}'))
+            if full_scans:
+                self.stdout.write(self.style.WARNING(f'full scans: {", ".join(full_scans)}'))
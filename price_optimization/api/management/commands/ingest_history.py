@@ -0,0 +1,46 @@
+# api/management/commands/ingest_history.py
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.caching import process_local_cache
+from api.ingestion import READERS, ingest_history
+
+
+class Command(BaseCommand):
+    help = 'Upserts product history rows from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file with product, month, units_sold, selling_price, cost_price')
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help='Input format (default: inferred from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=settings.HISTORY_INGEST_BATCH_SIZE,
+                            help='Rows validated and upserted per batch (default: HISTORY_INGEST_BATCH_SIZE setting)')
+
+    def handle(self, *args, **options):
+        if process_local_cache():
+            self.stderr.write(self.style.WARNING(
+                'The cache is local to this process: running servers keep serving forecasts cached before the ingest'
+            ))
+        input_format = options['format']
+        if input_format is None:
+            extension = os.path.splitext(options['path'])[1].lstrip('.').lower()
+            input_format = {'jsonl': 'ndjson'}.get(extension, extension)
+            if input_format not in READERS:
+                raise CommandError('Cannot infer the input format from the file extension, use --format')
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as stream:
+                report = ingest_history(stream, input_format=input_format, batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f'Row {error["row"]}: {error["errors"]}')
+        if report['error_count'] > len(report['errors']):
+            self.stderr.write(f'... {report["error_count"] - len(report["errors"])} more invalid rows')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Received {report["received"]} rows, upserted {report["upserted"]}, rejected {report["error_count"]}'
+        ))
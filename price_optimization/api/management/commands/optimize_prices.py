@@ -0,0 +1,79 @@
+# api/management/commands/optimize_prices.py
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.filters import ProductFilter
+from api.models import Product
+from api.renderers import CSVRenderer, NDJSONRenderer
+from api.services import PriceOptimizationService
+
+
+class Command(BaseCommand):
+    help = 'Forecasts and optimizes prices for the whole catalog (or a filtered part of it) across CPU cores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help='ProductFilter parameter, e.g. --filter category=Books (repeatable)')
+        parser.add_argument('--margin-target', type=float, default=0.3)
+        parser.add_argument('--price-sensitivity', type=float, default=None,
+                            help="Default: each product's estimated price elasticity")
+        parser.add_argument('--pricing', choices=PriceOptimizationService.PRICING_METHODS, default='blend',
+                            help='blend: current and target-margin price; profit: profit-maximizing price')
+        parser.add_argument('--ignore-market', action='store_true',
+                            help='Do not apply active market conditions')
+        parser.add_argument('--workers', type=int, default=settings.OPTIMIZATION_WORKERS,
+                            help='Worker processes (default: OPTIMIZATION_WORKERS setting)')
+        parser.add_argument('--shard-size', type=int, default=settings.OPTIMIZATION_SHARD_SIZE,
+                            help='Products per worker shard (default: OPTIMIZATION_SHARD_SIZE setting)')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--output', help='Output file (default: stdout)')
+
+    def handle(self, *args, **options):
+        filters = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Invalid filter "{item}", expected NAME=VALUE')
+            filters[name] = value
+
+        filter_set = ProductFilter(filters, queryset=Product.objects.all())
+        if not filter_set.is_valid():
+            raise CommandError(f'Invalid filters: {dict(filter_set.errors)}')
+        products = list(filter_set.qs.order_by('pk'))
+
+        optimizations = PriceOptimizationService.optimize_products_batch(
+            products,
+            margin_target=options['margin_target'],
+            price_sensitivity=options['price_sensitivity'],
+            consider_market=not options['ignore_market'],
+            pricing=options['pricing'],
+            workers=options['workers'],
+            shard_size=options['shard_size'],
+        )
+
+        rows = (
+            {
+                'product_id': product.product_id,
+                'name': product.name,
+                'category': product.category,
+                'current_price': float(product.selling_price),
+                'demand_forecast': optimizations[product.product_id]['demand_forecast'],
+                'optimized_price': optimizations[product.product_id]['optimized_price'],
+            }
+            for product in products
+        )
+        renderer = CSVRenderer() if options['format'] == 'csv' else NDJSONRenderer()
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in renderer.stream(rows):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        self.stderr.write(self.style.SUCCESS(
+            f'Optimized {len(products)} products with {max(1, options["workers"])} worker(s)'
+        ))
@@ -0,0 +1,22 @@
+# api/management/commands/rebuild_forecast_features.py
+from django.core.management.base import BaseCommand
+
+from api.services import ForecastFeatureService
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-product forecast feature table from ProductHistory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int,
+                            help='Only rebuild these products (default: all products)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Products processed per batch (default: 2000)')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding forecast features...')
+        written = ForecastFeatureService.rebuild(
+            options['product_ids'] or None,
+            chunk_size=max(1, options['chunk_size']),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt forecast features for {written} products'))
@@ -0,0 +1,29 @@
+# api/management/commands/refresh_elasticities.py
+from django.core.management.base import BaseCommand
+
+from api.caching import process_local_cache
+from api.services import ElasticityService
+
+
+class Command(BaseCommand):
+    help = 'Re-estimates product price elasticities from their stored regression sums'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='*', type=int,
+                            help='Only refresh these products (default: all products)')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute the regression sums from ProductHistory first')
+
+    def handle(self, *args, **options):
+        if process_local_cache():
+            self.stderr.write(self.style.WARNING(
+                'The cache is local to this process: running servers keep their cached category priors and curves'
+            ))
+        product_ids = options['product_ids'] or None
+        if options['rebuild']:
+            self.stdout.write('Rebuilding elasticity regression sums...')
+            written = ElasticityService.rebuild(product_ids)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt and refit elasticities of {written} products'))
+            return
+        changed = ElasticityService.refit(product_ids)
+        self.stdout.write(self.style.SUCCESS(f'Refit elasticities, {changed} changed'))
@@ -0,0 +1,108 @@
+# api/management/commands/run_optimization_jobs.py
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+# Worker entry points only import the app lazily so they also work with the
+# "spawn" start method, where the child has to set Django up first.
+
+def _init_worker():
+    # Worker processes must not reuse database connections inherited from the parent
+    django.setup()
+    connections.close_all()
+
+
+def _run_job(job_id, chunk_size):
+    from api.services import OptimizationJobService
+
+    try:
+        return OptimizationJobService.run_job(job_id, chunk_size=chunk_size)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Runs queued bulk optimization jobs in a local worker process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2,
+                            help='Number of jobs processed in parallel (default: 2)')
+        parser.add_argument('--chunk-size', type=int, default=settings.BULK_OPTIMIZATION_CHUNK_SIZE,
+                            help='Products optimized and persisted per chunk')
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Seconds to wait between checks for new jobs')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no pending jobs are left instead of polling forever')
+        parser.add_argument('--stale-timeout', type=int, default=settings.OPTIMIZATION_JOB_STALE_TIMEOUT,
+                            help='Requeue running jobs without a heartbeat for this many seconds '
+                                 '(default: OPTIMIZATION_JOB_STALE_TIMEOUT setting)')
+
+    def handle(self, *args, **options):
+        from api.services import OptimizationJobService
+
+        workers = max(1, options['workers'])
+        chunk_size = max(1, options['chunk_size'])
+        self.stdout.write(f'Running optimization jobs with {workers} worker(s)...')
+
+        running = {}
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        try:
+            while True:
+                requeued = OptimizationJobService.requeue_stale_jobs(options['stale_timeout'])
+                if requeued:
+                    self.stderr.write(f'Requeued {requeued} stale job(s)')
+
+                while len(running) < workers:
+                    job_id = OptimizationJobService.claim_next_job()
+                    if job_id is None:
+                        break
+                    self.stdout.write(f'Started job {job_id}')
+                    # Workers are forked on demand: never hand them our open connection
+                    connections.close_all()
+                    try:
+                        future = pool.submit(_run_job, job_id, chunk_size)
+                    except BrokenProcessPool:
+                        pool = self.replace_pool(pool, workers)
+                        future = pool.submit(_run_job, job_id, chunk_size)
+                    running[future] = job_id
+
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        self.stdout.write(f'Job {job_id} finished: {future.result()}')
+                    except Exception as e:
+                        broken = broken or isinstance(e, BrokenProcessPool)
+                        OptimizationJobService.fail_job(job_id, f'Worker crashed: {e!r}')
+                        self.stderr.write(f'Job {job_id} crashed: {e!r}')
+                if broken:
+                    # A worker process that died takes the whole pool and its other jobs down with it
+                    for job_id in running.values():
+                        OptimizationJobService.fail_job(job_id, 'Worker crashed: worker pool broken')
+                        self.stderr.write(f'Job {job_id} crashed: worker pool broken')
+                    running.clear()
+                    pool = self.replace_pool(pool, workers)
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted, waiting for running jobs to finish...')
+        finally:
+            pool.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS('Optimization job runner stopped'))
+
+    def replace_pool(self, pool, workers):
+        self.stderr.write('Worker pool broken, starting a new one')
+        pool.shutdown(wait=False, cancel_futures=True)
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
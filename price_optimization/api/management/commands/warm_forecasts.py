@@ -0,0 +1,34 @@
+# api/management/commands/warm_forecasts.py
+from django.core.management.base import BaseCommand
+
+from api.caching import process_local_cache
+from api.models import Product
+from api.services import DemandForecastService
+
+
+class Command(BaseCommand):
+    help = 'Forecasts all products in batches and stores the results in the forecast cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', help='Only forecast products of this category')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Products forecast per batch (default: 5000)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes per batch (default: OPTIMIZATION_WORKERS setting)')
+
+    def handle(self, *args, **options):
+        if process_local_cache():
+            self.stderr.write(self.style.WARNING(
+                'The cache is local to this process: the warmed forecasts are discarded when the command exits'
+            ))
+        products = Product.objects.order_by('pk')
+        if options['category']:
+            products = products.filter(category__iexact=options['category'])
+        product_ids = list(products.values_list('pk', flat=True))
+        chunk_size = max(1, options['chunk_size'])
+
+        for start in range(0, len(product_ids), chunk_size):
+            # Cached forecasts are kept, only missing ones are computed
+            DemandForecastService.forecast_demand_batch(product_ids[start:start + chunk_size], workers=options['workers'])
+            self.stdout.write(f'Forecast {min(start + chunk_size, len(product_ids))}/{len(product_ids)} products')
+        self.stdout.write(self.style.SUCCESS(f'Warmed forecasts of {len(product_ids)} products'))
@@ -0,0 +1,158 @@
+# api/market_index.py
+"""
+Process-local index of market conditions for O(log n) market factor lookups.
+
+For every category the conditions are flattened into sorted, non-overlapping
+date intervals, each carrying the combined factor of the conditions active in
+it. Lookups bisect that list and never touch the database.
+
+Changes are detected through a version stamp in the cache that the
+MarketCondition signals in ``api.signals`` bump. A per-process cache (the
+LocMemCache default) never sees bumps made by other processes, so the index also
+compares a cheap database stamp (row count and latest ``updated_at``) at most
+every ``MARKET_INDEX_CHECK_INTERVAL`` seconds before trusting the local copy.
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+MARKET_CONDITIONS_VERSION_KEY = 'market-conditions-version'
+
+
+def bump_market_conditions_version():
+    cache.set(MARKET_CONDITIONS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _market_conditions_version():
+    version = cache.get(MARKET_CONDITIONS_VERSION_KEY)
+    if version is None:
+        cache.add(MARKET_CONDITIONS_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(MARKET_CONDITIONS_VERSION_KEY)
+    return version
+
+
+def _combine(conditions):
+    # Same sequential float arithmetic as applying the conditions one by one
+    factor = 1.0
+    for trend, impact_factor in conditions:
+        if trend == 'up':
+            factor *= impact_factor
+        elif trend == 'down':
+            factor /= impact_factor
+        # 'stable' trend doesn't change the factor
+    return factor
+
+
+def build_intervals(conditions):
+    """
+    Flatten ``(start_date, end_date, trend, impact_factor)`` tuples (in application
+    order) into sorted, non-overlapping ``(starts, ends, factors)`` lists.
+    """
+    boundaries = sorted({c[0] for c in conditions} | {c[1] + timedelta(days=1) for c in conditions})
+    starts, ends, factors = [], [], []
+    for segment_start, next_start in zip(boundaries, boundaries[1:]):
+        active = [
+            (trend, impact_factor)
+            for start_date, end_date, trend, impact_factor in conditions
+            if start_date <= segment_start <= end_date
+        ]
+        if active:
+            starts.append(segment_start)
+            ends.append(next_start - timedelta(days=1))
+            factors.append(_combine(active))
+    return starts, ends, factors
+
+
+class MarketConditionIndex:
+    """
+    ``category -> sorted intervals of (start, end, combined factor)``
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._stamp = None
+        self._checked_at = None
+        self._intervals = {}
+
+    @staticmethod
+    def _db_stamp():
+        from .models import MarketCondition
+
+        stamp = MarketCondition.objects.aggregate(count=Count('pk'), latest=Max('updated_at'))
+        return stamp['count'], stamp['latest']
+
+    def _load(self):
+        from .models import MarketCondition
+
+        by_category = {}
+        # Open-ended conditions (no end_date) are not applied by the optimizer
+        rows = MarketCondition.objects.filter(end_date__isnull=False).order_by('pk').values_list(
+            'category', 'start_date', 'end_date', 'trend', 'impact_factor'
+        )
+        for category, start_date, end_date, trend, impact_factor in rows:
+            if start_date <= end_date:
+                by_category.setdefault(category, []).append(
+                    (start_date, end_date, trend, float(impact_factor))
+                )
+        return {category: build_intervals(conditions) for category, conditions in by_category.items()}
+
+    def _stale(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < settings.MARKET_INDEX_CHECK_INTERVAL:
+            return False
+        self._checked_at = now
+        return self._db_stamp() != self._stamp
+
+    def _current(self):
+        version = _market_conditions_version()
+        if version != self._version or self._stale():
+            with self._lock:
+                stamp = self._db_stamp()
+                if version != self._version or stamp != self._stamp:
+                    self._intervals = self._load()
+                    self._version = version
+                    self._stamp = stamp
+                    self._checked_at = time.monotonic()
+        return self._intervals
+
+    def invalidate(self):
+        self._version = None
+        self._checked_at = None
+
+    @staticmethod
+    def _lookup(intervals, on_date):
+        starts, ends, factors = intervals
+        i = bisect_right(starts, on_date) - 1
+        if i >= 0 and on_date <= ends[i]:
+            return factors[i]
+        return None
+
+    def factor(self, category, on_date=None):
+        """
+        Combined factor of the conditions active for ``category`` on ``on_date`` (1.0 if none)
+        """
+        intervals = self._current().get(category)
+        if intervals is None:
+            return 1.0
+        factor = self._lookup(intervals, on_date or date.today())
+        return 1.0 if factor is None else factor
+
+    def active_factors(self, on_date=None):
+        """
+        ``{category: factor}`` for every category with conditions active on ``on_date``
+        """
+        on_date = on_date or date.today()
+        result = {}
+        for category, intervals in self._current().items():
+            factor = self._lookup(intervals, on_date)
+            if factor is not None:
+                result[category] = factor
+        return result
+
+
+market_index = MarketConditionIndex()
@@ -0,0 +1,147 @@
+# api/metrics.py
+"""
+Prometheus metrics: per-view request latency, database queries and time per
+request, cache hit rates, and stage timings (data loading vs computation) of
+forecasting and optimization.
+
+``MetricsMiddleware`` records the request metrics, ``timed`` the stages and
+``record_cache`` the cache lookups. ``metrics_view`` serves them at /metrics.
+With several gunicorn workers set ``PROMETHEUS_MULTIPROC_DIR`` (an empty
+directory, before the workers start) so that every worker's samples are
+aggregated; otherwise each scrape only sees the worker that answered it. The
+``child_exit`` hook in gunicorn.conf.py marks exited workers dead, or their
+last ``http_requests_in_progress`` values would count forever.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Stages range from sub-millisecond cache reads to multi-second bulk runs
+STAGE_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Request latency by view', ['view', 'method', 'status'],
+    buckets=STAGE_BUCKETS,
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request', ['view'],
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50, 100, 250, 1000),
+)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_duration_seconds', 'Database time per request', ['view'],
+    buckets=STAGE_BUCKETS,
+)
+# Summed over live worker processes in multiprocess mode (readiness uses it for saturation)
+REQUESTS_IN_PROGRESS = Gauge('http_requests_in_progress', 'Requests being handled', multiprocess_mode='livesum')
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Cache lookups by cache and result (hit/miss)', ['cache', 'result'])
+STAGE_SECONDS = Histogram(
+    'stage_duration_seconds', 'Time spent in the stages of forecasting and optimization',
+    ['operation', 'stage'], buckets=STAGE_BUCKETS,
+)
+
+
+def timed(operation, stage):
+    """
+    Decorator or context manager recording the duration of one stage of an operation
+    """
+    return STAGE_SECONDS.labels(operation, stage).time()
+
+
+def observe_stage(operation, stage, seconds):
+    STAGE_SECONDS.labels(operation, stage).observe(seconds)
+
+
+def record_cache(cache, hits=0, misses=0):
+    if hits:
+        CACHE_LOOKUPS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, 'miss').inc(misses)
+
+
+def _registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def requests_in_progress():
+    """
+    Requests being handled by all workers (only by this process unless PROMETHEUS_MULTIPROC_DIR is set)
+    """
+    return _registry().get_sample_value('http_requests_in_progress') or 0
+
+
+class _QueryTimer:
+    """
+    ``connection.execute_wrapper`` counting and timing the queries of a request
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def _view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Unrouted paths would otherwise create a label per URL
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    """
+    Records latency, database query count and database time of every request per view.
+
+    Streaming responses are measured until the response starts, not until the
+    last chunk is sent.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = _QueryTimer()
+        wrappers = [connection.execute_wrapper(timer) for connection in connections.all()]
+        start = time.perf_counter()
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        REQUESTS_IN_PROGRESS.inc()
+        try:
+            response = self.get_response(request)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+        elapsed = time.perf_counter() - start
+
+        view = _view_label(request)
+        REQUEST_SECONDS.labels(view, request.method, response.status_code).observe(elapsed)
+        REQUEST_DB_QUERIES.labels(view).observe(timer.count)
+        REQUEST_DB_SECONDS.labels(view).observe(timer.seconds)
+        return response
+
+
+def metrics_view(request):
+    """
+    Metrics in the Prometheus text format. If METRICS_TOKEN is set the scraper
+    must send it as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-17 19:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptimizationJob',
+            fields=[
+                ('job_id', models.AutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], db_index=True, default='pending', max_length=10)),
+                ('parameters', models.JSONField(default=dict, help_text='Product filters and optimization parameters')),
+                ('total_products', models.IntegerField(blank=True, null=True)),
+                ('processed_products', models.IntegerField(default=0)),
+                ('cancel_requested', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='optimization_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OptimizationJobResult',
+            fields=[
+                ('result_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('original_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('optimized_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('demand_forecast', models.IntegerField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='api.optimizationjob')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='optimization_job_results', to='api.product')),
+            ],
+            options={
+                'ordering': ['result_id'],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2 on 2026-10-17 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_forecast_features(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    ProductHistory = apps.get_model('api', 'ProductHistory')
+    ProductForecastFeatures = apps.get_model('api', 'ProductForecastFeatures')
+
+    features = {
+        pk: ProductForecastFeatures(product_id=pk, month_units_sums=[0] * 12, month_counts=[0] * 12)
+        for pk in Product.objects.values_list('pk', flat=True)
+    }
+    history = ProductHistory.objects.order_by('product_id', 'month').values_list('product_id', 'month', 'units_sold')
+    for product_id, month, units_sold in history.iterator():
+        row = features[product_id]
+        row.history_count += 1
+        row.weighted_units_sum += units_sold * row.history_count
+        row.units_sum += units_sold
+        row.month_units_sums[month.month - 1] += units_sold
+        row.month_counts[month.month - 1] += 1
+    for row in features.values():
+        row.total_weight = row.history_count * (row.history_count + 1) // 2
+
+    ProductForecastFeatures.objects.bulk_create(features.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_optimization_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductForecastFeatures',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast_features', serialize=False, to='api.product')),
+                ('history_count', models.IntegerField(default=0)),
+                ('weighted_units_sum', models.BigIntegerField(default=0)),
+                ('total_weight', models.BigIntegerField(default=0)),
+                ('units_sum', models.BigIntegerField(default=0)),
+                ('month_units_sums', models.JSONField(default=list)),
+                ('month_counts', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(build_forecast_features, migrations.RunPython.noop),
+    ]
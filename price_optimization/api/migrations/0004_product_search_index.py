@@ -0,0 +1,92 @@
+# Generated by Django 5.2 on 2026-10-17 21:05
+
+from django.db import migrations
+
+# Search index as of this migration; api.search restores the SQLite triggers at
+# runtime (post_migrate) but this migration must not depend on that module.
+FTS_TABLE = 'api_product_fts'
+
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, category, description, content='api_product', content_rowid='product_id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON api_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, category, description) "
+    "VALUES (new.product_id, new.name, new.category, new.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON api_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category, description) "
+    "VALUES ('delete', old.product_id, old.name, old.category, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE ON api_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category, description) "
+    "VALUES ('delete', old.product_id, old.name, old.category, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, category, description) "
+    "VALUES (new.product_id, new.name, new.category, new.description); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRESQL_INSTALL = [
+    "ALTER TABLE api_product ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS api_product_search_vector_gin ON api_product USING GIN (search_vector)",
+]
+POSTGRESQL_UNINSTALL = [
+    'DROP INDEX IF EXISTS api_product_search_vector_gin',
+    'ALTER TABLE api_product DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def sqlite_has_fts5(cursor):
+    cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+    if cursor.fetchone()[0]:
+        return True
+    # Loadable-module builds don't report the option; try it
+    try:
+        cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)')
+        cursor.execute('DROP TABLE temp.fts5_probe')
+        return True
+    except Exception:
+        return False
+
+
+def run_statements(schema_editor, postgresql, sqlite):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            statements = postgresql
+        elif connection.vendor == 'sqlite' and sqlite_has_fts5(cursor):
+            statements = sqlite
+        else:
+            # Other backends search with icontains
+            return
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_search_index(apps, schema_editor):
+    run_statements(schema_editor, POSTGRESQL_INSTALL, SQLITE_INSTALL)
+
+
+def uninstall_search_index(apps, schema_editor):
+    run_statements(schema_editor, POSTGRESQL_UNINSTALL, SQLITE_UNINSTALL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_product_forecast_features'),
+    ]
+
+    operations = [
+        # Full-text search column/table outside the model: a generated tsvector
+        # column with a GIN index on PostgreSQL, an FTS5 table on SQLite
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
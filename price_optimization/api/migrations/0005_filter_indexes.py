@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 19:48
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_product_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marketcondition',
+            index=models.Index(fields=['end_date', 'start_date'], name='condition_end_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='priceoptimizationlog',
+            index=models.Index(fields=['product', '-created_at'], name='log_product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(django.db.models.functions.text.Lower('category'), models.F('selling_price'), name='product_category_price_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 # api/models.py
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 
 class Product(models.Model):
@@ -23,6 +24,9 @@ class Product(models.Model):
         indexes = [
             models.Index(fields=['name']),
             models.Index(fields=['category']),
+            # category filters compare lower-cased values (see api.filters.LowerExactFilter);
+            # also serves category + price range filters
+            models.Index(Lower('category'), 'selling_price', name='product_category_price_idx'),
         ]
         permissions = [
             ("view_product_pricing", "Can view product pricing information"),
@@ -46,6 +50,62 @@ class ProductHistory(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.month}"
 
+class ProductForecastFeatures(models.Model):
+    """
+    Per-product aggregates of ProductHistory used by demand forecasting.
+    Maintained incrementally on history changes; rebuild with rebuild_forecast_features.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='forecast_features')
+    history_count = models.IntegerField(default=0)
+    # Sum of units_sold * recency rank (1 = oldest month)
+    weighted_units_sum = models.BigIntegerField(default=0)
+    total_weight = models.BigIntegerField(default=0)
+    units_sum = models.BigIntegerField(default=0)
+    # Units sold and number of entries per calendar month, January first
+    month_units_sums = models.JSONField(default=list)
+    month_counts = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Forecast features - {self.product_id}"
+
+class ProductElasticity(models.Model):
+    """
+    Price elasticity of demand of a product, from a log-log regression of
+    units sold on selling price over its ProductHistory (see ElasticityService).
+    The regression sums are maintained incrementally on history changes;
+    refresh every product's estimate with refresh_elasticities.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='elasticity')
+    # Sums over entries with positive price and units, x = ln(selling_price), y = ln(units_sold)
+    sample_count = models.IntegerField(default=0)
+    sum_x = models.FloatField(default=0)
+    sum_y = models.FloatField(default=0)
+    sum_xx = models.FloatField(default=0)
+    sum_xy = models.FloatField(default=0)
+    # Percent drop in demand per percent of price increase, shrunk towards the category estimate
+    elasticity = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Price elasticity - {self.product_id}"
+
+class ProductSearchIndex(models.Model):
+    """
+    SQLite FTS5 index of product names, categories and descriptions (see api.search).
+    The virtual table and its triggers are created by migration 0004, not by Django.
+    """
+    product = models.OneToOneField(
+        Product, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid', db_constraint=False,
+        related_name='search_index'
+    )
+    # FTS5's hidden column named after the table: the target of MATCH and the argument of bm25()
+    document = models.TextField(db_column='api_product_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'api_product_fts'
+
 class MarketCondition(models.Model):
     """Store market conditions that affect product pricing"""
     TREND_CHOICES = (
@@ -68,6 +128,13 @@ class MarketCondition(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.get_trend_display()}"
+    
+    class Meta:
+        indexes = [
+            # Active conditions: start_date <= today AND (end_date >= today OR end_date IS NULL).
+            # Both branches are range scans on end_date (NULLs are indexed too) bounded by start_date
+            models.Index(fields=['end_date', 'start_date'], name='condition_end_start_idx'),
+        ]
 
 class PriceOptimizationLog(models.Model):
     """Log of price optimization runs"""
@@ -81,4 +148,63 @@ class PriceOptimizationLog(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
-        return f"{self.product.name} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.product.name} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+    
+    class Meta:
+        indexes = [
+            # A product's logs, newest first
+            models.Index(fields=['product', '-created_at'], name='log_product_created_idx'),
+        ]
+
+class OptimizationJob(models.Model):
+    """Background bulk price optimization run, processed by the run_optimization_jobs command"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    )
+    FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED, STATUS_CANCELLED)
+    
+    job_id = models.AutoField(primary_key=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    parameters = models.JSONField(default=dict, help_text="Product filters and optimization parameters")
+    total_products = models.IntegerField(null=True, blank=True)
+    processed_products = models.IntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='optimization_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last sign of life of the runner processing the job")
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Optimization job {self.job_id} - {self.get_status_display()}"
+    
+    @property
+    def progress(self):
+        if not self.total_products:
+            return 1.0 if self.status == self.STATUS_COMPLETED else 0.0
+        return round(self.processed_products / self.total_products, 4)
+
+class OptimizationJobResult(models.Model):
+    """Optimized price of one product produced by an optimization job"""
+    result_id = models.BigAutoField(primary_key=True)
+    job = models.ForeignKey(OptimizationJob, on_delete=models.CASCADE, related_name='results')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='optimization_job_results')
+    original_price = models.DecimalField(max_digits=10, decimal_places=2)
+    optimized_price = models.DecimalField(max_digits=10, decimal_places=2)
+    demand_forecast = models.IntegerField()
+    
+    class Meta:
+        ordering = ['result_id']
+    
+    def __str__(self):
+        return f"Job {self.job_id} - {self.product_id}"
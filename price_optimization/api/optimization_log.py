@@ -0,0 +1,164 @@
+# api/optimization_log.py
+"""
+Buffered writer for PriceOptimizationLog.
+
+Entries are collected in a per-process buffer and written with one
+``bulk_create`` when the buffer reaches OPTIMIZATION_LOG_BUFFER_SIZE entries or
+its oldest entry is OPTIMIZATION_LOG_FLUSH_INTERVAL seconds old. The time
+threshold is also checked when a request finishes, and the buffer is flushed
+when the process exits. Bulk runs flush explicitly once they are done.
+
+A flush never raises into the request that triggers it: when the bulk insert
+fails the entries are written one by one, entries the database rejects are
+logged and dropped, and the first failure because the database is
+unavailable stops the flush and puts the remaining entries back into the
+buffer for the next one. While the database stays down the buffer holds at
+most OPTIMIZATION_LOG_MAX_PENDING entries; the oldest are dropped beyond that.
+"""
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import InterfaceError, OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class OptimizationLogWriter:
+    def __init__(self, buffer_size=None, flush_interval=None, max_pending=None):
+        self._lock = threading.Lock()
+        self._entries = []
+        self._oldest = None
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+
+    @property
+    def buffer_size(self):
+        return self._buffer_size or settings.OPTIMIZATION_LOG_BUFFER_SIZE
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return settings.OPTIMIZATION_LOG_FLUSH_INTERVAL
+
+    @property
+    def max_pending(self):
+        return max(self._max_pending or settings.OPTIMIZATION_LOG_MAX_PENDING, self.buffer_size)
+
+    def add(self, product_id, original_price, optimized_price, demand_forecast, parameters, run_by_id=None):
+        """
+        Queue one log entry; flushes when a threshold is reached
+        """
+        self.add_many([(product_id, original_price, optimized_price, demand_forecast)], parameters, run_by_id)
+
+    def add_many(self, entries, parameters, run_by_id=None):
+        """
+        Queue ``(product_id, original_price, optimized_price, demand_forecast)`` entries
+        that share the same optimization parameters and user
+        """
+        from .models import PriceOptimizationLog
+
+        logs = [
+            PriceOptimizationLog(
+                product_id=product_id,
+                original_price=original_price,
+                optimized_price=optimized_price,
+                demand_forecast=demand_forecast,
+                optimization_parameters=parameters,
+                run_by_id=run_by_id,
+            )
+            for product_id, original_price, optimized_price, demand_forecast in entries
+        ]
+        if not logs:
+            return
+        with self._lock:
+            if not self._entries:
+                self._oldest = time.monotonic()
+            self._entries.extend(logs)
+            self._drop_oldest()
+            full = len(self._entries) >= self.buffer_size
+        if full:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        with self._lock:
+            due = bool(self._entries) and time.monotonic() - self._oldest >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write every buffered entry; returns the number of entries written
+        """
+        from .models import PriceOptimizationLog
+
+        with self._lock:
+            logs, self._entries, self._oldest = self._entries, [], None
+        if not logs:
+            return 0
+        try:
+            with transaction.atomic():
+                PriceOptimizationLog.objects.bulk_create(logs, batch_size=self.buffer_size)
+            return len(logs)
+        except Exception:
+            logger.warning('Bulk write of %d optimization logs failed, writing them one by one', len(logs), exc_info=True)
+
+        written = 0
+        for index, log in enumerate(logs):
+            # Ids set by a bulk batch that was rolled back
+            log.pk = None
+            try:
+                with transaction.atomic():
+                    log.save(force_insert=True)
+                written += 1
+            except (OperationalError, InterfaceError):
+                # Every further write would wait for the same failure
+                unwritten = logs[index:]
+                logger.error('Database unavailable, %d optimization logs kept for the next flush', len(unwritten))
+                with self._lock:
+                    self._entries[:0] = unwritten
+                    self._oldest = time.monotonic()
+                    self._drop_oldest()
+                break
+            except Exception:
+                logger.exception('Dropped optimization log of product %s', log.product_id)
+        return written
+
+    def _drop_oldest(self):
+        # Called with the lock held
+        excess = len(self._entries) - self.max_pending
+        if excess > 0:
+            del self._entries[:excess]
+            logger.error('Optimization log buffer full, dropped the %d oldest entries', excess)
+
+    def pending(self):
+        with self._lock:
+            return len(self._entries)
+
+
+optimization_log = OptimizationLogWriter()
+
+
+def _flush_if_due(sender, **kwargs):
+    try:
+        optimization_log.flush_if_due()
+    except Exception:
+        logger.exception('Failed to flush optimization logs')
+
+
+def _flush_at_exit():
+    try:
+        optimization_log.flush()
+    except Exception:
+        logger.exception('Failed to flush optimization logs at exit')
+
+
+request_finished.connect(_flush_if_due, dispatch_uid='optimization-log-flush')
+atexit.register(_flush_at_exit)
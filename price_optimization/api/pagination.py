@@ -1,10 +1,165 @@
 # your_app/pagination.py
 
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.db.models.query import ValuesIterable
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'page_size'  # allow client to set page size
 
+    # Keyset mode: pass ?cursor= (empty for the first page) and follow the Link header.
+    # Pages continue after the last row of the previous page instead of using OFFSET,
+    # and no COUNT query is run.
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.next_cursor = None
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_keyset(queryset, request)
+
     def get_paginated_response(self, data):
-        return Response(data)  # Only return the paginated list (no count, next, etc.)
+        headers = None
+        if self.cursor_mode and self.next_cursor is not None:
+            url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+            url = replace_query_param(url, self.cursor_query_param, self.next_cursor)
+            headers = {'Link': f'<{url}>; rel="next"'}
+        return Response(data, headers=headers)  # Only return the paginated list (no count, next, etc.)
+
+    def get_cursor_page_size(self, request):
+        page_size = self.get_page_size(request) or 10
+        return min(page_size, settings.CURSOR_PAGINATION_MAX_PAGE_SIZE)
+
+    def get_keyset_ordering(self, queryset):
+        """
+        ``[(field, descending)]`` of the queryset ordering, ending with the primary key
+        so that every row has a unique position
+        """
+        model = queryset.model
+        ordering = []
+        for term in queryset.query.order_by or model._meta.ordering:
+            name = term.lstrip('-') if isinstance(term, str) else None
+            try:
+                field = model._meta.pk if name == 'pk' else model._meta.get_field(name or '')
+            except FieldDoesNotExist:
+                field = None
+            if field is None or '__' in name or not field.concrete:
+                # e.g. ordering by search rank
+                raise ValidationError({
+                    self.cursor_query_param: f'Cursor pagination needs an ordering on model fields, got {term}.'
+                })
+            ordering.append((field, term.startswith('-')))
+        if model._meta.pk not in [field for field, descending in ordering]:
+            ordering.append((model._meta.pk, False))
+        return ordering
+
+    def encode_cursor(self, ordering, values):
+        payload = {
+            'o': [f'-{field.name}' if descending else field.name for field, descending in ordering],
+            # DjangoJSONEncoder cuts datetimes to milliseconds, which would skip rows
+            # between the rounded and the real boundary: keep the microseconds
+            'v': [
+                value.isoformat() if isinstance(value, (datetime.datetime, datetime.time)) else value
+                for value in values
+            ],
+        }
+        data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, ordering):
+        if not cursor:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            expected = [f'-{field.name}' if descending else field.name for field, descending in ordering]
+            if payload['o'] != expected or len(payload['v']) != len(ordering):
+                raise ValueError
+            return [
+                None if value is None else self._key_field(field).to_python(value)
+                for (field, descending), value in zip(ordering, payload['v'])
+            ]
+        except Exception:
+            # The ordering changed since the cursor was issued, or it was tampered with
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _key_field(field):
+        # Foreign keys order and filter by the referenced column
+        return field.target_field if field.is_relation else field
+
+    @staticmethod
+    def _after(field, descending, value):
+        """
+        Rows strictly after ``value`` in the column's order. NULLs sort last
+        ascending and first descending, i.e. as the largest value.
+        """
+        name = field.name
+        if value is None:
+            return Q(pk__in=[]) if not descending else Q(**{f'{name}__isnull': False})
+        if descending:
+            return Q(**{f'{name}__lt': value})
+        condition = Q(**{f'{name}__gt': value})
+        return condition | Q(**{f'{name}__isnull': True}) if field.null else condition
+
+    @staticmethod
+    def _equal(field, value):
+        if value is None:
+            return Q(**{f'{field.name}__isnull': True})
+        return Q(**{field.name: value})
+
+    def paginate_keyset(self, queryset, request):
+        self.request = request
+        page_size = self.get_cursor_page_size(request)
+        ordering = self.get_keyset_ordering(queryset)
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param), ordering)
+
+        queryset = queryset.order_by(*[
+            F(field.name).desc(nulls_first=True) if descending else F(field.name).asc(nulls_last=True)
+            for field, descending in ordering
+        ])
+        if position is not None:
+            # (a, b, pk) > (va, vb, vpk) expanded column by column
+            condition = Q(pk__in=[])
+            for i, ((field, descending), value) in enumerate(zip(ordering, position)):
+                term = self._after(field, descending, value)
+                for (prior_field, prior_descending), prior_value in zip(ordering[:i], position[:i]):
+                    term &= self._equal(prior_field, prior_value)
+                condition |= term
+            queryset = queryset.filter(condition)
+
+        # values()/values_list() rows must carry the key columns to build the next cursor
+        values_fields = list(queryset._fields) if queryset._fields else None
+        if values_fields is not None:
+            missing = [field.name for field, descending in ordering if field.name not in values_fields]
+            if missing:
+                values_fields += missing
+                if queryset._iterable_class is ValuesIterable:
+                    queryset = queryset.values(*values_fields)
+                else:
+                    queryset = queryset.values_list(*values_fields)
+
+        rows = list(queryset[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.encode_cursor(ordering, self._key_values(rows[-1], ordering, values_fields))
+        return rows
+
+    @staticmethod
+    def _key_values(row, ordering, values_fields):
+        if values_fields is None:
+            return [getattr(row, field.attname) for field, descending in ordering]
+        if isinstance(row, dict):
+            return [row[field.name] for field, descending in ordering]
+        return [row[values_fields.index(field.name)] for field, descending in ordering]
@@ -0,0 +1,140 @@
+# api/query_planning.py
+"""
+Derive ``select_related``/``prefetch_related``/``only`` from a serializer tree.
+
+``plan_queryset`` walks the readable fields of a serializer and returns the
+queryset extended so that rendering a page of it takes a fixed number of
+queries: forward relations are joined, reverse and many-to-many relations are
+prefetched (planned recursively), and only the columns that are rendered are
+loaded. Fields whose source is a model property or method can read any
+column, so their model keeps all of its concrete fields.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _join(*parts):
+    return '__'.join(part for part in parts if part)
+
+
+def _concrete_fields(model, path):
+    return {_join(path, field.name) for field in model._meta.concrete_fields}
+
+
+def _child_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.ManyRelatedField):
+        return field.child_relation
+    return field
+
+
+class _Plan:
+    def __init__(self):
+        self.select = []
+        self.prefetch = []
+        self.only = set()
+
+    def add_serializer(self, model, serializer, path=''):
+        self.only.add(_join(path, model._meta.pk.name))
+        for field in serializer.fields.values():
+            if field.write_only:
+                continue
+            if field.source == '*':
+                if isinstance(field, serializers.BaseSerializer):
+                    self.add_serializer(model, field, path)
+                else:
+                    self.only |= _concrete_fields(model, path)
+                continue
+            self.add_field(model, field, path)
+
+    def add_field(self, model, field, path):
+        attrs = field.source_attrs
+        for i, attr in enumerate(attrs):
+            last = i == len(attrs) - 1
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                if hasattr(model, attr):
+                    # Property or method: it may read any column
+                    self.only |= _concrete_fields(model, path)
+                # Otherwise an annotation or an optional attribute such as demand_forecast
+                return
+
+            if not model_field.is_relation:
+                self.only.add(_join(path, attr))
+                return
+
+            if model_field.many_to_many or model_field.one_to_many or model_field.auto_created:
+                # Reverse or many-to-many relation: prefetch with its own plan
+                if last:
+                    self.add_prefetch(model_field, _child_serializer(field), _join(path, attr))
+                else:
+                    self.only |= _concrete_fields(model, path)
+                return
+
+            # Forward foreign key or one-to-one
+            self.only.add(_join(path, attr))
+            if last and isinstance(field, serializers.RelatedField) and field.use_pk_only_optimization():
+                return
+            related_path = _join(path, attr)
+            self.select.append(related_path)
+            model = model_field.related_model
+            path = related_path
+            if last:
+                self.only.add(_join(path, model._meta.pk.name))
+                if isinstance(field, serializers.BaseSerializer):
+                    self.add_serializer(model, field, path)
+                else:
+                    # e.g. StringRelatedField renders str(obj)
+                    self.only |= _concrete_fields(model, path)
+
+    def add_prefetch(self, model_field, serializer, lookup):
+        related_model = model_field.related_model
+        plan = _Plan()
+        if isinstance(serializer, serializers.BaseSerializer):
+            plan.add_serializer(related_model, serializer)
+        else:
+            plan.only.add(related_model._meta.pk.name)
+        if model_field.one_to_many or model_field.one_to_one:
+            # The prefetch matches rows to their parent through the foreign key
+            plan.only.add(model_field.field.name)
+        self.prefetch.append(Prefetch(lookup, queryset=plan.apply(related_model._default_manager.all())))
+
+    def apply(self, queryset):
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        return queryset.only(*sorted(self.only))
+
+
+def plan_queryset(queryset, serializer):
+    """
+    ``queryset`` with the joins, prefetches and columns needed to render ``serializer``
+    """
+    plan = _Plan()
+    plan.add_serializer(queryset.model, _child_serializer(serializer))
+    # Related manager querysets (e.g. job.results) set the parent on every row
+    # through its foreign key, which must not be deferred
+    for field in queryset._known_related_objects:
+        plan.only.add(field.name)
+    return plan.apply(queryset)
+
+
+class QueryPlanMixin:
+    """
+    Generic view mixin that plans read querysets from the view's serializer.
+
+    Writes keep the plain queryset so updates never save partially loaded rows.
+    Views that override ``get_queryset`` pass their queryset through ``plan``.
+    """
+    def plan(self, queryset):
+        if self.request.method in SAFE_METHODS:
+            queryset = plan_queryset(queryset, self.get_serializer())
+        return queryset
+
+    def get_queryset(self):
+        return self.plan(super().get_queryset())
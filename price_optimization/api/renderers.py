@@ -0,0 +1,72 @@
+# api/renderers.py
+import csv
+import io
+import json
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """
+    Newline-delimited JSON: one JSON object per line.
+
+    ``stream`` renders rows lazily for use with StreamingHttpResponse.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.stream(data if isinstance(data, list) else [data]))
+
+    def stream(self, rows):
+        for row in rows:
+            yield (json.dumps(row, cls=encoders.JSONEncoder, ensure_ascii=False) + '\n').encode(self.charset)
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    CSV with a header row. Nested objects are written as their ``id``.
+
+    ``stream`` renders rows lazily for use with StreamingHttpResponse.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.stream(data if isinstance(data, list) else [data]))
+
+    def stream(self, rows, header=None):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def flush():
+            chunk = buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+            return chunk
+
+        if header is not None:
+            writer.writerow(header)
+            yield flush()
+
+        for row in rows:
+            if header is None:
+                header = list(row)
+                writer.writerow(header)
+            writer.writerow([self._cell(row.get(key)) for key in header])
+            yield flush()
+
+    @staticmethod
+    def _cell(value):
+        if value is None:
+            return ''
+        if isinstance(value, dict):
+            return value.get('id', '')
+        return value
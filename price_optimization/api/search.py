@@ -0,0 +1,181 @@
+# api/search.py
+"""
+Full-text product search.
+
+PostgreSQL: ``api_product.search_vector`` is a generated ``tsvector`` column
+(name weighted A, category B, description C) with a GIN index, so the database
+keeps it current on every write. SQLite: ``api_product_fts`` is an FTS5 table
+over the same columns kept in sync by triggers, which queries join through the
+unmanaged ProductSearchIndex model. Both are created by migration 0004; other backends (or SQLite builds without FTS5) fall back to
+``icontains`` matching.
+
+Every search term is prefix-matched and all terms must match. Matching
+querysets are annotated with ``search_rank`` (higher is better).
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Lookup, Q, Value
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import OrderingFilter
+
+from .models import ProductSearchIndex
+
+# No stemming: stemmed index terms ('running' -> 'run') would miss prefix queries like 'runn'
+SEARCH_CONFIG = 'simple'
+FTS_TABLE = 'api_product_fts'
+SEARCH_PARAM = 'search'
+
+_TERMS = re.compile(r'\w+')
+
+# FTS5 external content table and the triggers that keep it in sync with api_product
+SQLITE_INSTALL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, category, description, content='api_product', content_rowid='product_id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON api_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, category, description) "
+    "VALUES (new.product_id, new.name, new.category, new.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON api_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category, description) "
+    "VALUES ('delete', old.product_id, old.name, old.category, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE ON api_product BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category, description) "
+    "VALUES ('delete', old.product_id, old.name, old.category, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, category, description) "
+    "VALUES (new.product_id, new.name, new.category, new.description); END",
+]
+SQLITE_TRIGGERS = {f'{FTS_TABLE}_insert', f'{FTS_TABLE}_delete', f'{FTS_TABLE}_update'}
+
+POSTGRESQL_INSTALL = [
+    "ALTER TABLE api_product ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(category, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS api_product_search_vector_gin ON api_product USING GIN (search_vector)",
+]
+
+
+class Match(Lookup):
+    """
+    ``search_index__document__match='"term"*'``: FTS5 full-text query
+    """
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+ProductSearchIndex._meta.get_field('document').register_lookup(Match)
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Loadable-module builds don't report the option; try it
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)')
+            cursor.execute('DROP TABLE temp.fts5_probe')
+            return True
+        except Exception:
+            return False
+
+
+def install_search_index(connection):
+    """
+    Create the search column/table and its index or triggers if they are missing.
+
+    Idempotent. On SQLite it also restores the triggers (and rebuilds the index)
+    after a migration remade api_product, which drops them.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for statement in POSTGRESQL_INSTALL:
+                cursor.execute(statement)
+    elif connection.vendor == 'sqlite':
+        if not _sqlite_has_fts5(connection):
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'api_product'")
+            complete = SQLITE_TRIGGERS <= {row[0] for row in cursor.fetchall()}
+            for statement in SQLITE_INSTALL:
+                cursor.execute(statement)
+            if not complete:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _search_backends.pop(connection.alias, None)
+
+
+def rebuild_search_index(connection):
+    """
+    Re-index every product (SQLite; PostgreSQL's generated column never goes stale)
+    """
+    if search_backend(connection) == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+# connection alias -> 'postgresql' | 'sqlite' | 'fallback'
+_search_backends = {}
+
+
+def search_backend(connection):
+    if connection.alias not in _search_backends:
+        backend = 'fallback'
+        if connection.vendor == 'postgresql':
+            backend = 'postgresql'
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            backend = 'sqlite'
+        _search_backends[connection.alias] = backend
+    return _search_backends[connection.alias]
+
+
+def search_terms(query):
+    return _TERMS.findall(query.lower())
+
+
+def search_products(queryset, query):
+    """
+    Products matching every term of ``query`` (prefix match), annotated with
+    ``search_rank``. Unchanged if the query has no terms.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    table = queryset.model._meta.db_table
+    backend = search_backend(connections[queryset.db])
+
+    if backend == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(
+            RawSQL(f'{table}.search_vector @@ to_tsquery(%s, %s)', (SEARCH_CONFIG, tsquery), output_field=BooleanField())
+        ).annotate(search_rank=RawSQL(
+            f'ts_rank({table}.search_vector, to_tsquery(%s, %s))', (SEARCH_CONFIG, tsquery), output_field=FloatField()
+        ))
+    if backend == 'sqlite':
+        fts_query = ' '.join(f'"{term}"*' for term in terms)
+        # Joined on rowid; bm25 is lower for better matches, name counts most, then category
+        return queryset.filter(search_index__document__match=fts_query).annotate(
+            search_rank=-Func(F('search_index__document'), 10.0, 5.0, 1.0, function='bm25', output_field=FloatField())
+        )
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(name__icontains=term) | Q(category__icontains=term) | Q(description__icontains=term)
+    return queryset.filter(condition).annotate(search_rank=Value(0.0))
+
+
+class SearchRankOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter that orders searches by relevance unless ``?ordering=`` is given
+    """
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get(self.ordering_param) or not search_terms(
+            request.query_params.get(SEARCH_PARAM, '')
+        ):
+            return super().get_ordering(request, queryset, view)
+        return ['-search_rank', 'pk']
@@ -1,7 +1,12 @@
 # /api/serializers.py
 
+from django.conf import settings
 from rest_framework import serializers
-from .models import Product, ProductHistory, MarketCondition, PriceOptimizationLog
+from .models import (
+    Product, ProductHistory, MarketCondition, PriceOptimizationLog, OptimizationJob, OptimizationJobResult
+)
+from .filters import ProductFilter
+from .services import DemandCurveService, PriceOptimizationService, ScenarioSweepService
 from django.contrib.auth.models import User
 
 class UserMinimalSerializer(serializers.ModelSerializer):
@@ -80,4 +85,170 @@ class PriceOptimizationLogSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = PriceOptimizationLog
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class OptimizationJobSerializer(serializers.ModelSerializer):
+    created_by = UserMinimalSerializer(read_only=True)
+    progress = serializers.FloatField(read_only=True)
+    
+    class Meta:
+        model = OptimizationJob
+        fields = '__all__'
+        read_only_fields = (
+            'status', 'parameters', 'total_products', 'processed_products', 'cancel_requested',
+            'error', 'created_by', 'started_at', 'heartbeat_at', 'finished_at'
+        )
+
+class OptimizationJobCreateSerializer(serializers.Serializer):
+    """Input of a new optimization job: ProductFilter params plus optimization parameters"""
+    filters = serializers.DictField(required=False, default=dict)
+    margin_target = serializers.FloatField(required=False, default=0.3)
+    # None: each product's estimated price elasticity
+    price_sensitivity = serializers.FloatField(required=False, allow_null=True, default=None)
+    consider_market = serializers.BooleanField(required=False, default=True)
+    pricing = serializers.ChoiceField(choices=PriceOptimizationService.PRICING_METHODS, required=False, default='blend')
+    
+    def validate_filters(self, value):
+        filter_set = ProductFilter(value, queryset=Product.objects.none())
+        if not filter_set.is_valid():
+            raise serializers.ValidationError(filter_set.errors)
+        return value
+
+class ParameterValuesField(serializers.Field):
+    """
+    Values of a sweep parameter: a single value, a list, or a range
+    ``{"start": .., "stop": .., "step": ..}`` including ``stop``
+    """
+    default_error_messages = {
+        'empty': 'Give at least one value.',
+        'range': 'A range needs numeric "start", "stop" and a positive "step", with stop >= start.',
+        'too_many': 'At most {max_values} values.',
+    }
+
+    def __init__(self, child, **kwargs):
+        self.child = child
+        super().__init__(**kwargs)
+        self.child.bind(field_name='', parent=self)
+
+    def to_internal_value(self, data):
+        max_values = settings.SWEEP_MAX_SCENARIOS
+        if isinstance(data, dict):
+            try:
+                start, stop, step = (float(data[key]) for key in ('start', 'stop', 'step'))
+            except (KeyError, TypeError, ValueError):
+                self.fail('range')
+            if step <= 0 or stop < start:
+                self.fail('range')
+            # Tolerance: stop is included despite floating point steps
+            count = int((stop - start) / step + 1e-9) + 1
+            if count > max_values:
+                self.fail('too_many', max_values=max_values)
+            data = [round(start + index * step, 10) for index in range(count)]
+        elif not isinstance(data, list):
+            data = [data]
+        if not data:
+            self.fail('empty')
+        if len(data) > max_values:
+            self.fail('too_many', max_values=max_values)
+        return list(dict.fromkeys(self.child.run_validation(value) for value in data))
+
+    def to_representation(self, value):
+        return [self.child.to_representation(item) for item in value]
+
+
+class ScenarioSweepSerializer(serializers.Serializer):
+    """Input of a scenario sweep: ProductFilter params, parameter values and the output format"""
+    filters = serializers.DictField(required=False, default=dict)
+    margin_target = ParameterValuesField(serializers.FloatField(), required=False, default=[0.3])
+    # None: each product's estimated price elasticity
+    price_sensitivity = ParameterValuesField(
+        serializers.FloatField(allow_null=True), required=False, default=[None]
+    )
+    consider_market = ParameterValuesField(serializers.BooleanField(), required=False, default=[True])
+    pricing = ParameterValuesField(
+        serializers.ChoiceField(choices=PriceOptimizationService.PRICING_METHODS), required=False, default=['blend']
+    )
+    # matrix: every product's price in every scenario; top_k: the best scenarios by metric
+    output = serializers.ChoiceField(choices=['matrix', 'top_k'], required=False, default='top_k')
+    metric = serializers.ChoiceField(choices=ScenarioSweepService.METRICS, required=False, default='profit')
+    top_k = serializers.IntegerField(required=False, default=10, min_value=1)
+
+    def validate_filters(self, value):
+        filter_set = ProductFilter(value, queryset=Product.objects.none())
+        if not filter_set.is_valid():
+            raise serializers.ValidationError(filter_set.errors)
+        return value
+
+    def validate(self, attrs):
+        attrs['scenarios'] = ScenarioSweepService.scenario_grid(
+            attrs['margin_target'], attrs['price_sensitivity'], attrs['consider_market'], attrs['pricing']
+        )
+        if len(attrs['scenarios']) > settings.SWEEP_MAX_SCENARIOS:
+            raise serializers.ValidationError(
+                f'{len(attrs["scenarios"])} scenarios, at most {settings.SWEEP_MAX_SCENARIOS} are allowed.'
+            )
+        return attrs
+
+
+class DemandCurveParamsSerializer(serializers.Serializer):
+    """Query parameters of demand curves: resolution, price range (relative to the current price) and elasticity"""
+    points = serializers.IntegerField(required=False, default=13, min_value=2)
+    min_price_ratio = serializers.FloatField(required=False, default=0.7, min_value=0.01)
+    max_price_ratio = serializers.FloatField(required=False, default=1.3)
+    # "estimated", "category" or a number
+    elasticity = serializers.CharField(required=False, default='estimated')
+
+    def validate_points(self, value):
+        if value > settings.DEMAND_CURVE_MAX_POINTS:
+            raise serializers.ValidationError(f'At most {settings.DEMAND_CURVE_MAX_POINTS} points.')
+        return value
+
+    def validate_elasticity(self, value):
+        if value in DemandCurveService.ELASTICITY_SOURCES:
+            return value
+        try:
+            elasticity = float(value)
+        except ValueError:
+            elasticity = -1.0
+        if not 0 <= elasticity < float('inf'):
+            raise serializers.ValidationError(
+                f'Use {" or ".join(DemandCurveService.ELASTICITY_SOURCES)} or a non-negative number.'
+            )
+        return elasticity
+
+    def validate(self, attrs):
+        if attrs['max_price_ratio'] <= attrs['min_price_ratio']:
+            raise serializers.ValidationError({'max_price_ratio': 'Must be greater than min_price_ratio.'})
+        return attrs
+
+    def curve_options(self):
+        params = self.validated_data
+        return {
+            'points': params['points'],
+            'price_range': (params['min_price_ratio'], params['max_price_ratio']),
+            'elasticity': params['elasticity'],
+        }
+
+
+class DemandCurveBatchParamsSerializer(DemandCurveParamsSerializer):
+    """Demand curve query parameters plus the products: ``ids=1,2,3``"""
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in value.split(',') if pk.strip()))
+        except ValueError:
+            raise serializers.ValidationError('A comma-separated list of product ids.')
+        if not ids:
+            raise serializers.ValidationError('Give at least one product id.')
+        if len(ids) > settings.DEMAND_CURVE_MAX_PRODUCTS:
+            raise serializers.ValidationError(f'At most {settings.DEMAND_CURVE_MAX_PRODUCTS} products.')
+        return ids
+
+
+class OptimizationJobResultSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    
+    class Meta:
+        model = OptimizationJobResult
+        fields = ('product', 'product_name', 'original_price', 'optimized_price', 'demand_forecast')
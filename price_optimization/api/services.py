@@ -1,76 +1,724 @@
 #api/services.py
 
+import hashlib
+import itertools
+import math
+import time
 import numpy as np
-from datetime import datetime, date
-from .models import Product, ProductHistory, MarketCondition
+from datetime import datetime, date, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, F, FloatField, Max, Q, Sum
+from django.db.models.functions import Cast, Ln
+from django.utils import timezone
+from .models import (
+    Product, ProductHistory, ProductForecastFeatures, ProductElasticity, OptimizationJob, OptimizationJobResult
+)
+from .filters import ProductFilter
+from .caching import (
+    bump_history_version, demand_curve_key, forecast_key, forecast_models_tag, get_or_compute_forecast, history_versions
+)
+from .forecasting import DEFAULT_MODEL, FORECAST_MODELS
+from .market_index import market_index
+from .kernels import (
+    centered_log_sums, compute_profit_prices, demand_curves, expected_outcomes, fit_elasticities,
+    forecast_from_features, forecast_shard, history_aggregates, optimize_shard, run_sharded, sweep_prices
+)
+from .optimization_log import optimization_log
+from .metrics import observe_stage, record_cache, timed
+
+
+def _id_chunks(ids):
+    """
+    Split a list of primary keys into chunks small enough for an ``__in`` lookup
+    on the active database backend (a single chunk on PostgreSQL).
+    """
+    batch_size = max(1, connection.ops.bulk_batch_size(['pk'], ids))
+    for start in range(0, len(ids), batch_size):
+        yield ids[start:start + batch_size]
+
+
+def _parallelism(workers=None, shard_size=None):
+    """
+    Resolve worker count and shard size for sharded batch computations.
+    Without parallelism everything is computed as a single shard.
+    """
+    workers = settings.OPTIMIZATION_WORKERS if workers is None else workers
+    if workers <= 1:
+        return 1, None
+    return workers, shard_size or settings.OPTIMIZATION_SHARD_SIZE
+
+
+def load_history_matrix(product_ids):
+    """
+    Load the sales history of many products with a single query (split only
+    where the backend limits query parameters) and pack it into product x month
+    arrays.
+
+    Row i of every matrix belongs to ``product_ids[i]``; column j is the j-th
+    oldest history entry of that product. Cells past a product's history are
+    zero and masked out by ``mask``.
+    """
+    product_ids = np.asarray(list(product_ids), dtype=np.int64)
+    rows = []
+    for chunk in _id_chunks(np.sort(product_ids).tolist()):
+        rows.extend(
+            ProductHistory.objects.filter(product_id__in=chunk)
+            .order_by('product_id', 'month')
+            .values_list('product_id', 'month__month', 'units_sold')
+        )
+    rows = np.array(rows, dtype=np.int64).reshape(-1, 3)
+
+    row_pids, calendar_months, units = rows[:, 0], rows[:, 1], rows[:, 2]
+
+    # Position of every entry within its product's (month ordered) history
+    _, starts, counts = np.unique(row_pids, return_index=True, return_counts=True)
+    positions = np.arange(len(row_pids)) - np.repeat(starts, counts)
+
+    # Map each entry back to its row in the requested product order
+    order = np.argsort(product_ids, kind='stable')
+    row_index = order[np.searchsorted(product_ids, row_pids, sorter=order)]
+
+    width = int(counts.max()) if len(counts) else 0
+    shape = (len(product_ids), width)
+    units_matrix = np.zeros(shape, dtype=np.int64)
+    month_matrix = np.zeros(shape, dtype=np.int64)
+    mask = np.zeros(shape, dtype=bool)
+    units_matrix[row_index, positions] = units
+    month_matrix[row_index, positions] = calendar_months
+    mask[row_index, positions] = True
+
+    return product_ids, units_matrix, month_matrix, mask
+
 
 class DemandForecastService:
+    @staticmethod
+    def model_names(categories):
+        """
+        Forecast model (see ``api.forecasting``) of each category, from the
+        FORECAST_CATEGORY_MODELS and FORECAST_MODEL settings
+        """
+        category_models = settings.FORECAST_CATEGORY_MODELS
+        names = [category_models.get(category.lower(), settings.FORECAST_MODEL) for category in categories]
+        unknown = set(names) - set(FORECAST_MODELS)
+        if unknown:
+            raise ImproperlyConfigured(
+                f'Unknown forecast model(s) {", ".join(sorted(unknown))}; available: {", ".join(sorted(FORECAST_MODELS))}'
+            )
+        return names
+
     @staticmethod
     def forecast_demand(product_id):
         """
         Enhanced demand forecasting using historical data and time-weighted averaging
+
+        Results are cached per product history version (see ``api.caching``).
         """
-        try:
-            product = Product.objects.get(pk=product_id)
-            history = ProductHistory.objects.filter(product=product).order_by('month')
-            
-            if history.count() > 0:
-                # Time-weighted average (more recent months have higher weight)
-                total_weight = 0
-                weighted_sum = 0
-                
-                for i, entry in enumerate(history):
-                    # Weight increases with recency (i = 0 is oldest)
-                    weight = i + 1  
-                    weighted_sum += entry.units_sold * weight
-                    total_weight += weight
-                
-                # Calculate weighted average
-                avg_units = weighted_sum / total_weight if total_weight > 0 else product.units_sold
-                
-                # Check for seasonality
-                current_month = date.today().month
-                season_factor = 1.0
-                
-                # Simple seasonal adjustment
-                seasonal_entries = history.filter(month__month=current_month)
-                if seasonal_entries.exists():
-                    seasonal_avg = sum(e.units_sold for e in seasonal_entries) / seasonal_entries.count()
-                    year_avg = sum(e.units_sold for e in history) / history.count()
-                    
-                    if year_avg > 0:
-                        season_factor = seasonal_avg / year_avg
-                
-                # Apply projected growth and seasonality
-                growth_factor = 1.1  # 10% projected growth
-                demand_forecast = int(avg_units * growth_factor * season_factor)
-                
-                return max(1, demand_forecast)  # Ensure positive forecast
-            else:
-                # If no history, return current units sold with 10% growth projection
-                return max(1, int(product.units_sold * 1.1))
-        except Product.DoesNotExist:
-            return 0
+        return get_or_compute_forecast(
+            product_id,
+            date.today().month,
+            lambda: DemandForecastService.compute_forecast(product_id)
+        )
+
+    @staticmethod
+    def compute_forecast(product_id):
+        """
+        Uncached demand forecast of a single product, read from its forecast features row
+        """
+        return DemandForecastService._compute_forecast_batch([int(product_id)])[int(product_id)]
+
+    @staticmethod
+    def forecast_demand_batch(product_ids, workers=None, shard_size=None):
+        """
+        Vectorized counterpart of ``forecast_demand`` for many products at once.
+
+        Loads the history of all requested products in one query and computes the
+        recency-weighted average and seasonal factor for every product in a single
+        NumPy pass. Returns a dict of ``{product_id: demand_forecast}`` with the
+        same values ``forecast_demand`` returns for each product (0 for unknown ids).
+        Forecasts already in the versioned forecast cache are not recomputed.
+
+        With ``workers`` > 1 the products are split into shards of ``shard_size``
+        rows that are forecast in a process pool (defaults: OPTIMIZATION_WORKERS
+        and OPTIMIZATION_SHARD_SIZE settings).
+        """
+        product_ids = list(dict.fromkeys(int(pk) for pk in product_ids))
+        if not product_ids:
+            return {}
+
+        # Serve what we can from the forecast cache, compute the rest in one pass
+        month = date.today().month
+        versions = history_versions(product_ids)
+        models = forecast_models_tag()
+        keys = {forecast_key(pk, versions[pk], month, models): pk for pk in product_ids}
+        cached = {keys[key]: forecast for key, forecast in cache.get_many(keys).items()}
+        missing_ids = [pk for pk in product_ids if pk not in cached]
+        record_cache('forecast', hits=len(cached), misses=len(missing_ids))
+        if not missing_ids:
+            return {pk: cached[pk] for pk in product_ids}
+
+        computed = DemandForecastService._compute_forecast_batch(missing_ids, workers, shard_size)
+        cache.set_many(
+            {forecast_key(pk, versions[pk], month, models): forecast for pk, forecast in computed.items()},
+            timeout=settings.FORECAST_CACHE_TIMEOUT
+        )
+        cached.update(computed)
+        return {pk: cached[pk] for pk in product_ids}
+
+    @staticmethod
+    def _compute_forecast_batch(product_ids, workers=None, shard_size=None):
+        """
+        Forecasts of each product with its category's model. Baseline forecasts
+        come from the ProductForecastFeatures aggregates (one row per product);
+        other models, and products whose features row is missing, load the history.
+        """
+        month = date.today().month
+        rows = []
+        with timed('forecast', 'load'):
+            for chunk in _id_chunks(product_ids):
+                rows.extend(
+                    Product.objects.filter(pk__in=chunk).values_list(
+                        'product_id',
+                        'units_sold',
+                        'forecast_features__history_count',
+                        'forecast_features__weighted_units_sum',
+                        'forecast_features__total_weight',
+                        'forecast_features__units_sum',
+                        'forecast_features__month_units_sums',
+                        'forecast_features__month_counts',
+                        'category',
+                    )
+                )
+        found = {row[0] for row in rows}
+        forecasts = {pk: 0 for pk in product_ids if pk not in found}
+
+        models = dict(zip((row[0] for row in rows), DemandForecastService.model_names(row[8] for row in rows)))
+        with_features = [row for row in rows if row[2] is not None and models[row[0]] == DEFAULT_MODEL]
+        if with_features:
+            with timed('forecast', 'compute'):
+                forecasts.update(zip(
+                    [row[0] for row in with_features],
+                    forecast_from_features(
+                        [row[3] for row in with_features],
+                        [row[4] for row in with_features],
+                        [row[2] for row in with_features],
+                        [row[5] for row in with_features],
+                        [row[6][month - 1] for row in with_features],
+                        [row[7][month - 1] for row in with_features],
+                        [row[1] for row in with_features],
+                    ).tolist()
+                ))
+
+        from_history = [row for row in rows if row[2] is None or models[row[0]] != DEFAULT_MODEL]
+        if from_history:
+            with timed('forecast', 'load_history'):
+                ids, units, months, mask = load_history_matrix([row[0] for row in from_history])
+            with timed('forecast', 'compute_history'):
+                forecasts.update(DemandForecastService.forecast_from_matrix(
+                    ids, units, months, mask,
+                    np.array([row[1] for row in from_history], dtype=np.int64),
+                    current_month=month,
+                    workers=workers,
+                    shard_size=shard_size,
+                    models=[models[row[0]] for row in from_history],
+                ))
+        return forecasts
+
+    @staticmethod
+    def forecast_from_matrix(product_ids, units, months, mask, fallback_units, current_month=None,
+                             workers=None, shard_size=None, models=None):
+        """
+        Compute demand forecasts from preloaded history arrays (see ``load_history_matrix``).
+
+        ``fallback_units`` holds each product's current ``units_sold`` and is used
+        for products without history. ``models`` names the forecast model of each
+        product (default: the baseline model for all).
+        """
+        if current_month is None:
+            current_month = date.today().month
+
+        workers, shard_size = _parallelism(workers, shard_size)
+        arrays = {
+            'units': units,
+            'months': months,
+            'mask': mask,
+            'fallback_units': np.asarray(fallback_units),
+            'models': None if models is None else np.asarray(models),
+        }
+
+        demand_forecasts = []
+        for shard_forecasts in run_sharded(
+            forecast_shard, arrays, workers, shard_size, current_month=current_month
+        ):
+            demand_forecasts.extend(shard_forecasts)
+        return dict(zip(np.asarray(product_ids).tolist(), demand_forecasts))
+
+class ForecastFeatureService:
+    FEATURE_FIELDS = (
+        'history_count', 'weighted_units_sum', 'total_weight', 'units_sum', 'month_units_sums', 'month_counts'
+    )
+
+    @staticmethod
+    def rebuild(product_ids=None, chunk_size=2000):
+        """
+        Recompute the forecast features of the given products (all products if None)
+        from their full history. Returns the number of rows written.
+        """
+        if product_ids is None:
+            product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+        product_ids = list(dict.fromkeys(product_ids))
+
+        written = 0
+        for start in range(0, len(product_ids), chunk_size):
+            existing = []
+            for chunk in _id_chunks(product_ids[start:start + chunk_size]):
+                existing.extend(Product.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+            if not existing:
+                continue
+
+            ids, units, months, mask = load_history_matrix(existing)
+            counts, weighted_sums, units_sums, month_units_sums, month_counts = history_aggregates(units, months, mask)
+            ProductForecastFeatures.objects.bulk_create(
+                [
+                    ProductForecastFeatures(
+                        product_id=pk,
+                        history_count=count,
+                        weighted_units_sum=weighted_sum,
+                        total_weight=count * (count + 1) // 2,
+                        units_sum=units_sum,
+                        month_units_sums=month_sums,
+                        month_counts=month_count,
+                    )
+                    for pk, count, weighted_sum, units_sum, month_sums, month_count in zip(
+                        ids.tolist(), counts.tolist(), weighted_sums.tolist(), units_sums.tolist(),
+                        month_units_sums.tolist(), month_counts.tolist()
+                    )
+                ],
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=list(ForecastFeatureService.FEATURE_FIELDS) + ['updated_at'],
+            )
+            written += len(ids)
+        return written
+
+    @staticmethod
+    def create_empty(product_id):
+        """
+        Features row of a product without history
+        """
+        ProductForecastFeatures.objects.get_or_create(
+            product_id=product_id,
+            defaults={'month_units_sums': [0] * 12, 'month_counts': [0] * 12},
+        )
+
+    @staticmethod
+    def apply_history_change(history_id, old=None, new=None):
+        """
+        Incrementally update forecast features for one ProductHistory change.
+
+        ``old`` and ``new`` are ``(product_id, month, units_sold)`` of the entry
+        before and after the change (None for inserts and deletes). Removing or
+        adding an entry shifts the recency rank of every later entry by one, which
+        is accounted for with a single aggregate over the product's other entries.
+
+        When the other entries don't add up to the stored count (``QuerySet.delete()``
+        removes every row before the signals for each of them run, and bulk writes
+        send no signals at all) the product's features are rebuilt instead.
+        """
+        if old == new:
+            return
+
+        rebuilt = set()
+        with transaction.atomic():
+            for product_id, month, units, sign in filter(None, [
+                old and (*old, -1),
+                new and (*new, 1),
+            ]):
+                if product_id in rebuilt:
+                    continue
+                features = ProductForecastFeatures.objects.select_for_update().filter(product_id=product_id).first()
+                if features is None:
+                    # Product is being deleted, or its features were never built (forecasts then
+                    # fall back to a history scan until rebuild_forecast_features runs)
+                    continue
+
+                others = ProductHistory.objects.filter(product_id=product_id).exclude(pk=history_id).aggregate(
+                    count=Count('pk'),
+                    earlier=Count('pk', filter=Q(month__lt=month)),
+                    later_units=Sum('units_sold', filter=Q(month__gt=month)),
+                )
+                if others['count'] != features.history_count - (sign < 0):
+                    ForecastFeatureService.rebuild([product_id])
+                    rebuilt.add(product_id)
+                    continue
+                rank = others['earlier'] + 1
+
+                features.history_count += sign
+                features.weighted_units_sum += sign * (units * rank + (others['later_units'] or 0))
+                features.total_weight = features.history_count * (features.history_count + 1) // 2
+                features.units_sum += sign * units
+                features.month_units_sums[month.month - 1] += sign * units
+                features.month_counts[month.month - 1] += sign
+                features.save()
+
+
+class ElasticityService:
+    """
+    Price elasticities of demand fitted by log-log regression of units sold on
+    selling price, per product and pooled per category.
+
+    Each product's own slope is shrunk towards its category's pooled slope, and
+    each category's towards the pooled slope of all products (and that towards
+    DEFAULT_PRICE_ELASTICITY), weighted by price variation against
+    ELASTICITY_PRIOR_STRENGTH.
+    """
+    PRIORS_KEY = 'category-elasticities'
+    SUM_FIELDS = ('sample_count', 'sum_x', 'sum_y', 'sum_xx', 'sum_xy')
+
+    @staticmethod
+    def category_priors(refresh=False):
+        """
+        Pooled elasticity per category, and of all products under the None key
+        """
+        priors = None if refresh else cache.get(ElasticityService.PRIORS_KEY)
+        if priors is not None:
+            return priors
+
+        count = Cast('sample_count', FloatField())
+        totals = ProductElasticity.objects.filter(sample_count__gt=1).values('product__category').annotate(
+            sxx=Sum(F('sum_xx') - F('sum_x') * F('sum_x') / count, output_field=FloatField()),
+            sxy=Sum(F('sum_xy') - F('sum_x') * F('sum_y') / count, output_field=FloatField()),
+        ).values_list('product__category', 'sxx', 'sxy')
+        categories, sxx, sxy = zip(*totals) if totals else ((), (), ())
+        sxx = np.maximum(np.array(sxx, dtype=np.float64), 0.0)
+        sxy = np.array(sxy, dtype=np.float64)
+
+        strength = settings.ELASTICITY_PRIOR_STRENGTH
+        overall = float(fit_elasticities(sxx.sum(), sxy.sum(), settings.DEFAULT_PRICE_ELASTICITY, strength))
+        priors = dict(zip(categories, fit_elasticities(sxx, sxy, overall, strength).tolist()))
+        priors[None] = overall
+        # Single history changes don't refresh the priors (a full-table aggregate): they
+        # are recomputed when they expire or by refresh_elasticities
+        cache.set(ElasticityService.PRIORS_KEY, priors, timeout=settings.ELASTICITY_PRIORS_TIMEOUT)
+        return priors
+
+    @staticmethod
+    def priors_tag():
+        """
+        Short digest of the category priors, for cache keys of values derived from them
+        """
+        priors = sorted(ElasticityService.category_priors().items(), key=lambda item: str(item[0]))
+        return hashlib.md5(repr(priors).encode(), usedforsecurity=False).hexdigest()[:8]
+
+    @staticmethod
+    def elasticities(products):
+        """
+        Stored elasticity of each product (a list aligned with ``products``),
+        its category's for products that have none yet
+        """
+        products = list(products)
+        stored = {}
+        for chunk in _id_chunks([product.pk for product in products]):
+            stored.update(ProductElasticity.objects.filter(
+                product_id__in=chunk, elasticity__isnull=False
+            ).values_list('product_id', 'elasticity'))
+        if len(stored) < len(products):
+            priors = ElasticityService.category_priors()
+            return [stored.get(p.pk, priors.get(p.category, priors[None])) for p in products]
+        return [stored[product.pk] for product in products]
+
+    @staticmethod
+    def create_empty(product_id):
+        """
+        Regression sums row of a product without history (its elasticity is its category's)
+        """
+        ProductElasticity.objects.get_or_create(product_id=product_id)
+
+    @staticmethod
+    def rebuild(product_ids=None, chunk_size=2000, refresh_priors=True):
+        """
+        Recompute the regression sums of the given products (all products if None)
+        from their full history, then refit them. Returns the number of rows written.
+        """
+        all_products = product_ids is None
+        if all_products:
+            product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+        product_ids = list(dict.fromkeys(product_ids))
+
+        log_price = Ln(Cast('selling_price', FloatField()))
+        log_units = Ln(Cast('units_sold', FloatField()))
+        written = []
+        for start in range(0, len(product_ids), chunk_size):
+            existing = []
+            sums = {}
+            for chunk in _id_chunks(product_ids[start:start + chunk_size]):
+                existing.extend(Product.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+                sums.update((row[0], row[1:]) for row in ProductHistory.objects.filter(
+                    product_id__in=chunk, selling_price__gt=0, units_sold__gt=0
+                ).values('product_id').annotate(
+                    sample_count=Count('pk'),
+                    sum_x=Sum(log_price),
+                    sum_y=Sum(log_units),
+                    sum_xx=Sum(log_price * log_price, output_field=FloatField()),
+                    sum_xy=Sum(log_price * log_units, output_field=FloatField()),
+                ).values_list('product_id', *ElasticityService.SUM_FIELDS))
+            if not existing:
+                continue
+
+            ProductElasticity.objects.bulk_create(
+                [
+                    ProductElasticity(product_id=pk, **dict(zip(ElasticityService.SUM_FIELDS, sums.get(pk, (0,) * 5))))
+                    for pk in existing
+                ],
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=list(ElasticityService.SUM_FIELDS) + ['updated_at'],
+            )
+            written.extend(existing)
+        ElasticityService.refit(None if all_products else written, refresh_priors=refresh_priors)
+        return len(written)
+
+    @staticmethod
+    def refit(product_ids=None, refresh_priors=True, chunk_size=10000):
+        """
+        Re-estimate the elasticities of the given products (all if None) from their
+        stored sums in vectorized batches. Returns the number of changed estimates.
+        """
+        priors = ElasticityService.category_priors(refresh=refresh_priors)
+        queryset = ProductElasticity.objects.order_by('pk').values_list(
+            'product_id', 'product__category', 'elasticity', *ElasticityService.SUM_FIELDS
+        )
+        if product_ids is None:
+            stream = queryset.iterator(chunk_size=chunk_size)
+            batches = iter(lambda: list(itertools.islice(stream, chunk_size)), [])
+        else:
+            batches = (list(queryset.filter(pk__in=chunk)) for chunk in _id_chunks(list(product_ids)))
+
+        changed = 0
+        for rows in batches:
+            if not rows:
+                continue
+            columns = list(zip(*rows))
+            estimates = fit_elasticities(
+                *centered_log_sums(*columns[3:]),
+                prior=[priors.get(category, priors[None]) for category in columns[1]],
+                prior_strength=settings.ELASTICITY_PRIOR_STRENGTH,
+            ).tolist()
+            now = timezone.now()
+            updates = [
+                ProductElasticity(
+                    product_id=row[0],
+                    elasticity=estimate,
+                    updated_at=now,
+                    **dict(zip(ElasticityService.SUM_FIELDS, row[3:])),
+                )
+                for row, estimate in zip(rows, estimates)
+                if row[2] is None or abs(row[2] - estimate) > 1e-9
+            ]
+            # An upsert of existing rows: bulk_update's CASE expressions grow quadratically
+            ProductElasticity.objects.bulk_create(
+                updates,
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=['elasticity', 'updated_at'],
+            )
+            if updates:
+                # Visualization ETags depend on the elasticity
+                bump_history_version(*(update.product_id for update in updates))
+            changed += len(updates)
+        return changed
+
+    @staticmethod
+    def apply_history_change(old=None, new=None):
+        """
+        Incrementally update the regression sums and elasticity for one
+        ProductHistory change. ``old`` and ``new`` are ``(product_id,
+        selling_price, units_sold)`` of the entry before and after the change
+        (None for inserts and deletes).
+        """
+        if old == new:
+            return
+
+        affected = set()
+        missing = set()
+        for product_id, price, units, sign in filter(None, [old and (*old, -1), new and (*new, 1)]):
+            affected.add(product_id)
+            if price <= 0 or units <= 0:
+                continue
+            x, y = math.log(price), math.log(units)
+            updated = ProductElasticity.objects.filter(product_id=product_id).update(
+                sample_count=F('sample_count') + sign,
+                sum_x=F('sum_x') + sign * x,
+                sum_y=F('sum_y') + sign * y,
+                sum_xx=F('sum_xx') + sign * x * x,
+                sum_xy=F('sum_xy') + sign * x * y,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                missing.add(product_id)
+
+        if missing:
+            # Sums never built for these products (created before their rows were): build them from their history
+            ElasticityService.rebuild(missing, refresh_priors=False)
+        if affected - missing:
+            ElasticityService.refit(affected - missing, refresh_priors=False)
+
 
 class PriceOptimizationService:
+    # 'blend': current price blended with cost plus the margin target;
+    # 'profit': the price maximizing expected profit (see api.kernels.compute_profit_prices)
+    PRICING_METHODS = ('blend', 'profit')
+
+    @staticmethod
+    def check_pricing(pricing):
+        if pricing not in PriceOptimizationService.PRICING_METHODS:
+            raise ValueError(
+                f'Unknown pricing method {pricing!r} (expected one of: {", ".join(PriceOptimizationService.PRICING_METHODS)})'
+            )
+        return pricing
+
+    @staticmethod
+    def profit_solver_options():
+        return {
+            'price_range': (settings.PRICE_RANGE_MIN, settings.PRICE_RANGE_MAX),
+            'grid_points': settings.PRICE_GRID_POINTS,
+        }
+
     @staticmethod
-    def optimize_price(product_id, margin_target=0.3, price_sensitivity=1.0, consider_market=True):
+    def active_market_factors(categories=None, today=None):
+        """
+        Combined market factor of the conditions active today, per category.
+
+        Categories without active conditions are absent from the result (factor 1.0).
+        Served from the in-memory market condition index.
+        """
+        market_factors = market_index.active_factors(today or date.today())
+        if categories is not None:
+            categories = set(categories)
+            market_factors = {c: f for c, f in market_factors.items() if c in categories}
+        return market_factors
+
+    @staticmethod
+    def optimize_products_batch(products, margin_target=0.3, price_sensitivity=None, consider_market=True,
+                                market_factors=None, workers=None, shard_size=None, pricing='blend'):
+        """
+        Set-based counterpart of ``forecast_demand`` + ``optimize_price`` for many products.
+
+        ``products`` is an iterable of Product instances that is not queried again:
+        history and active market conditions are loaded once for the whole set and
+        prices are computed as array operations. ``market_factors`` optionally
+        passes a precomputed ``active_market_factors()`` result. Without a
+        ``price_sensitivity`` each product's estimated elasticity is used (see
+        ``ElasticityService``). ``pricing='profit'`` picks the profit-maximizing
+        price for the forecast demand and stock instead of the blended price
+        (``margin_target`` is then unused). Returns
+        ``{product_id: {'demand_forecast': int, 'optimized_price': float}}``.
+
+        With ``workers`` > 1 the preloaded arrays are split into shards of
+        ``shard_size`` products that are processed in a process pool and merged
+        (defaults: OPTIMIZATION_WORKERS and OPTIMIZATION_SHARD_SIZE settings).
+        """
+        PriceOptimizationService.check_pricing(pricing)
+        products = list(products)
+        if not products:
+            return {}
+
+        with timed('optimize_batch', 'load'):
+            ids, units, months, mask = load_history_matrix([p.product_id for p in products])
+
+            product_factors = None
+            if consider_market:
+                if market_factors is None:
+                    market_factors = PriceOptimizationService.active_market_factors(
+                        p.category for p in products
+                    )
+                product_factors = np.array([market_factors.get(p.category, 1.0) for p in products])
+
+            price_sensitivities = None
+            if price_sensitivity is None:
+                price_sensitivities = np.array(ElasticityService.elasticities(products))
+
+        workers, shard_size = _parallelism(workers, shard_size)
+        arrays = {
+            'units': units,
+            'months': months,
+            'mask': mask,
+            'fallback_units': np.array([p.units_sold for p in products], dtype=np.int64),
+            'models': np.array(DemandForecastService.model_names(p.category for p in products)),
+            'cost_prices': np.array([float(p.cost_price) for p in products]),
+            'selling_prices': np.array([float(p.selling_price) for p in products]),
+            'market_factors': product_factors,
+            'price_sensitivities': price_sensitivities,
+            'stock': np.array([p.stock_available for p in products], dtype=np.float64),
+        }
+        solver_options = PriceOptimizationService.profit_solver_options() if pricing == 'profit' else {}
+
+        demand_forecasts = []
+        optimized_prices = []
+        with timed('optimize_batch', 'compute'):
+            for shard_forecasts, shard_prices in run_sharded(
+                optimize_shard,
+                arrays,
+                workers,
+                shard_size,
+                current_month=date.today().month,
+                margin_target=margin_target,
+                price_sensitivity=price_sensitivity,
+                pricing=pricing,
+                **solver_options,
+            ):
+                demand_forecasts.extend(shard_forecasts)
+                optimized_prices.extend(shard_prices)
+
+        return {
+            product.product_id: {
+                'demand_forecast': demand_forecast,
+                'optimized_price': optimized_price,
+            }
+            for product, demand_forecast, optimized_price in zip(products, demand_forecasts, optimized_prices)
+        }
+
+    @staticmethod
+    def optimize_price(product_id, margin_target=0.3, price_sensitivity=None, consider_market=True, pricing='blend'):
         """
         Enhanced price optimization using demand elasticity model and market conditions
         
         Parameters:
         - product_id: ID of the product to optimize
         - margin_target: Target profit margin (default 0.3 or 30%)
-        - price_sensitivity: Price elasticity factor (default 1.0)
+        - price_sensitivity: Price elasticity factor (default: the product's estimated elasticity)
         - consider_market: Whether to consider market conditions (default True)
+        - pricing: 'blend' (default) or 'profit' (see optimize_products_batch)
         """
+        PriceOptimizationService.check_pricing(pricing)
         try:
-            product = Product.objects.get(pk=product_id)
-            demand_forecast = DemandForecastService.forecast_demand(product_id)
+            with timed('optimize_price', 'load'):
+                product = Product.objects.get(pk=product_id)
+                if price_sensitivity is None:
+                    price_sensitivity = ElasticityService.elasticities([product])[0]
+            with timed('optimize_price', 'forecast'):
+                demand_forecast = DemandForecastService.forecast_demand(product_id)
+            compute_started = time.perf_counter()
             
             cost_price = float(product.cost_price)
             current_price = float(product.selling_price)
             
+            if pricing == 'profit':
+                market_factor = market_index.factor(product.category, date.today()) if consider_market else None
+                optimized_price = compute_profit_prices(
+                    [cost_price],
+                    [current_price],
+                    None if market_factor is None else [market_factor],
+                    [demand_forecast],
+                    [price_sensitivity],
+                    [product.stock_available],
+                    **PriceOptimizationService.profit_solver_options(),
+                )[0]
+                observe_stage('optimize_price', 'compute', time.perf_counter() - compute_started)
+                return optimized_price
+            
             # Base optimal price (cost + target margin)
             base_optimal_price = cost_price * (1 + margin_target)
             
@@ -84,24 +732,8 @@ class PriceOptimizationService:
             
             # Consider market conditions if requested
             if consider_market:
-                # Get active market conditions for this product's category
-                today = date.today()
-                market_conditions = MarketCondition.objects.filter(
-                    category=product.category,
-                    start_date__lte=today
-                ).filter(
-                    end_date__gte=today
-                )
-                
-                # Apply market condition impacts
-                market_factor = 1.0
-                for condition in market_conditions:
-                    # Apply impact factor based on trend
-                    if condition.trend == 'up':
-                        market_factor *= float(condition.impact_factor)
-                    elif condition.trend == 'down':
-                        market_factor /= float(condition.impact_factor)
-                    # 'stable' trend doesn't change the factor
+                # Combined impact of the active market conditions for this product's category
+                market_factor = market_index.factor(product.category, date.today())
                 
                 # Apply market factor to the price
                 blended_price *= market_factor
@@ -112,7 +744,376 @@ class PriceOptimizationService:
             
             # Round to 2 decimal places
             optimized_price = round(max(blended_price, minimum_price), 2)
+            observe_stage('optimize_price', 'compute', time.perf_counter() - compute_started)
             
             return optimized_price
         except Product.DoesNotExist:
-            return 0.0
\ No newline at end of file
+            return 0.0
+
+    @staticmethod
+    def iter_optimized_chunks(queryset, chunk_size=2000, margin_target=0.3, price_sensitivity=None,
+                              consider_market=True, pricing='blend', workers=None):
+        """
+        Stream lists of ``(product, optimization)`` pairs for a product queryset.
+
+        Products are read through a server-side cursor and optimized
+        ``chunk_size`` at a time with ``optimize_products_batch``, so memory stays
+        bounded by the chunk size regardless of how many products match.
+        ``workers`` is passed on to ``optimize_products_batch``.
+        """
+        market_factors = PriceOptimizationService.active_market_factors() if consider_market else None
+
+        def optimize(chunk):
+            optimizations = PriceOptimizationService.optimize_products_batch(
+                chunk,
+                margin_target=margin_target,
+                price_sensitivity=price_sensitivity,
+                consider_market=consider_market,
+                market_factors=market_factors,
+                workers=workers,
+                pricing=pricing,
+            )
+            return [(product, optimizations[product.product_id]) for product in chunk]
+
+        # Time spent reading products from the cursor, excluding the consumer's time between chunks
+        chunk = []
+        read_started = time.perf_counter()
+        for product in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(product)
+            if len(chunk) >= chunk_size:
+                observe_stage('optimize_stream', 'load_products', time.perf_counter() - read_started)
+                yield optimize(chunk)
+                chunk = []
+                read_started = time.perf_counter()
+        if chunk:
+            observe_stage('optimize_stream', 'load_products', time.perf_counter() - read_started)
+            yield optimize(chunk)
+
+    @staticmethod
+    def iter_optimized_products(queryset, chunk_size=2000, **params):
+        """
+        Stream ``(product, optimization)`` pairs, see ``iter_optimized_chunks``.
+        """
+        for chunk in PriceOptimizationService.iter_optimized_chunks(queryset, chunk_size=chunk_size, **params):
+            yield from chunk
+
+
+class ScenarioSweepService:
+    METRICS = ('profit', 'revenue', 'units')
+
+    @staticmethod
+    def scenario_grid(margin_targets=(0.3,), price_sensitivities=(None,), consider_market=(True,), pricing=('blend',)):
+        """
+        Every combination of the parameter values as scenario dicts. Profit pricing
+        doesn't use the margin target, so it appears once (as None) in those scenarios.
+        """
+        scenarios = {}
+        for method, market, sensitivity, margin in itertools.product(
+            pricing, consider_market, price_sensitivities, margin_targets
+        ):
+            scenario = {
+                'margin_target': None if method == 'profit' else margin,
+                'price_sensitivity': sensitivity,
+                'consider_market': market,
+                'pricing': method,
+            }
+            scenarios.setdefault(tuple(scenario.values()), scenario)
+        return list(scenarios.values())
+
+    @staticmethod
+    def sweep(products, scenarios, workers=None):
+        """
+        Optimize ``products`` under every scenario of ``scenario_grid`` in one pass.
+
+        Forecasts, elasticities and market conditions are loaded once; prices and
+        their expected outcomes (units, revenue and profit under the product's
+        demand curve, see ``api.kernels.expected_outcomes``) are computed as
+        (scenarios x products) arrays. Returns ``{'product_ids', 'scenarios',
+        'prices'}`` where every scenario carries its totals and ``prices`` is the
+        array of optimized prices. ``workers`` is passed on to ``forecast_demand_batch``.
+        """
+        products = list(products)
+        with timed('sweep', 'load'):
+            forecasts = DemandForecastService.forecast_demand_batch([p.pk for p in products], workers=workers)
+            market_factors = {}
+            if any(scenario['consider_market'] for scenario in scenarios):
+                market_factors = PriceOptimizationService.active_market_factors(p.category for p in products)
+            cost_prices = np.array([float(p.cost_price) for p in products])
+            selling_prices = np.array([float(p.selling_price) for p in products])
+            demand_forecasts = np.array([forecasts[p.pk] for p in products], dtype=np.float64)
+            stock = np.array([p.stock_available for p in products], dtype=np.float64)
+            elasticities = np.array(ElasticityService.elasticities(products), dtype=np.float64)
+
+        with timed('sweep', 'compute'):
+            prices, scenario_elasticities, reference_prices = sweep_prices(
+                cost_prices,
+                selling_prices,
+                np.array([market_factors.get(p.category, 1.0) for p in products]),
+                demand_forecasts,
+                elasticities,
+                stock,
+                # Any value for profit pricing, which ignores it
+                np.array([scenario['margin_target'] or 0.0 for scenario in scenarios]),
+                np.array([np.nan if scenario['price_sensitivity'] is None else scenario['price_sensitivity']
+                          for scenario in scenarios]),
+                np.array([scenario['consider_market'] for scenario in scenarios]),
+                np.array([scenario['pricing'] for scenario in scenarios]),
+                **PriceOptimizationService.profit_solver_options(),
+            )
+            units, revenue, profit = expected_outcomes(
+                prices, reference_prices, cost_prices, demand_forecasts, scenario_elasticities, stock
+            )
+            price_changes = (prices / selling_prices - 1).mean(axis=1) if products else np.zeros(len(scenarios))
+
+        totals = zip(units.sum(axis=1).tolist(), revenue.sum(axis=1).tolist(), profit.sum(axis=1).tolist(),
+                     price_changes.tolist())
+        return {
+            'product_ids': [p.pk for p in products],
+            'scenarios': [
+                dict(scenario, units=round(total_units, 1), revenue=round(total_revenue, 2),
+                     profit=round(total_profit, 2), mean_price_change=round(price_change, 4))
+                for scenario, (total_units, total_revenue, total_profit, price_change) in zip(scenarios, totals)
+            ],
+            'prices': prices,
+        }
+
+
+class DemandCurveService:
+    # Named sources of the curves' elasticity; a number is used as is for every product
+    ELASTICITY_SOURCES = ('estimated', 'category')
+
+    @staticmethod
+    def curves(products, points=13, price_range=(0.7, 1.3), elasticity='estimated', workers=None):
+        """
+        Demand curves of many products around their current price.
+
+        Demand at the current price is the product's forecast; at other prices it
+        follows the constant-elasticity model with the product's estimated
+        elasticity (``'estimated'``), its category's (``'category'``) or a given
+        number. Curves are cached per product, keyed on its history version and
+        the parameters; misses are computed together (``workers`` is passed on to
+        ``forecast_demand_batch``). Returns
+        ``{product_id: {'current_price', 'forecasted_demand', 'price_elasticity', 'demand_curve'}}``.
+        """
+        products = list(products)
+        if not products:
+            return {}
+
+        params = f'{points}:{price_range[0]}:{price_range[1]}:{elasticity}'
+        if elasticity in DemandCurveService.ELASTICITY_SOURCES:
+            # Products without an own estimate use their category's, which changes without a version bump
+            params = f'{params}:{ElasticityService.priors_tag()}'
+        month = date.today().month
+        versions = history_versions([p.pk for p in products])
+        models = forecast_models_tag()
+        keys = {demand_curve_key(p.pk, versions[p.pk], month, params, models): p for p in products}
+        curves = {keys[key].pk: curve for key, curve in cache.get_many(keys).items()}
+        missing = [p for p in products if p.pk not in curves]
+        record_cache('demand_curve', hits=len(curves), misses=len(missing))
+        if not missing:
+            return curves
+
+        with timed('demand_curves', 'load'):
+            forecasts = DemandForecastService.forecast_demand_batch([p.pk for p in missing], workers=workers)
+            if elasticity == 'estimated':
+                elasticities = ElasticityService.elasticities(missing)
+            elif elasticity == 'category':
+                priors = ElasticityService.category_priors()
+                elasticities = [priors.get(p.category, priors[None]) for p in missing]
+            else:
+                elasticities = [float(elasticity)] * len(missing)
+
+        with timed('demand_curves', 'compute'):
+            current_prices = [float(p.selling_price) for p in missing]
+            demand_forecasts = [forecasts[p.pk] for p in missing]
+            prices, demand = demand_curves(current_prices, demand_forecasts, elasticities, points, price_range)
+            computed = {
+                product.pk: {
+                    'current_price': current_price,
+                    'forecasted_demand': demand_forecast,
+                    'price_elasticity': round(product_elasticity, 4),
+                    'demand_curve': [
+                        {'price': price, 'demand': units}
+                        for price, units in zip(product_prices, product_demand)
+                    ],
+                }
+                for product, current_price, demand_forecast, product_elasticity, product_prices, product_demand in zip(
+                    missing, current_prices, demand_forecasts, elasticities,
+                    np.round(prices, 2).tolist(), np.round(demand).tolist()
+                )
+            }
+
+        cache.set_many(
+            {demand_curve_key(pk, versions[pk], month, params, models): curve for pk, curve in computed.items()},
+            timeout=settings.FORECAST_CACHE_TIMEOUT
+        )
+        curves.update(computed)
+        return curves
+
+
+class OptimizationJobService:
+    @staticmethod
+    def create_job(user, filters=None, margin_target=0.3, price_sensitivity=None, consider_market=True,
+                   pricing='blend'):
+        """
+        Queue a bulk optimization of the products matching ``filters`` (ProductFilter params)
+        """
+        return OptimizationJob.objects.create(
+            parameters={
+                'filters': filters or {},
+                'margin_target': margin_target,
+                'price_sensitivity': price_sensitivity,
+                'consider_market': consider_market,
+                'pricing': pricing,
+            },
+            created_by=user,
+        )
+
+    @staticmethod
+    def claim_next_job():
+        """
+        Atomically move the oldest pending job to running and return its id (None if idle).
+
+        Safe to call from several runner processes at once: only one of them wins
+        the conditional update for a given job.
+        """
+        for job_id in OptimizationJob.objects.filter(
+            status=OptimizationJob.STATUS_PENDING
+        ).order_by('created_at', 'pk').values_list('pk', flat=True)[:10]:
+            now = timezone.now()
+            claimed = OptimizationJob.objects.filter(
+                pk=job_id, status=OptimizationJob.STATUS_PENDING
+            ).update(status=OptimizationJob.STATUS_RUNNING, started_at=now, heartbeat_at=now)
+            if claimed:
+                return job_id
+        return None
+
+    @staticmethod
+    def requeue_stale_jobs(timeout=None):
+        """
+        Put running jobs whose runner gave no sign of life for ``timeout`` seconds
+        (OPTIMIZATION_JOB_STALE_TIMEOUT by default) back in the queue, or cancel
+        them if that was requested. Returns the number of jobs requeued.
+
+        A requeued job resumes after the last chunk its previous runner committed.
+        """
+        if timeout is None:
+            timeout = settings.OPTIMIZATION_JOB_STALE_TIMEOUT
+        cutoff = timezone.now() - timedelta(seconds=timeout)
+        stale = OptimizationJob.objects.filter(status=OptimizationJob.STATUS_RUNNING).filter(
+            Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+        )
+        stale.filter(cancel_requested=True).update(status=OptimizationJob.STATUS_CANCELLED, finished_at=timezone.now())
+        return stale.update(status=OptimizationJob.STATUS_PENDING)
+
+    @staticmethod
+    def cancel_job(job):
+        """
+        Cancel a pending job immediately, or ask the runner to stop a running one
+        after its current chunk.
+        """
+        # Decided by the database rather than by ``job.status``, which a runner may
+        # have changed since it was read: the request is recorded first, so a job
+        # claimed in between still sees it before its first chunk
+        jobs = OptimizationJob.objects.filter(pk=job.pk)
+        jobs.exclude(status__in=OptimizationJob.FINISHED_STATUSES).update(cancel_requested=True)
+        jobs.filter(status=OptimizationJob.STATUS_PENDING).update(
+            status=OptimizationJob.STATUS_CANCELLED, finished_at=timezone.now()
+        )
+        job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def fail_job(job_id, error):
+        """
+        Mark a job whose runner died as failed
+        """
+        OptimizationJob.objects.filter(pk=job_id).exclude(
+            status__in=OptimizationJob.FINISHED_STATUSES
+        ).update(status=OptimizationJob.STATUS_FAILED, error=error, finished_at=timezone.now())
+
+    @staticmethod
+    def run_job(job_id, chunk_size=2000):
+        """
+        Process a claimed job chunk by chunk, persisting results and progress after
+        every chunk so they can be polled while the job runs.
+
+        Chunks are read with keyset pagination on the primary key, so no cursor
+        stays open while results are written, and a requeued job resumes after
+        its last stored result. Every chunk refreshes the job's heartbeat; a runner
+        whose job was requeued and claimed again (``started_at`` changed) stops
+        without writing anything more.
+        """
+        job = OptimizationJob.objects.get(pk=job_id)
+        claim = OptimizationJob.objects.filter(pk=job.pk, started_at=job.started_at)
+        parameters = job.parameters
+        consider_market = parameters.get('consider_market', True)
+        try:
+            products = ProductFilter(parameters.get('filters', {}), queryset=Product.objects.all()).qs.order_by('pk')
+            job.total_products = products.count()
+            job.save(update_fields=['total_products'])
+
+            market_factors = PriceOptimizationService.active_market_factors() if consider_market else None
+            log_parameters = {
+                'margin_target': parameters.get('margin_target', 0.3),
+                'price_sensitivity': parameters.get('price_sensitivity'),
+                'consider_market': consider_market,
+                'pricing': parameters.get('pricing', 'blend'),
+                'job': job.pk,
+            }
+            job.status = OptimizationJob.STATUS_COMPLETED
+            last_pk = job.results.aggregate(last_pk=Max('product_id'))['last_pk'] or 0
+            while True:
+                chunk = list(products.filter(pk__gt=last_pk)[:chunk_size])
+                if not chunk:
+                    break
+                if OptimizationJob.objects.filter(pk=job.pk, cancel_requested=True).exists():
+                    job.status = OptimizationJob.STATUS_CANCELLED
+                    break
+
+                optimizations = PriceOptimizationService.optimize_products_batch(
+                    chunk,
+                    margin_target=parameters.get('margin_target', 0.3),
+                    price_sensitivity=parameters.get('price_sensitivity'),
+                    consider_market=consider_market,
+                    market_factors=market_factors,
+                    pricing=parameters.get('pricing', 'blend'),
+                )
+                with transaction.atomic():
+                    if not claim.update(processed_products=F('processed_products') + len(chunk),
+                                        heartbeat_at=timezone.now()):
+                        # Requeued as stale and claimed by another runner
+                        return OptimizationJob.STATUS_PENDING
+                    OptimizationJobResult.objects.bulk_create([
+                        OptimizationJobResult(
+                            job=job,
+                            product=product,
+                            original_price=product.selling_price,
+                            optimized_price=optimizations[product.product_id]['optimized_price'],
+                            demand_forecast=optimizations[product.product_id]['demand_forecast'],
+                        )
+                        for product in chunk
+                    ])
+                if settings.LOG_BULK_OPTIMIZATIONS:
+                    optimization_log.add_many(
+                        [
+                            (
+                                product.pk,
+                                product.selling_price,
+                                optimizations[product.product_id]['optimized_price'],
+                                optimizations[product.product_id]['demand_forecast'],
+                            )
+                            for product in chunk
+                            if optimizations[product.product_id]['optimized_price'] > 0
+                        ],
+                        log_parameters,
+                        run_by_id=job.created_by_id,
+                    )
+                last_pk = chunk[-1].pk
+            optimization_log.flush()
+        except Exception as e:
+            job.status = OptimizationJob.STATUS_FAILED
+            job.error = str(e)
+
+        claim.update(status=job.status, error=job.error, finished_at=timezone.now())
+        return job.status
@@ -0,0 +1,84 @@
+# api/signals.py
+from django.db import connections
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+
+from .caching import bump_history_version
+from .market_index import bump_market_conditions_version
+from .models import Product, ProductHistory, MarketCondition
+from .search import FTS_TABLE, install_search_index
+from .services import ElasticityService, ForecastFeatureService
+
+
+def _history_key(product_id, month, units_sold):
+    month = ProductHistory._meta.get_field('month').to_python(month)
+    return (product_id, month, units_sold)
+
+
+def _price_key(product_id, selling_price, units_sold):
+    selling_price = ProductHistory._meta.get_field('selling_price').to_python(selling_price)
+    return (product_id, selling_price, units_sold)
+
+
+@receiver(pre_save, sender=ProductHistory)
+def remember_history_before_save(sender, instance, **kwargs):
+    """Keep the stored values of an updated entry for the incremental feature updates"""
+    instance._history_before_save = None
+    if instance.pk is not None:
+        instance._history_before_save = ProductHistory.objects.filter(pk=instance.pk).values_list(
+            'product_id', 'month', 'units_sold', 'selling_price'
+        ).first()
+
+
+@receiver(post_save, sender=ProductHistory)
+def update_features_on_history_save(sender, instance, **kwargs):
+    """Keep forecast features and elasticities current, then invalidate the product's cached forecasts"""
+    before = getattr(instance, '_history_before_save', None)
+    old = before and before[:3]
+    new = _history_key(instance.product_id, instance.month, instance.units_sold)
+    ForecastFeatureService.apply_history_change(instance.pk, old=old, new=new)
+    ElasticityService.apply_history_change(
+        old=before and (before[0], before[3], before[2]),
+        new=_price_key(instance.product_id, instance.selling_price, instance.units_sold),
+    )
+    bump_history_version(*{new[0], old[0] if old else new[0]})
+
+
+@receiver(post_delete, sender=ProductHistory)
+def update_features_on_history_delete(sender, instance, **kwargs):
+    old = _history_key(instance.product_id, instance.month, instance.units_sold)
+    ForecastFeatureService.apply_history_change(instance.pk, old=old)
+    ElasticityService.apply_history_change(
+        old=_price_key(instance.product_id, instance.selling_price, instance.units_sold)
+    )
+    bump_history_version(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+def invalidate_product_caches(sender, instance, created, **kwargs):
+    """Forecasts fall back to units_sold when there is no history, so product edits invalidate them too"""
+    if created:
+        ForecastFeatureService.create_empty(instance.pk)
+        ElasticityService.create_empty(instance.pk)
+    bump_history_version(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_deleted_product_caches(sender, instance, **kwargs):
+    bump_history_version(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=MarketCondition)
+def invalidate_market_index(sender, instance, **kwargs):
+    """Market condition changes make every process rebuild its market index"""
+    bump_market_conditions_version()
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, app_config, using, **kwargs):
+    """SQLite drops the FTS triggers whenever a migration remakes api_product"""
+    connection = connections[using]
+    if app_config.label == 'api' and connection.vendor == 'sqlite' and (
+        FTS_TABLE in connection.introspection.table_names()
+    ):
+        install_search_index(connection)
@@ -1,3 +1,1836 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import runpy
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from prometheus_client import REGISTRY
+
+from authentication.authorization import add_authorization_claims
+from authentication.backends import revoke_token
+from authentication.models import UserProfile
+from .caching import forecast_key, history_version
+from .checks import check_shared_cache
+from .fast_serializers import compile_row_serializer
+from .forecasting import FORECAST_MODELS, forecast_by_model
+from .health import DEPENDENCY_CHECKS, DependencyCheck, HealthCheckError
+from .ingestion import HistoryBatchValidator, ingest_history
+from .kernels import compute_profit_prices, optimize_shard, run_sharded
+from .market_index import market_index
+from .optimization_log import OptimizationLogWriter
+from .models import (
+    Product, ProductHistory, ProductForecastFeatures, ProductElasticity, MarketCondition, PriceOptimizationLog, OptimizationJob,
+    OptimizationJobResult
+)
+from .serializers import (
+    ProductSerializer, ProductHistorySerializer, PriceOptimizationLogSerializer, OptimizationJobSerializer
+)
+from .services import (
+    load_history_matrix, DemandCurveService, OptimizationJobService, DemandForecastService, ElasticityService,
+    ForecastFeatureService, PriceOptimizationService, ScenarioSweepService
+)
+
+
+def login_token(user):
+    """Access token with the claims the login view adds (role and permissions)"""
+    return add_authorization_claims(RefreshToken.for_user(user).access_token, user.pk)
+
+
+class ListQueryCountTests(TestCase):
+    """
+    List and detail endpoints must render a page in a fixed number of queries,
+    whatever the page size (see api.query_planning).
+    """
+    ROWS = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        UserProfile.objects.create(user=cls.user, user_type='admin')
+        cls.job = OptimizationJob.objects.create(created_by=cls.user, status=OptimizationJob.STATUS_COMPLETED)
+        for i in range(cls.ROWS):
+            creator = User.objects.create_user(f'user{i}')
+            product = Product.objects.create(
+                name=f'Product {i}',
+                description='Test product',
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal('15.00'),
+                category='Books',
+                stock_available=100,
+                units_sold=50,
+                created_by=creator,
+            )
+            for month in range(1, 4):
+                ProductHistory.objects.create(
+                    product=product,
+                    month=date(2024, month, 1),
+                    units_sold=40 + month,
+                    selling_price=Decimal('15.00'),
+                    cost_price=Decimal('10.00'),
+                )
+            MarketCondition.objects.create(
+                name=f'Condition {i}',
+                category='Books',
+                trend='up',
+                impact_factor=Decimal('1.05'),
+                start_date=date(2024, 1, 1),
+                created_by=creator,
+            )
+            PriceOptimizationLog.objects.create(
+                product=product,
+                original_price=Decimal('15.00'),
+                optimized_price=Decimal('14.50'),
+                demand_forecast=55,
+                run_by=creator,
+            )
+            OptimizationJobResult.objects.create(
+                job=cls.job,
+                product=product,
+                original_price=Decimal('15.00'),
+                optimized_price=Decimal('14.50'),
+                demand_forecast=55,
+            )
+        cls.product = Product.objects.order_by('pk').first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {login_token(self.user)}')
+
+    def assertPageQueries(self, url, queries):
+        """Small and large pages take the same number of queries"""
+        for page_size in (2, 20):
+            with self.subTest(url=url, page_size=page_size):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url, {'page_size': page_size})
+                self.assertEqual(response.status_code, 200)
+                # Views without CustomPagination ignore page_size and use PAGE_SIZE
+                self.assertIn(len(self.rows(response)), (page_size, 10))
+
+    @staticmethod
+    def rows(response):
+        # CustomPagination returns the bare list, DRF's default pagination wraps it
+        data = response.json()
+        return data['results'] if isinstance(data, dict) else data
+
+    # Every request authenticates the user (1 query); pages add a count and a select.
+    # Role and permission checks read the token claims.
+
+    def test_product_list(self):
+        self.assertPageQueries('/api/products/', 3)
+
+    def test_product_history_list(self):
+        self.assertPageQueries('/api/product-history/', 3)
+
+    def test_market_condition_list(self):
+        self.assertPageQueries('/api/market-conditions/', 3)
+
+    def test_optimization_log_list(self):
+        self.assertPageQueries('/api/optimization-logs/', 3)
+
+    def test_optimization_job_result_list(self):
+        # + the job lookup
+        self.assertPageQueries(f'/api/optimization-jobs/{self.job.pk}/results/', 4)
+
+    def test_product_detail(self):
+        # user, conditional GET validators, product with its creator, prefetched history
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/products/{self.product.pk}/')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['history']), 3)
+        self.assertEqual(data['created_by']['username'], 'user0')
+        # Unchanged: user and validators only
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/products/{self.product.pk}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_rendered_fields_unchanged(self):
+        response = self.client.get('/api/optimization-logs/', {'page_size': 1, 'ordering': 'created_at'})
+        log = self.rows(response)[0]
+        self.assertEqual(log['product']['name'], 'Product 0')
+        self.assertEqual(log['product']['created_by']['username'], 'user0')
+        self.assertEqual(log['run_by']['username'], 'user0')
+        self.assertEqual(log['optimization_parameters'], {})
+
+
+class RowSerializerTests(TestCase):
+    """
+    The values_list() read path must render exactly what the DRF serializers render
+    """
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('analyst', first_name='Ana')
+        for i, creator in enumerate([user, None]):
+            product = Product.objects.create(
+                name=f'Product {i}',
+                description='Tést "quoted"',
+                cost_price=Decimal('10.5'),
+                selling_price=Decimal('15.25'),
+                category='Books',
+                stock_available=3,
+                units_sold=0,
+                customer_rating=Decimal('4.5') if creator else None,
+                created_by=creator,
+            )
+            ProductHistory.objects.create(
+                product=product,
+                month=date(2024, 2, 1),
+                units_sold=7,
+                selling_price=Decimal('15.00'),
+                cost_price=Decimal('10.00'),
+            )
+            PriceOptimizationLog.objects.create(
+                product=product,
+                original_price=Decimal('15.25'),
+                optimized_price=Decimal('14.99'),
+                demand_forecast=8,
+                optimization_parameters={'margin_target': 0.3, 'consider_market': True},
+                run_by=creator,
+            )
+
+    def test_output_is_identical(self):
+        renderer = JSONRenderer()
+        for serializer_class in (ProductSerializer, ProductHistorySerializer, PriceOptimizationLogSerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                queryset = serializer_class.Meta.model.objects.order_by('pk')
+                row_serializer = compile_row_serializer(serializer_class())
+                self.assertIsNotNone(row_serializer)
+                self.assertEqual(
+                    renderer.render(row_serializer.render(queryset.values_list(*row_serializer.paths))),
+                    renderer.render(serializer_class(queryset, many=True).data),
+                )
+
+    def test_property_fields_fall_back_to_drf(self):
+        self.assertIsNone(compile_row_serializer(OptimizationJobSerializer()))
+
+
+class CursorPaginationTests(TestCase):
+    """
+    ?cursor= pages through a list in keyset order without OFFSET or COUNT
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer')
+        UserProfile.objects.create(user=cls.user, user_type='buyer')
+        for i in range(23):
+            Product.objects.create(
+                name=f'Product {i % 5}',
+                description='Test product',
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal(10 + i % 4),
+                category='Books',
+                stock_available=1,
+                units_sold=i,
+                customer_rating=None if i % 3 == 0 else Decimal(i % 5),
+                created_by=cls.user,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIsInstance(response.json(), list)
+            ids += [product['product_id'] for product in response.json()]
+            pages += 1
+            link = response.headers.get('Link')
+            url = link[1:link.index('>')] if link else None
+        return ids, pages
+
+    def test_pages_follow_ordering(self):
+        # NULLs sort as the largest value; ties are broken by the primary key
+        for ordering in ('name', '-selling_price', 'customer_rating', '-customer_rating'):
+            with self.subTest(ordering=ordering):
+                ids, pages = self.walk(f'/api/products/?cursor=&page_size=4&ordering={ordering}')
+                name = ordering.lstrip('-')
+                key = F(name).desc(nulls_first=True) if ordering.startswith('-') else F(name).asc(nulls_last=True)
+                self.assertEqual(ids, list(Product.objects.order_by(key, 'pk').values_list('pk', flat=True)))
+                self.assertEqual(pages, 6)
+
+    def test_no_count_query(self):
+        # user + page
+        with self.assertNumQueries(2):
+            self.client.get('/api/products/?cursor=&page_size=5')
+
+    def test_max_page_size(self):
+        with self.settings(CURSOR_PAGINATION_MAX_PAGE_SIZE=7):
+            response = self.client.get('/api/products/?cursor=&page_size=100')
+        self.assertEqual(len(response.json()), 7)
+
+    def test_sub_millisecond_datetimes(self):
+        # Rows closer together than the millisecond precision of JSON-encoded datetimes
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        start = timezone.now()
+        jobs = [OptimizationJob.objects.create(created_by=admin) for i in range(10)]
+        for i, job in enumerate(jobs):
+            OptimizationJob.objects.filter(pk=job.pk).update(created_at=start + timedelta(microseconds=100 * i))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(admin).access_token}')
+        ids, url = [], '/api/optimization-jobs/?cursor=&page_size=3'
+        while url:
+            response = self.client.get(url)
+            ids += [job['job_id'] for job in response.json()]
+            link = response.headers.get('Link')
+            url = link[1:link.index('>')] if link else None
+        self.assertEqual(ids, [job.pk for job in reversed(jobs)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/products/?cursor=&ordering=name&page_size=2')
+        link = response.headers['Link']
+        url = link[1:link.index('>')].replace('ordering=name', 'ordering=units_sold')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get('/api/products/?cursor=bogus').status_code, 404)
+
+
+class ProductSearchTests(TestCase):
+    """
+    ?search= prefix-matches every term against the full-text index and ranks by relevance
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer')
+        UserProfile.objects.create(user=cls.user, user_type='buyer')
+        for name, category, description in [
+            ('Trail runner', 'Footwear', 'Lightweight shoe'),
+            ('Running shoes', 'Sportswear', 'Cushioned running shoe'),
+            ('Desk lamp', 'Office', 'Pairs well with a runner rug'),
+        ]:
+            Product.objects.create(
+                name=name,
+                description=description,
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal('15.00'),
+                category=category,
+                stock_available=1,
+                units_sold=1,
+                created_by=cls.user,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def names(self, **params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return [product['name'] for product in response.json()]
+
+    def test_prefix_terms_all_match(self):
+        self.assertEqual(sorted(self.names(search='RUNN')), ['Desk lamp', 'Running shoes', 'Trail runner'])
+        self.assertEqual(sorted(self.names(search='run shoe')), ['Running shoes', 'Trail runner'])
+        self.assertEqual(self.names(search='sportsw'), ['Running shoes'])
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.names(search='runner')[-1], 'Desk lamp')
+        self.assertEqual(self.names(search='runner', ordering='name')[0], 'Desk lamp')
+
+    def test_index_follows_writes(self):
+        product = Product.objects.get(name='Desk lamp')
+        product.name = 'Reading lamp'
+        product.save()
+        self.assertEqual(self.names(search='reading'), ['Reading lamp'])
+        product.delete()
+        self.assertEqual(self.names(search='lamp'), [])
+
+    def test_ranked_search_has_no_cursor(self):
+        response = self.client.get('/api/products/', {'search': 'runner', 'cursor': ''})
+        self.assertEqual(response.status_code, 400)
+
+
+class CategoryFilterTests(TestCase):
+    """
+    category filters stay case-insensitive while comparing lower-cased values
+    """
+    def test_category_is_case_insensitive(self):
+        user = User.objects.create_user('buyer')
+        for category in ('Books', 'BOOKS', 'Bookshelves'):
+            Product.objects.create(
+                name=category,
+                description='',
+                cost_price=Decimal('1.00'),
+                selling_price=Decimal('2.00'),
+                category=category,
+                stock_available=1,
+                units_sold=1,
+            )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        response = client.get('/api/products/', {'category': 'books'})
+        self.assertEqual(sorted(product['name'] for product in response.json()), ['BOOKS', 'Books'])
+
+
+class ConditionalGetTests(TestCase):
+    """
+    Product, forecast and visualization responses carry validators and answer 304 while unchanged
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.product = Product.objects.create(
+            name='Lamp',
+            description='',
+            cost_price=Decimal('10.00'),
+            selling_price=Decimal('15.00'),
+            category='Home',
+            stock_available=1,
+            units_sold=30,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.urls = [
+            f'/api/products/{self.product.pk}/',
+            f'/api/products/{self.product.pk}/forecast/',
+            f'/api/products/{self.product.pk}/visualization-data/',
+        ]
+
+    def test_not_modified_until_data_changes(self):
+        etags = {}
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response.headers['Cache-Control'])
+            etags[url] = response.headers['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.headers['ETag'], etags[url])
+
+        ProductHistory.objects.create(
+            product=self.product,
+            month=date(2024, 1, 1),
+            units_sold=10,
+            selling_price=Decimal('15.00'),
+            cost_price=Decimal('10.00'),
+        )
+        for url in self.urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etags[url])
+
+    def test_history_change_retires_only_its_products_etags(self):
+        other = Product.objects.create(
+            name='Rug', description='', cost_price=Decimal('10.00'), selling_price=Decimal('15.00'),
+            category='Home', stock_available=1, units_sold=30,
+        )
+        other_urls = [url.replace(f'/{self.product.pk}/', f'/{other.pk}/') for url in self.urls]
+        etags = {url: self.client.get(url).headers['ETag'] for url in self.urls + other_urls}
+
+        ProductHistory.objects.create(
+            product=other, month=date(2024, 1, 1), units_sold=10,
+            selling_price=Decimal('15.00'), cost_price=Decimal('10.00'),
+        )
+        for url in self.urls:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 304)
+        for url in other_urls:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 200)
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.urls[0])
+        last_modified = response.headers['Last-Modified']
+        self.assertEqual(self.client.get(self.urls[0], HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_missing_product_and_permissions_come_first(self):
+        self.assertEqual(self.client.get('/api/products/0/', HTTP_IF_NONE_MATCH='*').status_code, 404)
+        response = APIClient().get(self.urls[1], HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 401)
+
+
+class AuthorizationTests(TestCase):
+    """
+    Permission classes read roles and permissions without queries once known,
+    and see role, group and permission changes immediately
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin')
+        UserProfile.objects.create(user=cls.admin, user_type='admin')
+        cls.analyst = User.objects.create_user('analyst')
+        cls.profile = UserProfile.objects.create(user=cls.analyst, user_type='analyst')
+        cls.pricing = Group.objects.create(name='pricing')
+        cls.product = Product.objects.create(
+            name='Lamp',
+            description='',
+            cost_price=Decimal('1.00'),
+            selling_price=Decimal('2.00'),
+            category='Home',
+            stock_available=1,
+            units_sold=1,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user, token=None):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token or RefreshToken.for_user(user).access_token}')
+        return client
+
+    def test_claims_need_no_queries(self):
+        client = self.client_for(self.analyst, login_token(self.analyst))
+        # user + count (no logs, so no page), no profile or permission lookups
+        with self.assertNumQueries(2):
+            self.assertEqual(client.get('/api/optimization-logs/').status_code, 200)
+
+    def test_tokens_without_claims_use_the_cache(self):
+        client = self.client_for(self.analyst)
+        # + the user's role and permissions, once
+        with self.assertNumQueries(4):
+            client.get('/api/optimization-logs/')
+        with self.assertNumQueries(2):
+            client.get('/api/optimization-logs/')
+
+    def test_role_change_voids_claims(self):
+        client = self.client_for(self.analyst, login_token(self.analyst))
+        self.profile.user_type = 'buyer'
+        self.profile.save()
+        self.assertEqual(client.get('/api/optimization-logs/').status_code, 403)
+
+    def test_group_and_permission_changes(self):
+        client = self.client_for(self.analyst, login_token(self.analyst))
+        url = f'/api/products/{self.product.pk}/forecast/'
+        self.assertEqual(client.get(url).status_code, 403)
+
+        # AssignRoleView replaces the user's groups
+        admin = self.client_for(self.admin)
+        response = admin.post(f'/auth/users/{self.analyst.pk}/roles/', {'group_ids': [self.pricing.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get(url).status_code, 403)
+
+        self.pricing.permissions.add(Permission.objects.get(codename='view_product_pricing'))
+        self.assertEqual(client.get(url).status_code, 200)
+
+        self.analyst.groups.clear()
+        self.assertEqual(client.get(url).status_code, 403)
+
+
+@override_settings(JWT_STATELESS_AUTH=True)
+class StatelessAuthenticationTests(TestCase):
+    """
+    With JWT_STATELESS_AUTH the user comes from the token claims; revoked tokens are refused
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analyst', email='analyst@example.com')
+        UserProfile.objects.create(user=cls.user, user_type='analyst')
+
+    def setUp(self):
+        cache.clear()
+        self.token = login_token(self.user)
+        self.token['username'] = self.user.username
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_no_user_query(self):
+        # count only: no user row, profile or permissions
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_row_loaded_when_needed(self):
+        response = self.client.post('/api/products/', {
+            'name': 'Lamp',
+            'description': 'Desk lamp',
+            'cost_price': '10.00',
+            'selling_price': '15.00',
+            'category': 'Home',
+            'stock_available': 1,
+            'units_sold': 0,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Product.objects.get().created_by, self.user)
+
+    def test_revoked_token(self):
+        revoke_token(self.token)
+        self.assertEqual(self.client.get('/api/products/').status_code, 401)
+
+    def test_deactivated_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/products/').status_code, 401)
+
+    def test_password_change(self):
+        self.user.set_password('new password')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/products/').status_code, 401)
+
+
+class MetricsTests(TestCase):
+    """
+    Requests, cache lookups and stages are recorded and exposed at /metrics
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.product = Product.objects.create(
+            name='Lamp',
+            description='',
+            cost_price=Decimal('10.00'),
+            selling_price=Decimal('15.00'),
+            category='Home',
+            stock_available=1,
+            units_sold=30,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_cache_and_stage_metrics(self):
+        view = {'view': 'demand-forecast'}
+        requests = self.sample('http_request_duration_seconds_count', method='GET', status='200', **view)
+        queries = self.sample('http_request_db_queries_sum', **view)
+        hits = self.sample('cache_lookups_total', cache='forecast', result='hit')
+        misses = self.sample('cache_lookups_total', cache='forecast', result='miss')
+        loads = self.sample('stage_duration_seconds_count', operation='forecast', stage='load')
+
+        for _ in range(2):
+            self.assertEqual(self.client.get(f'/api/products/{self.product.pk}/forecast/').status_code, 200)
+
+        self.assertEqual(self.sample('http_request_duration_seconds_count', method='GET', status='200', **view),
+                         requests + 2)
+        self.assertGreater(self.sample('http_request_db_queries_sum', **view), queries)
+        self.assertEqual(self.sample('cache_lookups_total', cache='forecast', result='miss'), misses + 1)
+        self.assertEqual(self.sample('cache_lookups_total', cache='forecast', result='hit'), hits + 1)
+        self.assertEqual(self.sample('stage_duration_seconds_count', operation='forecast', stage='load'), loads + 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/products/')
+        response = APIClient().get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_request_duration_seconds_bucket{', response.content)
+        self.assertIn(b'view="product-list"', response.content)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(APIClient().get('/metrics').status_code, 401)
+        response = APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_gunicorn_child_exit_marks_worker_dead(self):
+        config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+        with tempfile.TemporaryDirectory() as directory:
+            live, other = (os.path.join(directory, f'gauge_livesum_{pid}.db') for pid in (4242, 4343))
+            for path in (live, other):
+                open(path, 'wb').close()
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                config['child_exit'](None, mock.Mock(pid=4242))
+            self.assertEqual((os.path.exists(live), os.path.exists(other)), (False, True))
+
+
+class HealthTests(TestCase):
+    """
+    Readiness runs timed dependency checks and reuses their results; liveness checks nothing
+    """
+    def setUp(self):
+        for check in DEPENDENCY_CHECKS:
+            check.result = None
+
+    def test_liveness(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/health/live/')
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_readiness(self):
+        response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 200)
+        checks = response.json()['checks']
+        self.assertEqual(set(checks), {'database', 'migrations', 'cache', 'workers'})
+        self.assertEqual(checks['database']['status'], 'ok')
+        self.assertIn('latency_ms', checks['cache'])
+        self.assertEqual(checks['workers']['busy'], 0)
+
+        # Reused within the interval
+        self.assertEqual(self.client.get('/api/health/ready/').json()['checks']['database'], checks['database'])
+
+    @override_settings(HEALTH_MAX_SATURATION=0)
+    def test_saturated(self):
+        response = self.client.get('/api/health/ready/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['workers']['status'], 'fail')
+
+    @override_settings(HEALTH_CHECK_TIMEOUT=0.05)
+    def test_failing_and_hanging_checks(self):
+        def fail():
+            raise HealthCheckError('down')
+
+        result = DependencyCheck('broken', fail).check()
+        self.assertEqual((result['status'], result['error']), ('fail', 'down'))
+
+        released = threading.Event()
+        calls = []
+
+        def hang():
+            calls.append(1)
+            released.wait(5)
+
+        check = DependencyCheck('hanging', hang)
+        self.assertEqual(check.check()['error'], 'timed out after 0.05s')
+        with override_settings(HEALTH_CHECK_INTERVAL=0):
+            self.assertEqual(check.check()['status'], 'fail')
+        # The second probe waited for the run in flight instead of starting another
+        self.assertEqual(len(calls), 1)
+        released.set()
+
+
+class ForecastModelTests(TestCase):
+    """
+    Forecast models share the batch interface and are chosen per category
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = []
+        for name, category, step in (('Lamp', 'Home', 5), ('Phone', 'Electronics', 20)):
+            product = Product.objects.create(
+                name=name,
+                description='',
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal('15.00'),
+                category=category,
+                stock_available=1,
+                units_sold=30,
+            )
+            for month in range(1, 13):
+                ProductHistory.objects.create(
+                    product=product,
+                    month=date(2023, month, 1),
+                    units_sold=100 + step * month,
+                    selling_price=Decimal('15.00'),
+                    cost_price=Decimal('10.00'),
+                )
+            cls.products.append(product)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_models_follow_a_linear_trend(self):
+        units = np.array([[100 + 10 * t for t in range(24)], [0] * 24])
+        months = np.array([[t % 12 + 1 for t in range(24)], [0] * 24])
+        mask = np.array([[True] * 24, [False] * 24])
+        for name, model in FORECAST_MODELS.items():
+            forecasts = model.forecast(units, months, mask, np.array([50, 50]), current_month=1)
+            self.assertEqual(forecasts[1], 55, name)
+            if name != 'baseline':
+                # next entry: 100 + 10 * 24
+                self.assertAlmostEqual(forecasts[0], 340, delta=10, msg=name)
+
+        mixed = forecast_by_model(['least_squares', 'baseline'], units, months, mask, np.array([50, 50]), 1)
+        self.assertEqual(mixed[0], FORECAST_MODELS['least_squares'].forecast(units, months, mask, [50, 50], 1)[0])
+
+    @override_settings(FORECAST_MODEL='least_squares', FORECAST_CATEGORY_MODELS={'electronics': 'holt_winters'})
+    def test_model_per_category(self):
+        self.assertEqual(
+            DemandForecastService.model_names(['Home', 'ELECTRONICS']), ['least_squares', 'holt_winters']
+        )
+        ids = [product.pk for product in self.products]
+        batch = DemandForecastService.forecast_demand_batch(ids)
+        optimized = PriceOptimizationService.optimize_products_batch(self.products)
+        cache.clear()
+        for pk in ids:
+            self.assertEqual(DemandForecastService.forecast_demand(pk), batch[pk])
+            self.assertEqual(optimized[pk]['demand_forecast'], batch[pk])
+
+    def test_model_settings_change_cache_key(self):
+        product_id = self.products[0].pk
+        baseline = DemandForecastService.forecast_demand(product_id)
+        with override_settings(FORECAST_MODEL='least_squares'):
+            self.assertNotEqual(DemandForecastService.forecast_demand(product_id), baseline)
+        with override_settings(FORECAST_MODEL='arima'):
+            with self.assertRaises(ImproperlyConfigured):
+                DemandForecastService.forecast_demand_batch([product_id])
+
+
+class ForecastFeatureTests(TestCase):
+    """
+    Incrementally maintained forecast features equal the ones rebuilt from the full history
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(
+                name=name, description='', cost_price=Decimal('10.00'), selling_price=Decimal('15.00'),
+                category='Home', stock_available=1, units_sold=30,
+            )
+            for name in ('Lamp', 'Rug')
+        ]
+
+    def features(self):
+        return {
+            row[0]: row[1:]
+            for row in ProductForecastFeatures.objects.order_by('pk').values_list(
+                'product_id', *ForecastFeatureService.FEATURE_FIELDS
+            )
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.features()
+        ForecastFeatureService.rebuild()
+        self.assertEqual(incremental, self.features())
+
+    def test_incremental_updates_match_rebuild(self):
+        lamp, rug = self.products
+        self.assertMatchesRebuild()
+
+        # Inserted out of month order, so earlier entries shift the recency rank of later ones
+        entries = {
+            month: ProductHistory.objects.create(
+                product=lamp, month=date(2023, month, 1), units_sold=10 * month + 3,
+                selling_price=Decimal('15.00'), cost_price=Decimal('10.00'),
+            )
+            for month in (6, 2, 11, 1, 8)
+        }
+        ProductHistory.objects.create(
+            product=rug, month=date(2022, 12, 1), units_sold=7,
+            selling_price=Decimal('15.00'), cost_price=Decimal('10.00'),
+        )
+        self.assertMatchesRebuild()
+
+        entries[6].units_sold = 95
+        entries[6].save()
+        self.assertMatchesRebuild()
+
+        # Moved past other entries, and to another product
+        entries[2].month = date(2024, 2, 1)
+        entries[2].save()
+        entries[11].product = rug
+        entries[11].save()
+        self.assertMatchesRebuild()
+
+        entries[8].delete()
+        entries[1].delete()
+        self.assertMatchesRebuild()
+
+        ProductHistory.objects.filter(product=rug).delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(self.features()[rug.pk][0], 0)
+
+
+class ElasticityTests(TestCase):
+    """
+    Elasticities are fitted from price and sales history, shrunk towards the category and kept current
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.elastic, cls.flat = [
+            Product.objects.create(
+                name=name,
+                description='',
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal('20.00'),
+                category='Home',
+                stock_available=1,
+                units_sold=30,
+            )
+            for name in ('Lamp', 'Chair')
+        ]
+        for month in range(1, 13):
+            price = 10 + 2 * month
+            # Demand falls with the square of the price: elasticity 2
+            for product, price, units in ((cls.elastic, price, round(1e6 / price ** 2)), (cls.flat, 20, 50 + month)):
+                ProductHistory.objects.create(
+                    product=product,
+                    month=date(2023, month, 1),
+                    units_sold=units,
+                    selling_price=Decimal(price),
+                    cost_price=Decimal('10.00'),
+                )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_estimates(self):
+        ElasticityService.refit()
+        elastic, flat = ElasticityService.elasticities([self.elastic, self.flat])
+        self.assertAlmostEqual(elastic, 2.0, delta=0.05)
+        # No price variation: the category's estimate
+        self.assertAlmostEqual(flat, ElasticityService.category_priors()['Home'])
+        self.assertGreater(flat, 1.5)
+
+    def test_incremental_sums_match_rebuild(self):
+        entry = ProductHistory.objects.filter(product=self.elastic).first()
+        entry.selling_price = Decimal('40.00')
+        entry.save()
+        ProductHistory.objects.filter(product=self.elastic).last().delete()
+        incremental = ProductElasticity.objects.get(pk=self.elastic.pk)
+
+        ElasticityService.rebuild([self.elastic.pk])
+        rebuilt = ProductElasticity.objects.get(pk=self.elastic.pk)
+        self.assertEqual(incremental.sample_count, 11)
+        for field in ElasticityService.SUM_FIELDS:
+            self.assertAlmostEqual(getattr(incremental, field), getattr(rebuilt, field), places=6)
+
+    def test_history_changes_keep_cached_priors(self):
+        product = Product.objects.create(
+            name='Desk', description='', cost_price=Decimal('10.00'), selling_price=Decimal('20.00'),
+            category='Home', stock_available=1, units_sold=30,
+        )
+        # Created with the product, so the first history entry is an incremental update
+        self.assertEqual(ProductElasticity.objects.get(pk=product.pk).sample_count, 0)
+
+        priors = ElasticityService.category_priors()
+        # Sums that a refresh of the priors would pick up
+        ProductElasticity.objects.filter(pk=self.elastic.pk).update(sum_xy=F('sum_xy') * 2)
+        history = [
+            ProductHistory.objects.create(
+                product=product, month=date(2023, month, 1), units_sold=100 - 5 * month,
+                selling_price=Decimal(15 + month), cost_price=Decimal('10.00'),
+            )
+            for month in range(1, 4)
+        ]
+        history[0].units_sold = 90
+        history[0].save()
+        history[1].delete()
+        self.assertEqual(ProductElasticity.objects.get(pk=product.pk).sample_count, 2)
+        self.assertEqual(ElasticityService.category_priors(), priors)
+        self.assertNotEqual(ElasticityService.category_priors(refresh=True), priors)
+
+    @override_settings(ELASTICITY_PRIORS_TIMEOUT=60)
+    def test_priors_expire(self):
+        ElasticityService.category_priors()
+        with mock.patch('django.core.cache.cache.set') as cache_set:
+            ElasticityService.category_priors(refresh=True)
+        cache_set.assert_called_once_with(ElasticityService.PRIORS_KEY, mock.ANY, timeout=60)
+
+    def test_used_by_default(self):
+        elasticity = ElasticityService.elasticities([self.elastic])[0]
+        self.assertEqual(
+            PriceOptimizationService.optimize_price(self.elastic.pk),
+            PriceOptimizationService.optimize_price(self.elastic.pk, price_sensitivity=elasticity),
+        )
+        batch = PriceOptimizationService.optimize_products_batch([self.elastic])
+        self.assertEqual(batch[self.elastic.pk]['optimized_price'], PriceOptimizationService.optimize_price(self.elastic.pk))
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        response = client.get(f'/api/products/{self.elastic.pk}/visualization-data/')
+        self.assertAlmostEqual(response.json()['price_elasticity'], elasticity, places=3)
+
+
+class ProfitPricingTests(TestCase):
+    """
+    pricing='profit' picks the price maximizing expected profit under the margin and stock constraints
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.product = Product.objects.create(
+            name='Kettle',
+            description='',
+            cost_price=Decimal('10.00'),
+            selling_price=Decimal('15.00'),
+            category='Home',
+            stock_available=1000,
+            units_sold=100,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def solve(self, elasticity, stock, demand=100, **options):
+        return compute_profit_prices([10.0], [15.0], None, [demand], [elasticity], [stock], **options)[0]
+
+    def test_closed_form(self):
+        # Markup price cost * e / (e - 1)
+        self.assertEqual(self.solve(2.0, 1000), 20.0)
+        # Inelastic demand: the top of the price range
+        self.assertEqual(self.solve(0.5, 1000), 30.0)
+        # Very elastic demand with ample stock: cost plus the minimum margin
+        self.assertEqual(self.solve(50.0, 10 ** 12), 10.5)
+        # ... unless the stock runs out at a higher price
+        self.assertEqual(self.solve(50.0, 1000), round(15 * 0.1 ** (1 / 50), 2))
+        # Scarce stock: the price at which demand falls to the stock
+        self.assertEqual(self.solve(2.0, 25), 30.0)
+        self.assertEqual(self.solve(2.0, 40), round(15 * (100 / 40) ** 0.5, 2))
+        # Nothing to sell: the current price
+        self.assertEqual(self.solve(2.0, 0), 15.0)
+
+    def test_grid_matches_closed_form(self):
+        rng = np.random.default_rng(7)
+        size = 500
+        arrays = (
+            rng.uniform(5, 50, size),
+            rng.uniform(10, 100, size),
+            rng.uniform(0.8, 1.2, size),
+            rng.integers(1, 500, size),
+            rng.uniform(0, 5, size),
+            rng.integers(0, 600, size),
+        )
+        exact = np.array(compute_profit_prices(*arrays))
+        grid = np.array(compute_profit_prices(*arrays, grid_points=4001))
+        np.testing.assert_allclose(grid, exact, rtol=2e-3, atol=0.01)
+
+    def test_service_and_views(self):
+        ProductHistory.objects.create(
+            product=self.product,
+            month=date(2023, 1, 1),
+            units_sold=100,
+            selling_price=Decimal('15.00'),
+            cost_price=Decimal('10.00'),
+        )
+        single = PriceOptimizationService.optimize_price(self.product.pk, price_sensitivity=2.0, pricing='profit')
+        batch = PriceOptimizationService.optimize_products_batch(
+            [self.product], price_sensitivity=2.0, pricing='profit'
+        )[self.product.pk]
+        self.assertEqual(single, 20.0)
+        self.assertEqual(batch['optimized_price'], single)
+        with self.assertRaises(ValueError):
+            PriceOptimizationService.optimize_price(self.product.pk, pricing='revenue')
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        response = client.get(f'/api/products/{self.product.pk}/optimize/?pricing=profit&price_sensitivity=2')
+        self.assertEqual(response.json()['optimized_price'], 20.0)
+        response = client.get('/api/products/bulk-optimize/?pricing=profit&price_sensitivity=2')
+        self.assertEqual(response.json()[0]['optimized_price'], 20.0)
+        self.assertEqual(client.get('/api/products/bulk-optimize/?pricing=revenue').status_code, 400)
+
+
+class ScenarioSweepTests(TestCase):
+    """
+    One sweep request evaluates every parameter combination like separate optimizations would
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {index}',
+                description='',
+                cost_price=Decimal('10.00') + index,
+                selling_price=Decimal('16.00') + 2 * index,
+                category='Books' if index % 2 else 'Toys',
+                stock_available=40 + 30 * index,
+                units_sold=50,
+            )
+            for index in range(4)
+        ]
+        MarketCondition.objects.create(
+            name='Holiday demand',
+            description='',
+            category='Toys',
+            trend='up',
+            impact_factor=Decimal('1.20'),
+            start_date=date(2000, 1, 1),
+            end_date=date(2100, 1, 1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_scenario_grid(self):
+        scenarios = ScenarioSweepService.scenario_grid([0.2, 0.3], [None, 1.5], [True], ['blend', 'profit'])
+        # Profit pricing ignores the margin target
+        self.assertEqual(len(scenarios), 6)
+        self.assertEqual(
+            scenarios[-1], {'margin_target': None, 'price_sensitivity': 1.5, 'consider_market': True, 'pricing': 'profit'}
+        )
+
+    def test_matches_single_optimizations(self):
+        scenarios = ScenarioSweepService.scenario_grid(
+            [0.2, 0.4], [None, 0.5], [True, False], ['blend', 'profit']
+        )
+        sweep = ScenarioSweepService.sweep(self.products, scenarios)
+        self.assertEqual(sweep['prices'].shape, (len(scenarios), len(self.products)))
+        for scenario, prices in zip(scenarios, sweep['prices']):
+            expected = PriceOptimizationService.optimize_products_batch(
+                self.products,
+                margin_target=scenario['margin_target'] or 0.3,
+                price_sensitivity=scenario['price_sensitivity'],
+                consider_market=scenario['consider_market'],
+                pricing=scenario['pricing'],
+            )
+            np.testing.assert_allclose(
+                prices, [expected[p.pk]['optimized_price'] for p in self.products], atol=0.011
+            )
+
+    def test_endpoint(self):
+        body = {
+            'filters': {'category': 'Toys'},
+            'margin_target': {'start': 0.1, 'stop': 0.3, 'step': 0.1},
+            'price_sensitivity': [None, 2],
+            'pricing': ['blend', 'profit'],
+        }
+        response = self.client.post('/api/products/optimize-sweep/', dict(body, output='matrix'), format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([s['margin_target'] for s in data['scenarios'][:3]], [0.1, 0.2, 0.3])
+        self.assertEqual(len(data['scenarios']), 8)
+        self.assertEqual(data['product_ids'], [p.pk for p in self.products if p.category == 'Toys'])
+        self.assertEqual([len(row) for row in data['prices']], [8, 8])
+
+        response = self.client.post('/api/products/optimize-sweep/', dict(body, metric='revenue', top_k=3), format='json')
+        top = response.json()['top']
+        self.assertEqual(len(top), 3)
+        self.assertEqual([s['revenue'] for s in top], sorted((s['revenue'] for s in data['scenarios']), reverse=True)[:3])
+        self.assertEqual(data['scenarios'][top[0]['scenario']]['revenue'], top[0]['revenue'])
+
+        response = self.client.post('/api/products/optimize-sweep/', {'pricing': ['revenue']}, format='json')
+        self.assertEqual(response.status_code, 400)
+        with override_settings(SWEEP_MAX_CELLS=15):
+            response = self.client.post('/api/products/optimize-sweep/', {'price_sensitivity': [1, 2, 3, 4]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DemandCurveTests(TestCase):
+    """
+    Demand curves are computed for many products at once and cached per history version and parameters
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {index}',
+                description='',
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal('20.00') + index,
+                category='Garden',
+                stock_available=10,
+                units_sold=100 + 10 * index,
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_default_curve(self):
+        product = self.products[0]
+        response = self.client.get(f'/api/products/{product.pk}/visualization-data/')
+        data = response.json()
+        elasticity = ElasticityService.elasticities([product])[0]
+        forecast = DemandForecastService.forecast_demand(product.pk)
+        # -30% to +30% of the current price in 5% steps
+        expected = [
+            {'price': round(20 * (0.7 + i * 0.05), 2), 'demand': round(forecast * (0.7 + i * 0.05) ** -elasticity, 0)}
+            for i in range(13)
+        ]
+        self.assertEqual(data['demand_curve'], expected)
+        self.assertEqual(data['forecasted_demand'], forecast)
+
+        response = self.client.get(f'/api/products/{product.pk}/visualization-data/?points=3&elasticity=2')
+        self.assertEqual([point['demand'] for point in response.json()['demand_curve']],
+                         [round(forecast / 0.7 ** 2), forecast, round(forecast / 1.3 ** 2)])
+
+    def test_batch_endpoint(self):
+        ids = [self.products[2].pk, 999999, self.products[0].pk]
+        response = self.client.get(
+            '/api/products/demand-curves/', {'ids': ','.join(map(str, ids)), 'points': 5,
+                                             'min_price_ratio': 0.5, 'max_price_ratio': 1.5}
+        )
+        data = response.json()
+        self.assertEqual([curve['product_id'] for curve in data], [self.products[2].pk, self.products[0].pk])
+        self.assertEqual([point['price'] for point in data[0]['demand_curve']], [11.0, 16.5, 22.0, 27.5, 33.0])
+
+        response = self.client.get('/api/products/demand-curves/', {'ids': '1', 'max_price_ratio': 0.5})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cached_until_history_changes(self):
+        curves = DemandCurveService.curves(self.products, points=7)
+        with self.assertNumQueries(0):
+            self.assertEqual(DemandCurveService.curves(self.products, points=7), curves)
+
+        ProductHistory.objects.create(
+            product=self.products[1],
+            month=date(2023, 1, 1),
+            units_sold=400,
+            selling_price=Decimal('21.00'),
+            cost_price=Decimal('10.00'),
+        )
+        updated = DemandCurveService.curves(self.products, points=7)
+        self.assertEqual(updated[self.products[0].pk], curves[self.products[0].pk])
+        self.assertNotEqual(updated[self.products[1].pk]['forecasted_demand'], curves[self.products[1].pk]['forecasted_demand'])
+
+    def test_etag_depends_on_parameters(self):
+        url = f'/api/products/{self.products[0].pk}/visualization-data/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(f'{url}?points=25', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_changes_with_category_priors(self):
+        url = f'/api/products/{self.products[0].pk}/visualization-data/'
+        etags = {query: self.client.get(f'{url}{query}')['ETag'] for query in ['', '?elasticity=category', '?elasticity=1.5']}
+
+        priors = ElasticityService.category_priors()
+        cache.set(ElasticityService.PRIORS_KEY, {**priors, 'Garden': 2.5})
+        for query in ['', '?elasticity=category']:
+            response = self.client.get(f'{url}{query}', HTTP_IF_NONE_MATCH=etags[query])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etags[query])
+        # A fixed elasticity doesn't depend on the priors
+        self.assertEqual(self.client.get(f'{url}?elasticity=1.5', HTTP_IF_NONE_MATCH=etags['?elasticity=1.5']).status_code, 304)
+
+
+def baseline_forecast(product_id):
+    """
+    The original per-product forecast loop, kept as the reference the batch paths must match
+    """
+    product = Product.objects.get(pk=product_id)
+    history = list(ProductHistory.objects.filter(product=product).order_by('month'))
+    if not history:
+        return max(1, int(product.units_sold * 1.1))
+    weighted_sum = sum(entry.units_sold * (i + 1) for i, entry in enumerate(history))
+    total_weight = sum(i + 1 for i in range(len(history)))
+    avg_units = weighted_sum / total_weight
+    season_factor = 1.0
+    seasonal = [entry.units_sold for entry in history if entry.month.month == date.today().month]
+    if seasonal:
+        year_avg = sum(entry.units_sold for entry in history) / len(history)
+        if year_avg > 0:
+            season_factor = (sum(seasonal) / len(seasonal)) / year_avg
+    return max(1, int(avg_units * 1.1 * season_factor))
+
+
+class BatchForecastTests(TestCase):
+    """
+    forecast_demand_batch returns exactly what the per-product forecast loop returns
+    """
+    @classmethod
+    def setUpTestData(cls):
+        this_month = date.today().month
+        histories = {
+            # More than 12 months: the current calendar month appears twice
+            'long': [(2021 + (month - 1) // 12, (month - 1) % 12 + 1, 40 + 7 * month) for month in range(1, 19)],
+            # Gaps between entries
+            'gaps': [(2022, 1, 10), (2022, 4, 33), (2022, this_month, 21), (2023, 11, 5), (2023, 12, 70)],
+            'off_season': [(2022, m, 15 * m) for m in range(1, 13) if m != this_month],
+            'no_sales': [(2023, this_month, 0), (2023, this_month % 12 + 1, 0)],
+            'no_history': [],
+        }
+        cls.products = {}
+        for name, history in histories.items():
+            product = Product.objects.create(
+                name=name,
+                description='',
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal('15.00'),
+                category='Books',
+                stock_available=10,
+                units_sold=37,
+            )
+            for year, month, units in history:
+                ProductHistory.objects.create(
+                    product=product,
+                    month=date(year, month, 1),
+                    units_sold=units,
+                    selling_price=Decimal('15.00'),
+                    cost_price=Decimal('10.00'),
+                )
+            cls.products[name] = product
+
+    def setUp(self):
+        cache.clear()
+
+    def test_matches_single_product_loop(self):
+        ids = [product.pk for product in self.products.values()]
+        expected = {pk: baseline_forecast(pk) for pk in ids}
+        self.assertEqual(DemandForecastService.forecast_demand_batch(ids), expected)
+        self.assertEqual({pk: DemandForecastService.forecast_demand(pk) for pk in ids}, expected)
+        # Uncached, in a different order and with an unknown id
+        cache.clear()
+        batch = DemandForecastService.forecast_demand_batch(list(reversed(ids)) + [999999])
+        self.assertEqual(batch, {**expected, 999999: 0})
+
+    def test_history_matrix(self):
+        product_ids = [self.products['no_history'].pk, self.products['gaps'].pk]
+        ids, units, months, mask = load_history_matrix(product_ids)
+        self.assertEqual(ids.tolist(), product_ids)
+        self.assertEqual(units.shape, (2, 5))
+        self.assertFalse(mask[0].any())
+        # Oldest entry first
+        history = ProductHistory.objects.filter(product=self.products['gaps']).order_by('month')
+        self.assertEqual(units[1].tolist(), [entry.units_sold for entry in history])
+        self.assertEqual(months[1].tolist(), [entry.month.month for entry in history])
+        self.assertEqual(mask.sum(), 5)
+
+
+class BulkOptimizationTests(TestCase):
+    """
+    bulk-optimize returns for every product what optimize_price and forecast_demand return for it
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        for index in range(7):
+            product = Product.objects.create(
+                name=f'Product {index}',
+                description='',
+                cost_price=Decimal('10.00') + index,
+                selling_price=Decimal('14.50') + 3 * index,
+                category=('Books', 'Toys', 'Garden')[index % 3],
+                stock_available=20,
+                units_sold=30 + index,
+            )
+            for month in range(1, index + 1):
+                ProductHistory.objects.create(
+                    product=product,
+                    month=date(2023, month, 1),
+                    units_sold=20 + 3 * month * index,
+                    selling_price=Decimal('14.00') + month,
+                    cost_price=Decimal('10.00'),
+                )
+        MarketCondition.objects.create(
+            name='Shortage', description='', category='Toys', trend='up', impact_factor=Decimal('1.15'),
+            start_date=date(2000, 1, 1), end_date=date(2100, 1, 1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_matches_single_product_optimization(self):
+        for params in (
+            {},
+            {'margin_target': 0.45, 'price_sensitivity': 1.7},
+            {'consider_market': False, 'price_sensitivity': 0.05},
+        ):
+            with self.subTest(**params):
+                query = {key: str(value).lower() for key, value in params.items()}
+                response = self.client.get('/api/products/bulk-optimize/', query)
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(len(data), Product.objects.count())
+                for row in data:
+                    self.assertEqual(
+                        row['optimized_price'], PriceOptimizationService.optimize_price(row['product_id'], **params)
+                    )
+                    self.assertEqual(row['demand_forecast'], DemandForecastService.forecast_demand(row['product_id']))
+
+    @override_settings(BULK_OPTIMIZATION_CHUNK_SIZE=3)
+    def test_streams_every_product_once(self):
+        expected = {
+            row['product_id']: row['optimized_price']
+            for row in self.client.get('/api/products/bulk-optimize/').json()
+        }
+        response = self.client.get('/api/products/bulk-optimize/?format=ndjson')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(sorted(row['product_id'] for row in rows), sorted(expected))
+        self.assertEqual({row['product_id']: row['optimized_price'] for row in rows}, expected)
+
+        response = self.client.get('/api/products/bulk-optimize/?format=csv')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(sorted(int(row['product_id']) for row in rows), sorted(expected))
+        self.assertEqual({int(row['product_id']): float(row['optimized_price']) for row in rows}, expected)
+
+    @override_settings(OPTIMIZATION_WORKERS=4, OPTIMIZATION_SHARD_SIZE=2, BULK_OPTIMIZATION_CHUNK_SIZE=5)
+    def test_requests_never_start_process_pools(self):
+        ids = ','.join(str(pk) for pk in Product.objects.values_list('pk', flat=True))
+        with mock.patch('api.kernels.ProcessPoolExecutor', side_effect=AssertionError('process pool in a request')):
+            self.assertEqual(self.client.get('/api/products/bulk-optimize/').status_code, 200)
+            response = self.client.get('/api/products/bulk-optimize/?format=ndjson')
+            self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 7)
+            response = self.client.post('/api/products/optimize-sweep/', {'margin_target': [0.2, 0.3]}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.get('/api/products/demand-curves/', {'ids': ids}).status_code, 200)
+
+
+class OptimizationJobTests(TestCase):
+    """
+    Jobs move from pending through running to a finished status, chunk by chunk
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {index}',
+                description='',
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal('15.00') + index,
+                category='Books' if index < 4 else 'Toys',
+                stock_available=5,
+                units_sold=10 + index,
+            )
+            for index in range(6)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def create_job(self, **data):
+        response = self.client.post('/api/optimization-jobs/', data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], OptimizationJob.STATUS_PENDING)
+        return response.json()['job_id']
+
+    def test_run(self):
+        job_id = self.create_job(filters={'category': 'Books'}, margin_target=0.4, price_sensitivity=1.2)
+        self.assertEqual(OptimizationJobService.claim_next_job(), job_id)
+        self.assertEqual(OptimizationJob.objects.get(pk=job_id).status, OptimizationJob.STATUS_RUNNING)
+        # Claimed jobs are not handed out twice
+        self.assertIsNone(OptimizationJobService.claim_next_job())
+
+        self.assertEqual(OptimizationJobService.run_job(job_id, chunk_size=3), OptimizationJob.STATUS_COMPLETED)
+        job = self.client.get(f'/api/optimization-jobs/{job_id}/').json()
+        self.assertEqual((job['total_products'], job['processed_products'], job['progress']), (4, 4, 1.0))
+        results = self.client.get(f'/api/optimization-jobs/{job_id}/results/').json()
+        self.assertEqual(
+            {result['product']: result['optimized_price'] for result in results},
+            {
+                product.pk: f'{PriceOptimizationService.optimize_price(product.pk, 0.4, 1.2):.2f}'
+                for product in self.products[:4]
+            },
+        )
+        # Finished jobs can't be cancelled
+        self.assertEqual(self.client.post(f'/api/optimization-jobs/{job_id}/cancel/').status_code, 409)
+
+    def test_cancel(self):
+        pending = self.create_job()
+        response = self.client.post(f'/api/optimization-jobs/{pending}/cancel/')
+        self.assertEqual(response.json()['status'], OptimizationJob.STATUS_CANCELLED)
+        self.assertIsNone(OptimizationJobService.claim_next_job())
+
+        running = self.create_job()
+        OptimizationJobService.claim_next_job()
+        response = self.client.post(f'/api/optimization-jobs/{running}/cancel/')
+        self.assertEqual(response.json()['status'], OptimizationJob.STATUS_RUNNING)
+        self.assertTrue(response.json()['cancel_requested'])
+        # The runner stops before the next chunk
+        self.assertEqual(OptimizationJobService.run_job(running, chunk_size=2), OptimizationJob.STATUS_CANCELLED)
+        self.assertEqual(OptimizationJob.objects.get(pk=running).processed_products, 0)
+
+    def test_cancel_while_being_claimed(self):
+        job_id = self.create_job()
+        # The cancel view read the job as pending, then a runner claimed it
+        read_as_pending = OptimizationJob.objects.get(pk=job_id)
+        self.assertEqual(OptimizationJobService.claim_next_job(), job_id)
+
+        job = OptimizationJobService.cancel_job(read_as_pending)
+        self.assertEqual((job.status, job.cancel_requested), (OptimizationJob.STATUS_RUNNING, True))
+        self.assertEqual(OptimizationJobService.run_job(job_id, chunk_size=2), OptimizationJob.STATUS_CANCELLED)
+        self.assertFalse(OptimizationJobResult.objects.filter(job_id=job_id).exists())
+
+    def test_fail(self):
+        job_id = self.create_job()
+        OptimizationJobService.claim_next_job()
+        OptimizationJobService.fail_job(job_id, 'Worker crashed')
+        job = OptimizationJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.error), (OptimizationJob.STATUS_FAILED, 'Worker crashed'))
+        self.assertIsNotNone(job.finished_at)
+
+
+    def run_until_killed(self, job_id, chunks):
+        """Run a claimed job whose runner process dies after ``chunks`` chunks"""
+        optimize = PriceOptimizationService.optimize_products_batch
+        calls = []
+
+        def optimize_then_die(*args, **kwargs):
+            calls.append(1)
+            if len(calls) > chunks:
+                raise SystemExit('killed')
+            return optimize(*args, **kwargs)
+
+        with mock.patch.object(PriceOptimizationService, 'optimize_products_batch', side_effect=optimize_then_die):
+            with self.assertRaises(SystemExit):
+                OptimizationJobService.run_job(job_id, chunk_size=2)
+
+    def test_stale_jobs_requeued_and_resumed(self):
+        expected_id = self.create_job()
+        OptimizationJobService.claim_next_job()
+        OptimizationJobService.run_job(expected_id, chunk_size=2)
+        expected = dict(OptimizationJobResult.objects.filter(job_id=expected_id).values_list('product_id', 'optimized_price'))
+
+        job_id = self.create_job()
+        OptimizationJobService.claim_next_job()
+        self.run_until_killed(job_id, chunks=1)
+        job = OptimizationJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.processed_products), (OptimizationJob.STATUS_RUNNING, 2))
+
+        # A live runner's heartbeat keeps the job
+        self.assertEqual(OptimizationJobService.requeue_stale_jobs(timeout=60), 0)
+        OptimizationJob.objects.filter(pk=job_id).update(heartbeat_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(OptimizationJobService.requeue_stale_jobs(timeout=60), 1)
+        self.assertEqual(OptimizationJobService.claim_next_job(), job_id)
+
+        self.assertEqual(OptimizationJobService.run_job(job_id, chunk_size=2), OptimizationJob.STATUS_COMPLETED)
+        job = OptimizationJob.objects.get(pk=job_id)
+        self.assertEqual((job.processed_products, job.total_products), (6, 6))
+        results = list(OptimizationJobResult.objects.filter(job_id=job_id).values_list('product_id', 'optimized_price'))
+        self.assertEqual(len(results), 6)
+        self.assertEqual(dict(results), expected)
+
+    def test_stale_job_with_cancel_request_is_cancelled(self):
+        job_id = self.create_job()
+        OptimizationJobService.claim_next_job()
+        OptimizationJob.objects.filter(pk=job_id).update(
+            cancel_requested=True, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(OptimizationJobService.requeue_stale_jobs(timeout=60), 0)
+        self.assertEqual(OptimizationJob.objects.get(pk=job_id).status, OptimizationJob.STATUS_CANCELLED)
+
+    def test_runner_stops_once_its_job_is_claimed_again(self):
+        job_id = self.create_job()
+        OptimizationJobService.claim_next_job()
+        stale_runner_view = OptimizationJob.objects.get(pk=job_id)
+        OptimizationJob.objects.filter(pk=job_id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        OptimizationJobService.requeue_stale_jobs(timeout=60)
+        OptimizationJobService.claim_next_job()
+
+        with mock.patch.object(OptimizationJob.objects, 'get', return_value=stale_runner_view):
+            self.assertEqual(OptimizationJobService.run_job(job_id, chunk_size=2), OptimizationJob.STATUS_PENDING)
+        job = OptimizationJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.processed_products), (OptimizationJob.STATUS_RUNNING, 0))
+        self.assertFalse(OptimizationJobResult.objects.filter(job_id=job_id).exists())
+
+
+class ShardedExecutionTests(TestCase):
+    """
+    Sharded and process-pool runs return exactly what one pass over all rows returns
+    """
+    def arrays(self, size=23, width=14):
+        rng = np.random.default_rng(5)
+        counts = rng.integers(0, width + 1, size)
+        mask = np.arange(width) < counts[:, None]
+        return {
+            'units': np.where(mask, rng.integers(0, 200, (size, width)), 0),
+            'months': np.where(mask, rng.integers(1, 13, (size, width)), 0),
+            'mask': mask,
+            'fallback_units': rng.integers(0, 100, size),
+            'models': np.array(['baseline', 'holt_winters', 'least_squares'])[rng.integers(0, 3, size)],
+            'cost_prices': rng.uniform(5, 50, size),
+            'selling_prices': rng.uniform(10, 90, size),
+            'market_factors': None,
+            'price_sensitivities': rng.uniform(0, 3, size),
+            'stock': rng.integers(0, 300, size).astype(np.float64),
+        }
+
+    def test_run_sharded(self):
+        arrays = self.arrays()
+        for pricing in ('blend', 'profit'):
+            expected = optimize_shard(arrays, current_month=4, pricing=pricing)
+            for workers, shard_size in ((1, 5), (3, 4), (2, 100)):
+                with self.subTest(pricing=pricing, workers=workers, shard_size=shard_size):
+                    shards = run_sharded(
+                        optimize_shard, arrays, workers, shard_size, current_month=4, pricing=pricing
+                    )
+                    self.assertEqual(
+                        ([f for forecasts, _ in shards for f in forecasts], [p for _, prices in shards for p in prices]),
+                        expected,
+                    )
+
+    def test_batch_services(self):
+        products = [
+            Product.objects.create(
+                name=f'Product {index}',
+                description='',
+                cost_price=Decimal('10.00'),
+                selling_price=Decimal('12.00') + index,
+                category='Books',
+                stock_available=index,
+                units_sold=index * 3,
+            )
+            for index in range(9)
+        ]
+        for product in products[::2]:
+            ProductHistory.objects.create(
+                product=product,
+                month=date(2023, 5, 1),
+                units_sold=product.pk * 7,
+                selling_price=Decimal('13.00'),
+                cost_price=Decimal('10.00'),
+            )
+        expected = PriceOptimizationService.optimize_products_batch(products, workers=1)
+        cache.clear()
+        self.assertEqual(PriceOptimizationService.optimize_products_batch(products, workers=2, shard_size=2), expected)
+        cache.clear()
+        self.assertEqual(
+            DemandForecastService.forecast_demand_batch([p.pk for p in products], workers=3, shard_size=4),
+            {pk: optimization['demand_forecast'] for pk, optimization in expected.items()},
+        )
+
+
+class MarketConditionIndexTests(TestCase):
+    """
+    Conditions changed by another process (whose cache version bump this process
+    may not see) reach the process-local market index through its database stamp
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            name='Kite', description='', cost_price=Decimal('10.00'), selling_price=Decimal('20.00'),
+            category='Toys', stock_available=50, units_sold=40,
+        )
+        cls.condition = MarketCondition.objects.create(
+            name='Shortage', description='', category='Toys', trend='up', impact_factor=Decimal('1.10'),
+            start_date=date(2000, 1, 1), end_date=date(2100, 1, 1),
+        )
+
+    def setUp(self):
+        cache.clear()
+        market_index.invalidate()
+
+    def change_elsewhere(self, **fields):
+        # QuerySet.update() sends no signals, like a save whose cache bump lands in another process's cache
+        MarketCondition.objects.filter(pk=self.condition.pk).update(updated_at=timezone.now(), **fields)
+
+    @override_settings(MARKET_INDEX_CHECK_INTERVAL=0)
+    def test_next_optimization_uses_changed_condition(self):
+        before = PriceOptimizationService.optimize_price(self.product.pk)
+        self.assertEqual(market_index.factor('Toys'), 1.1)
+
+        self.change_elsewhere(impact_factor=Decimal('1.30'))
+        self.assertEqual(market_index.factor('Toys'), 1.3)
+        after = PriceOptimizationService.optimize_price(self.product.pk)
+        self.assertGreater(after, before)
+        self.assertEqual(
+            PriceOptimizationService.optimize_products_batch([self.product])[self.product.pk]['optimized_price'],
+            after,
+        )
+
+        MarketCondition.objects.create(
+            name='Glut', description='', category='Toys', trend='down', impact_factor=Decimal('1.30'),
+            start_date=date(2000, 1, 1), end_date=date(2100, 1, 1),
+        )
+        self.assertEqual(market_index.factor('Toys'), 1.0)
+
+    @override_settings(MARKET_INDEX_CHECK_INTERVAL=3600)
+    def test_local_copy_trusted_within_check_interval(self):
+        self.assertEqual(market_index.factor('Toys'), 1.1)
+        self.change_elsewhere(impact_factor=Decimal('1.30'))
+        with self.assertNumQueries(0):
+            self.assertEqual(market_index.factor('Toys'), 1.1)
+
+        # Changes made in this process bump the cache version and are picked up at once
+        self.condition.impact_factor = Decimal('1.50')
+        self.condition.save()
+        self.assertEqual(market_index.factor('Toys'), 1.5)
+
+
+class ForecastCacheTests(TestCase):
+    """
+    A history change retires the cached forecast of its product only
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(
+                name=name, description='', cost_price=Decimal('10.00'), selling_price=Decimal('15.00'),
+                category='Home', stock_available=5, units_sold=30,
+            )
+            for name in ('Lamp', 'Rug')
+        ]
+        for product in cls.products:
+            ProductHistory.objects.create(
+                product=product, month=date(2023, 3, 1), units_sold=40,
+                selling_price=Decimal('15.00'), cost_price=Decimal('10.00'),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def cached_forecast(self, product):
+        return cache.get(forecast_key(product.pk, history_version(product.pk), date.today().month))
+
+    def test_history_save_invalidates_only_its_product(self):
+        lamp, rug = self.products
+        forecasts = DemandForecastService.forecast_demand_batch([lamp.pk, rug.pk])
+        self.assertEqual(self.cached_forecast(lamp), forecasts[lamp.pk])
+        self.assertEqual(self.cached_forecast(rug), forecasts[rug.pk])
+
+        history = lamp.history.get()
+        history.units_sold = 400
+        history.save()
+        self.assertIsNone(self.cached_forecast(lamp))
+        self.assertEqual(self.cached_forecast(rug), forecasts[rug.pk])
+        self.assertGreater(DemandForecastService.forecast_demand(lamp.pk), forecasts[lamp.pk])
+
+    def test_process_local_cache_fails_deploy_check(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['api.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class OptimizationLogWriterTests(TestCase):
+    """
+    A flush writes what it can and never raises into the request that triggered it
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            name='Lamp', description='', cost_price=Decimal('10.00'), selling_price=Decimal('15.00'),
+            category='Home', stock_available=5, units_sold=30,
+        )
+
+    def entries(self, *forecasts):
+        return [(self.product.pk, Decimal('15.00'), Decimal('16.00'), forecast) for forecast in forecasts]
+
+    def test_bad_entry_is_dropped_and_the_rest_written(self):
+        writer = OptimizationLogWriter(buffer_size=3, flush_interval=3600)
+        writer.add_many(self.entries(10, 20), {'margin_target': 0.3})
+        with self.assertLogs('api.optimization_log', 'WARNING') as logs:
+            # The third entry fills the buffer; its flush must not raise into this call
+            writer.add_many(self.entries(None), {'margin_target': 0.3})
+        self.assertEqual(writer.pending(), 0)
+        self.assertEqual(
+            sorted(PriceOptimizationLog.objects.values_list('demand_forecast', flat=True)), [10, 20]
+        )
+        self.assertTrue(any(f'Dropped optimization log of product {self.product.pk}' in line for line in logs.output))
+
+    def test_entries_kept_while_database_unavailable(self):
+        writer = OptimizationLogWriter(buffer_size=10, flush_interval=3600)
+        writer.add_many(self.entries(10, 20), {})
+        with mock.patch.object(PriceOptimizationLog.objects, 'bulk_create', side_effect=OperationalError), \
+                mock.patch.object(PriceOptimizationLog, 'save', side_effect=OperationalError) as save, \
+                self.assertLogs('api.optimization_log', 'ERROR'):
+            self.assertEqual(writer.flush(), 0)
+        # The first unavailable error stops the flush
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(writer.pending(), 2)
+        self.assertEqual(writer.flush(), 2)
+        self.assertEqual(PriceOptimizationLog.objects.count(), 2)
+
+    def test_oldest_entries_dropped_beyond_max_pending(self):
+        writer = OptimizationLogWriter(buffer_size=2, flush_interval=3600, max_pending=3)
+        with mock.patch.object(PriceOptimizationLog.objects, 'bulk_create', side_effect=OperationalError), \
+                mock.patch.object(PriceOptimizationLog, 'save', side_effect=OperationalError), \
+                self.assertLogs('api.optimization_log', 'ERROR') as logs:
+            for forecast in range(1, 6):
+                writer.add_many(self.entries(forecast), {})
+        self.assertEqual(writer.pending(), 3)
+        self.assertTrue(any('dropped the 1 oldest entries' in line for line in logs.output))
+        self.assertEqual(writer.flush(), 3)
+        self.assertEqual(
+            sorted(PriceOptimizationLog.objects.values_list('demand_forecast', flat=True)), [3, 4, 5]
+        )
+
+
+class HistoryIngestionTests(TestCase):
+    """
+    Bulk history ingestion rejects invalid rows one by one, upserts on (product, month)
+    and refreshes what the bulk writes bypass
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        UserProfile.objects.create(user=cls.user, user_type='admin')
+        cls.product = Product.objects.create(
+            name='Lamp', description='', cost_price=Decimal('10.00'), selling_price=Decimal('15.00'),
+            category='Home', stock_available=5, units_sold=30,
+        )
+        cls.existing = ProductHistory.objects.create(
+            product=cls.product, month=date(2023, 1, 1), units_sold=10,
+            selling_price=Decimal('15.00'), cost_price=Decimal('10.00'),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def csv_body(self, *rows):
+        return '\n'.join(['product,month,units_sold,selling_price,cost_price', *rows]) + '\n'
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        pk = self.product.pk
+        rows = [
+            {'product': pk, 'month': '2023-02', 'units_sold': 5, 'selling_price': '15', 'cost_price': '10'},
+            {'product': 'lamp', 'month': '2023-03', 'units_sold': 5, 'selling_price': '15', 'cost_price': '10'},
+            {'product': 10 ** 30, 'month': '2023-03', 'units_sold': 5, 'selling_price': '15', 'cost_price': '10'},
+            {'product': pk, 'month': '2023-13', 'units_sold': 5, 'selling_price': '15', 'cost_price': '10'},
+            {'product': pk, 'month': '2023-04', 'units_sold': -1, 'selling_price': '15', 'cost_price': '10'},
+            {'product': pk, 'month': '2023-05', 'units_sold': 10 ** 40, 'selling_price': '1.234', 'cost_price': '1e9'},
+            {'product': pk, 'month': '2023-06', 'units_sold': True, 'selling_price': 'NaN', 'cost_price': None},
+            {'__invalid__': 'Line is not a JSON object.'},
+        ]
+        validator = HistoryBatchValidator(rows)
+        self.assertEqual(validator.valid.tolist(), [True] + [False] * 7)
+        self.assertEqual(validator.errors, {
+            1: {'product': ['A valid integer is required.']},
+            2: {'product': ['Product does not exist.']},
+            3: {'month': ['Enter a valid month (YYYY-MM or YYYY-MM-DD).']},
+            4: {'units_sold': ['Must be a non-negative integer.']},
+            5: {
+                'units_sold': ['Must be a non-negative integer.'],
+                'selling_price': ['A valid number with at most 2 decimal places is required.'],
+                'cost_price': ['Out of range.'],
+            },
+            6: {
+                'units_sold': ['A valid integer is required.'],
+                'selling_price': ['A valid number with at most 2 decimal places is required.'],
+                'cost_price': ['A valid number with at most 2 decimal places is required.'],
+            },
+            7: {'non_field_errors': ['Line is not a JSON object.']},
+        })
+        self.assertEqual(validator.valid_rows(), [(pk, date(2023, 2, 1), 5, Decimal('15'), Decimal('10'))])
+
+    def test_upserts_existing_months(self):
+        pk = self.product.pk
+        report = ingest_history(io.StringIO(self.csv_body(
+            f'{pk},2023-01,40,16.50,11',
+            f'{pk},2023-02-15,20,15,10',
+            f'{pk},2023-02,25,15,10',
+            f'{pk},2023-03,x,15,10',
+        )))
+        self.assertEqual(
+            (report['received'], report['upserted'], report['error_count']), (4, 2, 1)
+        )
+        self.assertEqual(report['errors'], [{'row': 4, 'errors': {'units_sold': ['A valid integer is required.']}}])
+        self.assertEqual(
+            list(ProductHistory.objects.filter(product=self.product).order_by('month').values_list(
+                'pk', 'month', 'units_sold', 'selling_price'
+            )),
+            [
+                (self.existing.pk, date(2023, 1, 1), 40, Decimal('16.50')),
+                (mock.ANY, date(2023, 2, 1), 25, Decimal('15.00')),
+            ],
+        )
+
+    def test_derived_data_rebuilt(self):
+        forecast = DemandForecastService.forecast_demand(self.product.pk)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {login_token(self.user)}')
+        body = self.csv_body(*(
+            f'{self.product.pk},2023-{month:02d},{round(1e5 / (10 + month) ** 2)},{10 + month},8'
+            for month in range(1, 13)
+        ))
+        response = client.post('/api/product-history/bulk/', body, content_type='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['upserted'], 12)
+
+        features = ProductForecastFeatures.objects.get(pk=self.product.pk)
+        elasticity = ProductElasticity.objects.get(pk=self.product.pk)
+        ForecastFeatureService.rebuild([self.product.pk])
+        ElasticityService.rebuild([self.product.pk])
+        rebuilt_features = ProductForecastFeatures.objects.get(pk=self.product.pk)
+        rebuilt_elasticity = ProductElasticity.objects.get(pk=self.product.pk)
+        for field in ForecastFeatureService.FEATURE_FIELDS:
+            self.assertEqual(getattr(features, field), getattr(rebuilt_features, field))
+        self.assertEqual(elasticity.sample_count, 12)
+        self.assertAlmostEqual(elasticity.elasticity, rebuilt_elasticity.elasticity)
+        self.assertGreater(elasticity.elasticity, 1.5)
+        # The cached forecast was invalidated
+        self.assertNotEqual(DemandForecastService.forecast_demand(self.product.pk), forecast)
@@ -7,14 +7,22 @@ from .views import (
     DemandForecastAPIView,
     PriceOptimizationAPIView,
     ProductBulkOptimizationAPIView,
+    ScenarioSweepAPIView,
     ProductHistoryAPIView,
     ProductHistoryDetailAPIView,
+    ProductHistoryBulkIngestAPIView,
     MarketConditionAPIView,
     MarketConditionDetailAPIView,
     PriceOptimizationLogAPIView,
     DemandVisualizationDataAPIView,
+    DemandCurveAPIView,
+    OptimizationJobAPIView,
+    OptimizationJobDetailAPIView,
+    OptimizationJobCancelAPIView,
+    OptimizationJobResultAPIView,
     health_check
 )
+from .health import liveness, readiness
 
 urlpatterns = [
     # Product endpoints
@@ -23,6 +31,7 @@ urlpatterns = [
     
     # Product history endpoints
     path('product-history/', ProductHistoryAPIView.as_view(), name='product-history-list'),
+    path('product-history/bulk/', ProductHistoryBulkIngestAPIView.as_view(), name='product-history-bulk'),
     path('product-history/<int:pk>/', ProductHistoryDetailAPIView.as_view(), name='product-history-detail'),
     
     # Market condition endpoints
@@ -33,9 +42,19 @@ urlpatterns = [
     path('products/<int:pk>/forecast/', DemandForecastAPIView.as_view(), name='demand-forecast'),
     path('products/<int:pk>/optimize/', PriceOptimizationAPIView.as_view(), name='price-optimization'),
     path('products/bulk-optimize/', ProductBulkOptimizationAPIView.as_view(), name='bulk-optimization'),
+    path('products/optimize-sweep/', ScenarioSweepAPIView.as_view(), name='optimization-sweep'),
     path('optimization-logs/', PriceOptimizationLogAPIView.as_view(), name='optimization-logs'),
     
+    # Background bulk optimization jobs
+    path('optimization-jobs/', OptimizationJobAPIView.as_view(), name='optimization-job-list'),
+    path('optimization-jobs/<int:pk>/', OptimizationJobDetailAPIView.as_view(), name='optimization-job-detail'),
+    path('optimization-jobs/<int:pk>/cancel/', OptimizationJobCancelAPIView.as_view(), name='optimization-job-cancel'),
+    path('optimization-jobs/<int:pk>/results/', OptimizationJobResultAPIView.as_view(), name='optimization-job-results'),
+    
     # Visualization data endpoints
     path('products/<int:pk>/visualization-data/', DemandVisualizationDataAPIView.as_view(), name='visualization-data'),
+    path('products/demand-curves/', DemandCurveAPIView.as_view(), name='demand-curves'),
     path('health/', health_check, name='health_check'),
+    path('health/live/', liveness, name='health-live'),
+    path('health/ready/', readiness, name='health-ready'),
 ]
\ No newline at end of file
@@ -1,26 +1,47 @@
 # api/views.py 
 
+import codecs
+
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from authentication.backends import TokenUserAuthentication
 from rest_framework.permissions import IsAuthenticated
-from django.http import Http404, JsonResponse
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
 from .pagination import CustomPagination
+from .query_planning import QueryPlanMixin
+from .fast_serializers import ValuesListMixin
+from .search import SearchRankOrderingFilter
+from .conditional import conditional_get, product_validators
+from .renderers import NDJSONRenderer, CSVRenderer
+from .metrics import timed
 
-from .models import Product, ProductHistory, MarketCondition, PriceOptimizationLog
+from .models import Product, ProductHistory, MarketCondition, PriceOptimizationLog, OptimizationJob
 from .serializers import (
     ProductSerializer, 
     ProductHistorySerializer, 
     ProductDetailSerializer,
     MarketConditionSerializer,
-    PriceOptimizationLogSerializer
+    PriceOptimizationLogSerializer,
+    OptimizationJobSerializer,
+    OptimizationJobCreateSerializer,
+    OptimizationJobResultSerializer,
+    ScenarioSweepSerializer,
+    DemandCurveParamsSerializer,
+    DemandCurveBatchParamsSerializer
+)
+from .services import (
+    DemandForecastService, PriceOptimizationService, OptimizationJobService, ScenarioSweepService, DemandCurveService,
+    ElasticityService
 )
-from .services import DemandForecastService, PriceOptimizationService
+from .ingestion import ingest_history
+from .optimization_log import optimization_log
 from .filters import ProductFilter, ProductHistoryFilter, MarketConditionFilter
 from .permissions import (
     IsAdmin, 
@@ -31,17 +52,22 @@ from .permissions import (
     CanOptimizeProductPricing
 )
 
-class ProductListAPIView(generics.ListCreateAPIView):
+# Requests compute inline in the web worker: a process pool per request would
+# multiply OPTIMIZATION_WORKERS by the number of concurrent requests. The
+# management commands and the job runner keep their pools.
+WEB_WORKERS = 1
+
+class ProductListAPIView(ValuesListMixin, QueryPlanMixin, generics.ListCreateAPIView):
     """
     List all products or create a new product
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    # ?search= is ProductFilter's full-text search; results are ranked unless ?ordering= is given
+    filter_backends = [DjangoFilterBackend, SearchRankOrderingFilter]
     filterset_class = ProductFilter
-    search_fields = ['name', 'description', 'category']
     ordering_fields = ['name', 'selling_price', 'units_sold', 'customer_rating']
     ordering = ['name']
     pagination_class = CustomPagination
@@ -50,19 +76,23 @@ class ProductListAPIView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class ProductDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ProductDetailAPIView(QueryPlanMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a product instance
     """
     queryset = Product.objects.all()
     serializer_class = ProductDetailSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated]
     
+    @conditional_get(lambda request, pk: product_validators(pk))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+    
     def get_object(self):
         pk = self.kwargs.get('pk')
         try:
-            return Product.objects.get(pk=pk)
+            return self.get_queryset().get(pk=pk)
         except Product.DoesNotExist:
             raise Http404
 
@@ -70,9 +100,10 @@ class DemandForecastAPIView(APIView):
     """
     Get demand forecast for a product
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated, CanViewProductPricing]
     
+    @conditional_get(lambda request, pk: product_validators(pk, monthly=True))
     def get(self, request, pk):
         try:
             product = Product.objects.get(pk=pk)
@@ -81,11 +112,25 @@ class DemandForecastAPIView(APIView):
         except Product.DoesNotExist:
             raise Http404
 
+def pricing_param(request):
+    """
+    The ``pricing`` query parameter, or None if it names no known method
+    """
+    pricing = request.query_params.get('pricing', 'blend')
+    return pricing if pricing in PriceOptimizationService.PRICING_METHODS else None
+
+
+def invalid_pricing_response():
+    return Response(
+        {'detail': f'pricing must be one of: {", ".join(PriceOptimizationService.PRICING_METHODS)}.'},
+        status=status.HTTP_400_BAD_REQUEST
+    )
+
 class PriceOptimizationAPIView(APIView):
     """
     Get optimized price for a product
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated, CanOptimizeProductPricing]
     
     def get(self, request, pk):
@@ -94,30 +139,37 @@ class PriceOptimizationAPIView(APIView):
             
             # Get parameters from query params with defaults
             margin_target = float(request.query_params.get('margin_target', 0.3))
-            price_sensitivity = float(request.query_params.get('price_sensitivity', 1.0))
+            # Default: the product's estimated price elasticity
+            price_sensitivity = request.query_params.get('price_sensitivity')
+            price_sensitivity = None if price_sensitivity is None else float(price_sensitivity)
             consider_market = request.query_params.get('consider_market', 'true').lower() == 'true'
+            pricing = pricing_param(request)
+            if pricing is None:
+                return invalid_pricing_response()
             
             # Pass parameters to the optimization service
             optimized_price = PriceOptimizationService.optimize_price(
                 pk, 
                 margin_target=margin_target,
                 price_sensitivity=price_sensitivity,
-                consider_market=consider_market
+                consider_market=consider_market,
+                pricing=pricing
             )
             
-            # Log the optimization if successful
+            # Log the optimization if successful (buffered, written in bulk)
             if optimized_price > 0:
-                PriceOptimizationLog.objects.create(
-                    product=product,
-                    original_price=product.selling_price,
-                    optimized_price=optimized_price,
-                    demand_forecast=DemandForecastService.forecast_demand(pk),
-                    optimization_parameters={
+                optimization_log.add(
+                    product.pk,
+                    product.selling_price,
+                    optimized_price,
+                    DemandForecastService.forecast_demand(pk),
+                    {
                         'margin_target': margin_target,
                         'price_sensitivity': price_sensitivity,
                         'consider_market': consider_market,
+                        'pricing': pricing,
                     },
-                    run_by=request.user
+                    run_by_id=request.user.pk
                 )
             
             return Response({
@@ -132,9 +184,14 @@ class PriceOptimizationAPIView(APIView):
 class ProductBulkOptimizationAPIView(APIView):
     """
     Get optimized prices and demand forecasts for all products
+
+    ``?format=ndjson`` and ``?format=csv`` stream the results in chunks instead
+    of building the whole list in memory.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated, CanOptimizeProductPricing]
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [NDJSONRenderer, CSVRenderer]
+    streaming_renderers = (NDJSONRenderer, CSVRenderer)
     
     def get(self, request):
         # Apply filters if provided
@@ -143,35 +200,243 @@ class ProductBulkOptimizationAPIView(APIView):
         
         # Get optimization parameters
         margin_target = float(request.query_params.get('margin_target', 0.3))
-        price_sensitivity = float(request.query_params.get('price_sensitivity', 1.0))
+        # Default: each product's estimated price elasticity
+        price_sensitivity = request.query_params.get('price_sensitivity')
+        price_sensitivity = None if price_sensitivity is None else float(price_sensitivity)
         consider_market = request.query_params.get('consider_market', 'true').lower() == 'true'
+        pricing = pricing_param(request)
+        if pricing is None:
+            return invalid_pricing_response()
         
-        result = []
-        
-        for product in products:
-            demand_forecast = DemandForecastService.forecast_demand(product.product_id)
-            optimized_price = PriceOptimizationService.optimize_price(
-                product.product_id,
+        if isinstance(request.accepted_renderer, self.streaming_renderers):
+            return self.stream_results(
+                request.accepted_renderer,
+                products,
                 margin_target=margin_target,
                 price_sensitivity=price_sensitivity,
-                consider_market=consider_market
+                consider_market=consider_market,
+                pricing=pricing
             )
-            
-            product_data = ProductSerializer(product).data
-            product_data['demand_forecast'] = demand_forecast
-            product_data['optimized_price'] = optimized_price
-            
-            result.append(product_data)
         
+        # Forecast and optimize the whole filtered set at once
+        with timed('bulk_optimize', 'load_products'):
+            products = list(products.select_related('created_by'))
+        optimizations = PriceOptimizationService.optimize_products_batch(
+            products,
+            margin_target=margin_target,
+            price_sensitivity=price_sensitivity,
+            consider_market=consider_market,
+            workers=WEB_WORKERS,
+            pricing=pricing
+        )
+        
+        with timed('bulk_optimize', 'serialize'):
+            result = ProductSerializer(products, many=True).data
+            for product_data in result:
+                optimization = optimizations[product_data['product_id']]
+                product_data['demand_forecast'] = optimization['demand_forecast']
+                product_data['optimized_price'] = optimization['optimized_price']
+        
+        with timed('bulk_optimize', 'log'):
+            self.log_results(
+                [(product, optimizations[product.product_id]) for product in products],
+                margin_target=margin_target,
+                price_sensitivity=price_sensitivity,
+                consider_market=consider_market,
+                pricing=pricing
+            )
+            optimization_log.flush()
         return Response(result)
+    
+    def log_results(self, optimized_products, **params):
+        if settings.LOG_BULK_OPTIMIZATIONS:
+            optimization_log.add_many(
+                [
+                    (product.pk, product.selling_price, optimization['optimized_price'], optimization['demand_forecast'])
+                    for product, optimization in optimized_products
+                    if optimization['optimized_price'] > 0
+                ],
+                dict(params, bulk=True),
+                run_by_id=self.request.user.pk
+            )
+    
+    def stream_results(self, renderer, products, **params):
+        optimized_chunks = PriceOptimizationService.iter_optimized_chunks(
+            products.select_related('created_by').order_by('pk'),
+            chunk_size=settings.BULK_OPTIMIZATION_CHUNK_SIZE,
+            workers=WEB_WORKERS,
+            **params
+        )
+        
+        def rows():
+            for chunk in optimized_chunks:
+                self.log_results(chunk, **params)
+                for product, optimization in chunk:
+                    product_data = ProductSerializer(product).data
+                    product_data['demand_forecast'] = optimization['demand_forecast']
+                    product_data['optimized_price'] = optimization['optimized_price']
+                    yield product_data
+            optimization_log.flush()
+        
+        if isinstance(renderer, CSVRenderer):
+            header = [
+                name for name in ProductSerializer().fields
+                if name not in ('demand_forecast', 'optimized_price')
+            ] + ['demand_forecast', 'optimized_price']
+            content = renderer.stream(rows(), header=header)
+        else:
+            content = renderer.stream(rows())
+        
+        response = StreamingHttpResponse(content, content_type=renderer.media_type)
+        if isinstance(renderer, CSVRenderer):
+            response['Content-Disposition'] = 'attachment; filename="bulk-optimization.csv"'
+        return response
+
+class ScenarioSweepAPIView(APIView):
+    """
+    Optimize the filtered products under every combination of the given
+    parameter values (what-if analysis; nothing is logged)
+    """
+    authentication_classes = [TokenUserAuthentication]
+    permission_classes = [IsAuthenticated, CanOptimizeProductPricing]
+    
+    def post(self, request):
+        input_serializer = ScenarioSweepSerializer(data=request.data)
+        input_serializer.is_valid(raise_exception=True)
+        params = input_serializer.validated_data
+        scenarios = params['scenarios']
+        
+        products = ProductFilter(params['filters'], queryset=Product.objects.all()).qs.order_by('pk')
+        cells = products.count() * len(scenarios)
+        if cells > settings.SWEEP_MAX_CELLS:
+            return Response(
+                {'detail': f'{cells} product scenarios, at most {settings.SWEEP_MAX_CELLS} are allowed. '
+                           'Narrow the filters or the parameter values.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        sweep = ScenarioSweepService.sweep(products, scenarios, workers=WEB_WORKERS)
+        
+        with timed('sweep', 'serialize'):
+            if params['output'] == 'matrix':
+                # One row per product, one column per scenario
+                return Response({
+                    'scenarios': sweep['scenarios'],
+                    'product_ids': sweep['product_ids'],
+                    'prices': sweep['prices'].T.round(2).tolist(),
+                })
+            
+            metric = params['metric']
+            ranked = sorted(
+                range(len(scenarios)), key=lambda index: sweep['scenarios'][index][metric], reverse=True
+            )
+            return Response({
+                'products': len(sweep['product_ids']),
+                'scenarios': len(scenarios),
+                'metric': metric,
+                'top': [dict(sweep['scenarios'][index], scenario=index) for index in ranked[:params['top_k']]],
+            })
+
+class OptimizationJobAPIView(QueryPlanMixin, generics.ListCreateAPIView):
+    """
+    List the user's bulk optimization jobs or queue a new one
+    
+    Jobs are processed outside the web workers by the run_optimization_jobs command.
+    """
+    serializer_class = OptimizationJobSerializer
+    authentication_classes = [TokenUserAuthentication]
+    permission_classes = [IsAuthenticated, CanOptimizeProductPricing]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status']
+    ordering_fields = ['created_at', 'status']
+    ordering = ['-created_at']
+    pagination_class = CustomPagination
+    
+    def get_queryset(self):
+        return self.plan(OptimizationJob.objects.filter(created_by_id=self.request.user.pk))
+    
+    def create(self, request, *args, **kwargs):
+        input_serializer = OptimizationJobCreateSerializer(data=request.data)
+        input_serializer.is_valid(raise_exception=True)
+        job = OptimizationJobService.create_job(request.user, **input_serializer.validated_data)
+        return Response(OptimizationJobSerializer(job).data, status=status.HTTP_201_CREATED)
+
+class OptimizationJobDetailAPIView(QueryPlanMixin, generics.RetrieveAPIView):
+    """
+    Poll the status and progress of an optimization job
+    """
+    serializer_class = OptimizationJobSerializer
+    authentication_classes = [TokenUserAuthentication]
+    permission_classes = [IsAuthenticated, CanOptimizeProductPricing]
+    
+    def get_queryset(self):
+        return self.plan(OptimizationJob.objects.filter(created_by_id=self.request.user.pk))
+
+class OptimizationJobCancelAPIView(generics.GenericAPIView):
+    """
+    Cancel a pending or running optimization job
+    """
+    serializer_class = OptimizationJobSerializer
+    authentication_classes = [TokenUserAuthentication]
+    permission_classes = [IsAuthenticated, CanOptimizeProductPricing]
+    
+    def get_queryset(self):
+        return OptimizationJob.objects.filter(created_by_id=self.request.user.pk).select_related('created_by')
+    
+    def post(self, request, pk):
+        job = self.get_object()
+        if job.status in OptimizationJob.FINISHED_STATUSES:
+            return Response(
+                {'detail': f'Job is already {job.status}.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        job = OptimizationJobService.cancel_job(job)
+        return Response(OptimizationJobSerializer(job).data)
+
+class OptimizationJobResultAPIView(QueryPlanMixin, generics.ListAPIView):
+    """
+    Results of an optimization job, available while it runs
+    
+    ``?format=ndjson`` and ``?format=csv`` download all results as a stream.
+    """
+    serializer_class = OptimizationJobResultSerializer
+    authentication_classes = [TokenUserAuthentication]
+    permission_classes = [IsAuthenticated, CanOptimizeProductPricing]
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [NDJSONRenderer, CSVRenderer]
+    pagination_class = CustomPagination
+    
+    def get_queryset(self):
+        job = generics.get_object_or_404(
+            OptimizationJob.objects.filter(created_by_id=self.request.user.pk), pk=self.kwargs['pk']
+        )
+        return self.plan(job.results.order_by('pk'))
+    
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if isinstance(renderer, (NDJSONRenderer, CSVRenderer)):
+            rows = (
+                self.get_serializer(result).data
+                for result in self.get_queryset().iterator(chunk_size=settings.BULK_OPTIMIZATION_CHUNK_SIZE)
+            )
+            if isinstance(renderer, CSVRenderer):
+                content = renderer.stream(rows, header=list(OptimizationJobResultSerializer.Meta.fields))
+            else:
+                content = renderer.stream(rows)
+            response = StreamingHttpResponse(content, content_type=renderer.media_type)
+            if isinstance(renderer, CSVRenderer):
+                response['Content-Disposition'] = (
+                    f'attachment; filename="optimization-job-{self.kwargs["pk"]}.csv"'
+                )
+            return response
+        return super().list(request, *args, **kwargs)
 
-class ProductHistoryAPIView(generics.ListCreateAPIView):
+class ProductHistoryAPIView(ValuesListMixin, QueryPlanMixin, generics.ListCreateAPIView):
     """
     List all product history entries or create a new one
     """
     queryset = ProductHistory.objects.all()
     serializer_class = ProductHistorySerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = ProductHistoryFilter
@@ -180,22 +445,55 @@ class ProductHistoryAPIView(generics.ListCreateAPIView):
     pagination_class = CustomPagination
     # pagination_class = None
 
-class ProductHistoryDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ProductHistoryBulkIngestAPIView(APIView):
+    """
+    Upsert many product history rows at once
+    
+    POST a CSV (``Content-Type: text/csv``) or NDJSON (``application/x-ndjson``)
+    body with product, month, units_sold, selling_price and cost_price columns.
+    Invalid rows are reported per row and don't abort the upload.
+    """
+    authentication_classes = [TokenUserAuthentication]
+    permission_classes = [IsAuthenticated, IsAdmin]
+    content_formats = {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'ndjson',
+        'application/ndjson': 'ndjson',
+    }
+    
+    def post(self, request):
+        content_type = request.content_type.split(';')[0].strip().lower()
+        input_format = self.content_formats.get(content_type)
+        if input_format is None:
+            return Response(
+                {'detail': f'Unsupported content type "{content_type}", use text/csv or application/x-ndjson.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        
+        # Read the body line by line instead of letting DRF parse it into memory
+        lines = codecs.iterdecode(iter(request.stream or []), 'utf-8')
+        try:
+            report = ingest_history(lines, input_format=input_format, batch_size=settings.HISTORY_INGEST_BATCH_SIZE)
+        except UnicodeDecodeError:
+            return Response({'detail': 'Body must be UTF-8 encoded.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+class ProductHistoryDetailAPIView(QueryPlanMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a product history instance
     """
     queryset = ProductHistory.objects.all()
     serializer_class = ProductHistorySerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated, IsAdmin]
 
-class MarketConditionAPIView(generics.ListCreateAPIView):
+class MarketConditionAPIView(QueryPlanMixin, generics.ListCreateAPIView):
     """
     List all market conditions or create a new one
     """
     queryset = MarketCondition.objects.all()
     serializer_class = MarketConditionSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = MarketConditionFilter
@@ -208,81 +506,103 @@ class MarketConditionAPIView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-class MarketConditionDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class MarketConditionDetailAPIView(QueryPlanMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a market condition
     """
     queryset = MarketCondition.objects.all()
     serializer_class = MarketConditionSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated, IsAdmin|IsAnalyst]
 
-class PriceOptimizationLogAPIView(generics.ListAPIView):
+class PriceOptimizationLogAPIView(ValuesListMixin, QueryPlanMixin, generics.ListAPIView):
     """
     List optimization logs
     """
     queryset = PriceOptimizationLog.objects.all()
     serializer_class = PriceOptimizationLogSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated, IsAdmin|IsAnalyst]
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_fields = ['product', 'run_by', 'created_at']
     ordering_fields = ['created_at', 'product', 'original_price', 'optimized_price']
     ordering = ['-created_at']
+    
+    def list(self, request, *args, **kwargs):
+        # Include entries still buffered by this process
+        optimization_log.flush()
+        return super().list(request, *args, **kwargs)
+
+def visualization_validators(request, pk):
+    validators = product_validators(pk, monthly=True)
+    if validators is None:
+        return None
+    # Estimated and category elasticities fall back on the category priors, which
+    # change without any change to this product
+    if request.query_params.get('elasticity', 'estimated') in DemandCurveService.ELASTICITY_SOURCES:
+        parts, last_modified = validators
+        validators = [*parts, ElasticityService.priors_tag()], last_modified
+    return validators
+
 
 class DemandVisualizationDataAPIView(APIView):
     """
     Get demand visualization data for charts
+
+    The demand curve takes the ``DemandCurveParamsSerializer`` query parameters.
     """
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [TokenUserAuthentication]
     permission_classes = [IsAuthenticated, CanViewProductPricing]
     
+    @conditional_get(visualization_validators)
     def get(self, request, pk):
+        params = DemandCurveParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
         try:
             product = Product.objects.get(pk=pk)
-            history = ProductHistory.objects.filter(product=product).order_by('month')
-            
-            # Create data points for the demand vs price chart
-            price_points = []
-            for h in history:
-                price_points.append({
-                    'date': h.month.strftime('%Y-%m'),
-                    'selling_price': float(h.selling_price),
-                    'units_sold': h.units_sold
-                })
-            
-            # Generate hypothetical price points for demand curve
-            base_price = float(product.selling_price)
-            base_demand = DemandForecastService.forecast_demand(pk)
-            price_sensitivity = 0.7  # Elasticity factor
-            
-            curve_points = []
-            price_range = [base_price * (1 - 0.3 + i * 0.05) for i in range(13)]  # -30% to +30%
-            
-            for price in price_range:
-                # Simple elasticity model: (P1/P0)^(-e) = (Q1/Q0)
-                # where e is price elasticity of demand
-                price_ratio = price / base_price
-                demand_ratio = price_ratio ** (-price_sensitivity)
-                demand = base_demand * demand_ratio
-                
-                curve_points.append({
-                    'price': round(price, 2),
-                    'demand': round(demand, 0)
-                })
-            
-            return Response({
-                'product_id': pk,
-                'product_name': product.name,
-                'historical_data': price_points,
-                'demand_curve': curve_points,
-                'current_price': float(product.selling_price),
-                'forecasted_demand': base_demand
-            })
         except Product.DoesNotExist:
             raise Http404
         
+        # Create data points for the demand vs price chart
+        history = ProductHistory.objects.filter(product=product).order_by('month').values_list(
+            'month', 'selling_price', 'units_sold'
+        )
+        price_points = [
+            {'date': month.strftime('%Y-%m'), 'selling_price': float(selling_price), 'units_sold': units_sold}
+            for month, selling_price, units_sold in history
+        ]
+        
+        # Elasticity model around the current price: (P1/P0)^(-e) = (Q1/Q0)
+        curve = DemandCurveService.curves([product], workers=WEB_WORKERS, **params.curve_options())[product.pk]
+        return Response({
+            'product_id': pk,
+            'product_name': product.name,
+            'historical_data': price_points,
+            'demand_curve': curve['demand_curve'],
+            'current_price': curve['current_price'],
+            'forecasted_demand': curve['forecasted_demand'],
+            'price_elasticity': curve['price_elasticity']
+        })
 
+class DemandCurveAPIView(APIView):
+    """
+    Demand curves of several products (``?ids=1,2,3``) in one request, with
+    the ``DemandCurveParamsSerializer`` query parameters. Unknown ids are left out.
+    """
+    authentication_classes = [TokenUserAuthentication]
+    permission_classes = [IsAuthenticated, CanViewProductPricing]
+    
+    def get(self, request):
+        params = DemandCurveBatchParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        ids = params.validated_data['ids']
+        products = Product.objects.in_bulk(ids)
+        curves = DemandCurveService.curves(products.values(), workers=WEB_WORKERS, **params.curve_options())
+        return Response([
+            dict(product_id=pk, product_name=products[pk].name, **curves[pk])
+            for pk in ids if pk in products
+        ])
+        
 
 def health_check(request):
     # You can include additional health checks here
@@ -0,0 +1,160 @@
+# authentication/authorization.py
+"""
+Per-user authorization context (role and model permissions) for permission
+checks, read without database queries on the hot path.
+
+Sources, in order:
+
+1. Claims of the access token (``user_type``, ``is_superuser``, ``perms``),
+   added when the token is issued (``add_authorization_claims``).
+2. A per-user cache entry that lives ``AUTHORIZATION_CACHE_TIMEOUT`` seconds.
+3. The database (two queries), which refills the cache.
+
+Claims and cache entries are snapshots stamped with the time they were read.
+They are only used if taken after the user's last authorization change, which
+the signals in ``authentication.signals`` record per user (profile, active and
+superuser flags, groups, user permissions) and globally (group permissions).
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from api.metrics import record_cache
+
+AUTHORIZATION_KEY = 'authorization:{user_id}'
+USER_CHANGED_KEY = 'authorization-changed:{user_id}'
+GLOBAL_CHANGED_KEY = 'authorization-changed'
+
+
+class Authorization:
+    """
+    Role and model permissions of a user, checked the way ModelBackend checks them
+    """
+    __slots__ = ('user_type', 'is_active', 'is_superuser', 'permissions', 'read_at')
+
+    def __init__(self, user_type=None, is_active=False, is_superuser=False, permissions=(), read_at=0.0):
+        self.user_type = user_type
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+        self.permissions = frozenset(permissions)
+        self.read_at = read_at
+
+    def has_perm(self, perm):
+        return self.is_active and (self.is_superuser or perm in self.permissions)
+
+    def to_claims(self):
+        return {
+            'user_type': self.user_type,
+            'is_superuser': self.is_superuser,
+            'perms': sorted(self.permissions),
+            'authz_at': self.read_at,
+        }
+
+    @classmethod
+    def from_claims(cls, claims):
+        # Access tokens are only issued to active users
+        return cls(claims['user_type'], True, claims['is_superuser'], claims['perms'], claims['authz_at'])
+
+
+ANONYMOUS = Authorization()
+
+
+def load_authorization(user_id):
+    """
+    Authorization of a user read from the database, or None if the user doesn't exist
+    """
+    read_at = time.time()
+    user = User.objects.filter(pk=user_id).values_list('is_active', 'is_superuser', 'profile__user_type').first()
+    if user is None:
+        return None
+    is_active, is_superuser, user_type = user
+    permissions = Permission.objects.filter(Q(user=user_id) | Q(group__user=user_id)).values_list(
+        'content_type__app_label', 'codename'
+    ).distinct()
+    return Authorization(
+        user_type or 'unknown',
+        is_active,
+        is_superuser,
+        [f'{app_label}.{codename}' for app_label, codename in permissions],
+        read_at,
+    )
+
+
+def add_authorization_claims(token, user_id):
+    """
+    Put the user's current role and permissions into an access token
+    """
+    # Set missing change stamps first, or they would postdate (and void) the claims
+    _changed_at(user_id)
+    authorization = load_authorization(user_id)
+    if authorization is not None:
+        for claim, value in authorization.to_claims().items():
+            token[claim] = value
+    return token
+
+
+def _changed_at(user_id, stamps=None):
+    """
+    Time of the user's last authorization change. Missing stamps (never set or
+    evicted) are set to now, which only makes older snapshots look stale.
+    """
+    keys = [USER_CHANGED_KEY.format(user_id=user_id), GLOBAL_CHANGED_KEY]
+    if stamps is None:
+        stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, time.time(), timeout=None)
+            stamps[key] = cache.get(key, time.time())
+    return max(stamps[key] for key in keys)
+
+
+def get_authorization(request):
+    """
+    Authorization of the request's user, computed once per request
+    """
+    authorization = getattr(request, '_authorization', None)
+    if authorization is not None:
+        return authorization
+
+    user_id = getattr(request.user, 'pk', None)
+    if user_id is None:
+        authorization = ANONYMOUS
+    else:
+        key = AUTHORIZATION_KEY.format(user_id=user_id)
+        values = cache.get_many([key, USER_CHANGED_KEY.format(user_id=user_id), GLOBAL_CHANGED_KEY])
+        cached = values.pop(key, None)
+        changed_at = _changed_at(user_id, values)
+
+        claims = getattr(request.auth, 'payload', None) or {}
+        if claims.get('authz_at', 0) > changed_at:
+            authorization = Authorization.from_claims(claims)
+        elif cached is not None and cached.read_at > changed_at:
+            record_cache('authorization', hits=1)
+            authorization = cached
+        else:
+            record_cache('authorization', misses=1)
+            authorization = load_authorization(user_id) or ANONYMOUS
+            cache.set(key, authorization, timeout=settings.AUTHORIZATION_CACHE_TIMEOUT)
+    request._authorization = authorization
+    return authorization
+
+
+def _mark_changed(user_ids):
+    now = time.time()
+    if user_ids:
+        cache.set_many({USER_CHANGED_KEY.format(user_id=pk): now for pk in user_ids}, timeout=None)
+    else:
+        cache.set(GLOBAL_CHANGED_KEY, now, timeout=None)
+
+
+def invalidate_authorization(*user_ids):
+    """
+    Mark the users' authorization as changed (no user ids: every user's)
+    """
+    _mark_changed(user_ids)
+    # Again once committed: a snapshot read before the commit may be stamped after the first mark
+    transaction.on_commit(lambda: _mark_changed(user_ids))
@@ -0,0 +1,123 @@
+# authentication/backends.py
+"""
+JWT authentication for the API views, optionally without the per-request
+``auth_user`` lookup.
+
+With ``JWT_STATELESS_AUTH`` on, ``request.user`` is a ``ClaimsUser`` built
+from the access token: id, username and email come from the claims, and the
+User row is only loaded when something needs more (or needs a real User, such
+as ``serializer.save(created_by=request.user)``).
+
+Without the row there is no ``is_active`` check, so tokens are revoked through
+a denylist in the shared cache instead: per token (``revoke_token``) and per
+user for every token issued before a point in time (``revoke_user_tokens``,
+called by the signals in ``authentication.signals`` when a user is
+deactivated, deleted or changes password). The denylist is checked in both
+modes.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+REVOKED_TOKEN_KEY = 'revoked-token:{jti}'
+REVOKED_USER_KEY = 'revoked-user-tokens:{user_id}'
+
+
+def revoke_token(token):
+    """
+    Reject this access token from now on
+    """
+    remaining = token['exp'] - time.time()
+    if remaining > 0:
+        cache.set(REVOKED_TOKEN_KEY.format(jti=token[jwt_settings.JTI_CLAIM]), True, timeout=int(remaining) + 1)
+
+
+def revoke_user_tokens(user_id):
+    """
+    Reject every token issued to the user until now
+    """
+    # Access tokens minted from a refresh token keep its "iat", so older refresh
+    # tokens must stay covered for as long as they can produce access tokens
+    lifetime = jwt_settings.REFRESH_TOKEN_LIFETIME + jwt_settings.ACCESS_TOKEN_LIFETIME
+    cache.set(REVOKED_USER_KEY.format(user_id=user_id), time.time(), timeout=int(lifetime.total_seconds()))
+
+
+def is_revoked(token):
+    keys = [
+        REVOKED_TOKEN_KEY.format(jti=token.get(jwt_settings.JTI_CLAIM)),
+        REVOKED_USER_KEY.format(user_id=token.get(jwt_settings.USER_ID_CLAIM)),
+    ]
+    revoked = cache.get_many(keys)
+    if keys[0] in revoked:
+        return True
+    # "iat" has second precision: a token from the same second as the revocation is rejected too
+    revoked_at = revoked.get(keys[1])
+    return revoked_at is not None and token.get('iat', 0) <= revoked_at
+
+
+def _claim_or_field(name):
+    def get(self):
+        claims = self.__dict__['_claims']
+        return claims[name] if name in claims else getattr(self._user(), name)
+    return property(get)
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+    ``request.user`` backed by access token claims, loading the User row on first
+    use of anything the claims don't carry
+    """
+    is_authenticated = True
+    is_anonymous = False
+    # Deactivated users' tokens are revoked
+    is_active = True
+
+    def __init__(self, token):
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+        super().__init__(lambda: self._load(user_id))
+        self.__dict__['_claims'] = token.payload
+
+    @staticmethod
+    def _load(user_id):
+        try:
+            return User.objects.get(**{jwt_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+    def _user(self):
+        if self._wrapped is empty:
+            self._setup()
+        return self._wrapped
+
+    def __bool__(self):
+        # IsAuthenticated tests bool(request.user), which LazyObject would resolve
+        return True
+
+    @property
+    def pk(self):
+        return self.__dict__['_claims'][jwt_settings.USER_ID_CLAIM]
+
+    id = pk
+    username = _claim_or_field('username')
+    email = _claim_or_field('email')
+
+
+class TokenUserAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that honors the token denylist and, with
+    ``JWT_STATELESS_AUTH``, skips the User lookup
+    """
+    def get_user(self, validated_token):
+        if jwt_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        if is_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        if settings.JWT_STATELESS_AUTH:
+            return ClaimsUser(validated_token)
+        return super().get_user(validated_token)
@@ -0,0 +1,59 @@
+# authentication/signals.py
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .authorization import invalidate_authorization
+from .backends import revoke_user_tokens
+from .models import UserProfile
+
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_on_profile_change(sender, instance, **kwargs):
+    """user_type changed"""
+    invalidate_authorization(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    """is_active or is_superuser may have changed (or a new user reuses an id)"""
+    if update_fields is None or {'is_active', 'is_superuser'} & set(update_fields):
+        invalidate_authorization(instance.pk)
+    # set_password() keeps the raw password in _password until save() completes
+    if not created and (not instance.is_active or getattr(instance, '_password', None) is not None):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_on_user_delete(sender, instance, **kwargs):
+    invalidate_authorization(instance.pk)
+    revoke_user_tokens(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Groups or permissions of users added or removed (e.g. by AssignRoleView)"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_authorization(instance.pk)
+    elif pk_set:
+        # group.user_set.add(...) etc.: pk_set holds the users
+        invalidate_authorization(*pk_set)
+    else:
+        # Reverse clear(): the former members are not known any more
+        invalidate_authorization()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_on_group_permissions_change(sender, action, **kwargs):
+    """Affects every member of the group"""
+    if action.startswith('post_'):
+        invalidate_authorization()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_on_group_or_permission_delete(sender, **kwargs):
+    invalidate_authorization()
@@ -10,7 +10,9 @@ from django.contrib.auth.models import User, Group, Permission
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter
 from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
+from .authorization import add_authorization_claims
 from .models import Role, UserProfile
 from .serializers import (
     CustomTokenObtainPairSerializer,
@@ -39,16 +41,11 @@ class CustomTokenObtainPairView(APIView):
 
             refresh = RefreshToken.for_user(user)
 
-            # Optional: Attach custom claims to access token
-            try:
-                user_type = user.profile.user_type
-            except UserProfile.DoesNotExist:
-                user_type = "unknown"
-
+            # Custom claims; user_type and permissions spare permission checks their queries
             access_token = refresh.access_token
             access_token["username"] = user.username
             access_token["email"] = user.email
-            access_token["user_type"] = user_type
+            add_authorization_claims(access_token, user.pk)
 
             response = Response({
                 "access": str(access_token),
@@ -230,9 +227,11 @@ class CustomTokenRefreshView(APIView):
             # Create refresh token object
             refresh = RefreshToken(refresh_token)
             print("vastundhi")
-            # Get new access token
+            # Get new access token, with current role and permission claims
+            access_token = refresh.access_token
+            add_authorization_claims(access_token, refresh[jwt_settings.USER_ID_CLAIM])
             data = {
-                'access': str(refresh.access_token)
+                'access': str(access_token)
             }  
             response = Response(data)
             
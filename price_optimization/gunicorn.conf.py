@@ -0,0 +1,14 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings, loaded from the working directory (see the Dockerfile).
+"""
+import os
+
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Prometheus multiprocess mode: drop the exited worker's live gauges
+    # (http_requests_in_progress) so /metrics and readiness stop counting it
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
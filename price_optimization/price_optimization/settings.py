@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -100,6 +101,35 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMemCache is per process with LRU culling; point CACHE_BACKEND at Redis or
+# Memcached in production so invalidations reach every worker.
+
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='price-optimization'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+    }
+}
+# Only the backends that cull entries themselves understand MAX_ENTRIES; Redis and
+# Memcached pass OPTIONS on to their client libraries, which reject it
+if CACHE_BACKEND in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.db.DatabaseCache',
+):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=50000, cast=int)}
+
+# Seconds a cached demand forecast lives (it is also invalidated whenever history changes)
+FORECAST_CACHE_TIMEOUT = config('FORECAST_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Seconds a process trusts its market condition index before comparing it with the database
+MARKET_INDEX_CHECK_INTERVAL = config('MARKET_INDEX_CHECK_INTERVAL', default=5.0, cast=float)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -158,6 +188,97 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Seconds a user's cached role and permissions live (they are also invalidated on
+# profile, group and permission changes; see authentication.authorization)
+AUTHORIZATION_CACHE_TIMEOUT = config("AUTHORIZATION_CACHE_TIMEOUT", default=60, cast=int)
+
+# Largest page served by keyset (?cursor=) pagination
+CURSOR_PAGINATION_MAX_PAGE_SIZE = config("CURSOR_PAGINATION_MAX_PAGE_SIZE", default=1000, cast=int)
+
+# Seconds clients may reuse product, forecast and visualization responses without
+# revalidating; 0 makes them revalidate every time (ETag / Last-Modified, 304 when unchanged)
+CONDITIONAL_GET_MAX_AGE = config("CONDITIONAL_GET_MAX_AGE", default=0, cast=int)
+
+# Number of products forecast and optimized per batch when streaming bulk optimization results
+BULK_OPTIMIZATION_CHUNK_SIZE = config("BULK_OPTIMIZATION_CHUNK_SIZE", default=2000, cast=int)
+
+# Seconds a running optimization job may go without a heartbeat (one per committed
+# chunk) before run_optimization_jobs considers its runner dead and requeues it
+OPTIMIZATION_JOB_STALE_TIMEOUT = config("OPTIMIZATION_JOB_STALE_TIMEOUT", default=900, cast=int)
+
+# PriceOptimizationLog entries are buffered per process and written in bulk
+# once the buffer is full or its oldest entry is older than the interval (seconds)
+OPTIMIZATION_LOG_BUFFER_SIZE = config("OPTIMIZATION_LOG_BUFFER_SIZE", default=500, cast=int)
+OPTIMIZATION_LOG_FLUSH_INTERVAL = config("OPTIMIZATION_LOG_FLUSH_INTERVAL", default=5.0, cast=float)
+# Entries kept per process while the database is unavailable; the oldest are dropped beyond it
+OPTIMIZATION_LOG_MAX_PENDING = config("OPTIMIZATION_LOG_MAX_PENDING", default=50000, cast=int)
+# Also log every product of bulk optimizations and optimization jobs
+LOG_BULK_OPTIMIZATIONS = config("LOG_BULK_OPTIMIZATIONS", default=True, cast=bool)
+
+# Rows validated and upserted per batch by bulk history ingestion
+HISTORY_INGEST_BATCH_SIZE = config("HISTORY_INGEST_BATCH_SIZE", default=5000, cast=int)
+
+# Process-pool parallelism for batch forecasting and optimization in management
+# commands and optimization jobs (1 = run inline); API requests always run inline
+OPTIMIZATION_WORKERS = config("OPTIMIZATION_WORKERS", default=1, cast=int)
+# Number of products per shard handed to a worker process
+OPTIMIZATION_SHARD_SIZE = config("OPTIMIZATION_SHARD_SIZE", default=10000, cast=int)
+
+# API views authenticate request.user from the access token claims instead of
+# loading the User row on every request; revoked tokens are kept in a denylist in
+# the cache (see authentication.backends), so use a shared cache in production
+JWT_STATELESS_AUTH = config("JWT_STATELESS_AUTH", default=False, cast=bool)
+
+# Demand forecast model (api.forecasting): "baseline" (recency-weighted mean with a
+# seasonal ratio and 10% growth), "holt_winters" or "least_squares", and per-category
+# overrides as "Category:model,Other category:model" (categories match case-insensitively)
+FORECAST_MODEL = config("FORECAST_MODEL", default="baseline")
+FORECAST_CATEGORY_MODELS = config(
+    "FORECAST_CATEGORY_MODELS",
+    default="",
+    cast=lambda value: {
+        category.strip().lower(): model.strip()
+        for category, _, model in (item.rpartition(':') for item in Csv()(value))
+    },
+)
+
+# Price elasticity estimation (api.services.ElasticityService): estimate used
+# without any price history, and how much price variation (summed squared
+# log-price deviations) a product needs before its own slope outweighs its category's
+DEFAULT_PRICE_ELASTICITY = config("DEFAULT_PRICE_ELASTICITY", default=1.0, cast=float)
+ELASTICITY_PRIOR_STRENGTH = config("ELASTICITY_PRIOR_STRENGTH", default=0.05, cast=float)
+# Seconds the pooled category elasticities are cached before they are recomputed
+ELASTICITY_PRIORS_TIMEOUT = config("ELASTICITY_PRIORS_TIMEOUT", default=3600, cast=int)
+
+# Profit-maximizing pricing (pricing=profit): candidate prices range from
+# PRICE_RANGE_MIN to PRICE_RANGE_MAX times the current price (never below cost
+# plus the 5% minimum margin). PRICE_GRID_POINTS > 0 evaluates a grid of that
+# many prices per product instead of the exact constant-elasticity solution
+PRICE_RANGE_MIN = config("PRICE_RANGE_MIN", default=0.5, cast=float)
+PRICE_RANGE_MAX = config("PRICE_RANGE_MAX", default=2.0, cast=float)
+PRICE_GRID_POINTS = config("PRICE_GRID_POINTS", default=0, cast=int)
+
+# Limits of one scenario sweep request: parameter combinations, and products
+# times combinations (the size of the price matrix computed in memory)
+SWEEP_MAX_SCENARIOS = config("SWEEP_MAX_SCENARIOS", default=500, cast=int)
+SWEEP_MAX_CELLS = config("SWEEP_MAX_CELLS", default=2000000, cast=int)
+
+# Limits of demand curve requests: points per curve and products per request
+DEMAND_CURVE_MAX_POINTS = config("DEMAND_CURVE_MAX_POINTS", default=200, cast=int)
+DEMAND_CURVE_MAX_PRODUCTS = config("DEMAND_CURVE_MAX_PRODUCTS", default=100, cast=int)
+
+# Bearer token required to scrape /metrics (empty = no authentication). Under
+# gunicorn also export PROMETHEUS_MULTIPROC_DIR, see api.metrics; gunicorn.conf.py
+# marks exited workers dead so their gauges stop counting
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Readiness probe (api.health): per-check timeout and result reuse (seconds), and
+# the share of request workers (gunicorn workers x threads) that may be busy
+HEALTH_CHECK_TIMEOUT = config("HEALTH_CHECK_TIMEOUT", default=2.0, cast=float)
+HEALTH_CHECK_INTERVAL = config("HEALTH_CHECK_INTERVAL", default=5.0, cast=float)
+HEALTH_WORKER_CAPACITY = config("HEALTH_WORKER_CAPACITY", default=config("WEB_CONCURRENCY", default=1, cast=int), cast=int)
+HEALTH_MAX_SATURATION = config("HEALTH_MAX_SATURATION", default=1.0, cast=float)
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),